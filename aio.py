@@ -0,0 +1,286 @@
+"""
+An asyncio facade over the CUBRID backend.
+
+CUBRIDdb is blocking, so every call runs in a worker thread. Each cursor is
+pinned to one "lane", a single worker thread with its own Django connection
+(connections are thread local), for as long as it is open. The number of
+lanes is bounded by `max_workers`, by default half the connection pool's
+MAX_SIZE so that synchronous threads keep connections of their own. When all
+lanes are taken, cursor() waits for one to be released, which gives callers
+backpressure instead of an unbounded backlog.
+
+Closing a cursor rolls back whatever it left uncommitted, so commit() first
+to keep its changes. With pooling, the lane's connection then goes back to
+the pool until the lane's next cursor.
+
+Every method returns an asyncio future. With trollius:
+
+    db = AsyncConnection('default')
+
+    @asyncio.coroutine
+    def handler():
+        cursor = yield From(db.cursor())
+        try:
+            yield From(cursor.execute("SELECT id, name FROM app_thing"))
+            while True:
+                rows = yield From(cursor.fetchmany(100))
+                if not rows:
+                    break
+                ...
+        finally:
+            cursor.close()
+
+cursor.chunks() fetches the next list of rows while the current one is
+being processed:
+
+    chunks = cursor.chunks(100)
+    while True:
+        try:
+            rows = yield From(chunks.next())
+        except StopAsyncIteration:
+            break
+        ...
+
+Cancelling a future cancels the call if it has not started yet. If it is
+already running, the statement is cancelled as timeouts.cancel_statement()
+does, or left to complete and its connection discarded when the driver
+can't cancel it. In both cases the cursor is closed and its lane released once the
+worker is free again.
+"""
+
+import collections
+
+try:
+    import asyncio
+except ImportError:
+    try:
+        import trollius as asyncio
+    except ImportError, e:
+        from django.core.exceptions import ImproperlyConfigured
+        raise ImproperlyConfigured("Error loading asyncio or trollius module: %s" % e)
+
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.db.backends.cubrid.base import Database
+from django.db.backends.cubrid.pool import DEFAULT_POOL_OPTIONS
+from django.db.backends.cubrid.timeouts import cancel_statement
+
+class StopAsyncIteration(Exception):
+    "Raised by AsyncChunks.next() at the end of the result set."
+    pass
+
+class Lane(object):
+    "A single worker thread and the raw connection it is using."
+    def __init__(self, alias):
+        self.alias = alias
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.raw_connection = None
+        # Set when a statement could not be cancelled, and its connection
+        # must not be reused.
+        self.discard = False
+
+    def cursor(self):
+        # Runs in the lane's thread.
+        cursor = connections[self.alias].cursor()
+        self.raw_connection = connections[self.alias].connection
+        return cursor
+
+    def cancel(self):
+        "Cancels the statement running on this lane."
+        connection = self.raw_connection
+        if connection is not None and cancel_statement(connection):
+            self.discard = True
+
+    def release(self):
+        """
+        Rolls back the connection once a cursor is closed and, with pooling
+        or after a cancellation, hands it back. Runs in the lane's thread.
+        """
+        connection = connections[self.alias]
+        if self.discard:
+            connection._release_connection(discard=True)
+            self.discard = False
+        elif connection.pool is not None:
+            # Rolled back on the way to the pool.
+            connection.close()
+        else:
+            connection._rollback()
+        self.raw_connection = connection.connection
+
+    def close(self):
+        # Runs in the lane's thread.
+        connections[self.alias].close()
+        self.raw_connection = None
+
+class AsyncConnection(object):
+    """
+    Hands out AsyncCursors for the database `alias`, running them on at most
+    `max_workers` lanes.
+    """
+    def __init__(self, alias=DEFAULT_DB_ALIAS, max_workers=None, loop=None):
+        if max_workers is None:
+            options = connections[alias].settings_dict.get('OPTIONS') or {}
+            pool = options.get('POOL')
+            if pool:
+                if pool is True:
+                    pool = {}
+                max_workers = max(1, pool.get('MAX_SIZE', DEFAULT_POOL_OPTIONS['MAX_SIZE']) // 2)
+            else:
+                max_workers = DEFAULT_POOL_OPTIONS['MAX_SIZE']
+        self.alias = alias
+        self.loop = loop or asyncio.get_event_loop()
+        self.lanes = [Lane(alias) for i in range(max_workers)]
+        self._free = list(self.lanes)
+        self._waiters = collections.deque()
+
+    def cursor(self):
+        "Returns a future resolving to an AsyncCursor once a lane is free."
+        future = asyncio.Future(loop=self.loop)
+        if self._free:
+            future.set_result(AsyncCursor(self, self._free.pop()))
+        else:
+            self._waiters.append(future)
+        return future
+
+    def _release(self, lane):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(AsyncCursor(self, lane))
+                return
+        self._free.append(lane)
+
+    def close(self):
+        """
+        Closes the connections of all lanes and stops their threads. Returns
+        a future resolving once that is done.
+        """
+        futures = [self.loop.run_in_executor(lane.executor, lane.close) for lane in self.lanes]
+        for lane in self.lanes:
+            lane.executor.shutdown(wait=False)
+        return asyncio.gather(*futures, loop=self.loop)
+
+class AsyncCursor(object):
+    "A backend cursor whose methods return futures. close() it when done."
+    def __init__(self, db, lane):
+        self.db = db
+        self.lane = lane
+        self.cursor = None
+        self.description = None
+        self.rowcount = -1
+        self.closed = False
+
+    def _submit(self, function, *args):
+        if self.closed:
+            raise ValueError("Cursor is closed.")
+        future = self.db.loop.run_in_executor(self.lane.executor, function, *args)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        if future.cancelled() and not self.closed:
+            self.lane.cancel()
+            self.close()
+
+    def _execute(self, method, query, params):
+        # Runs in the lane's thread.
+        if self.cursor is None:
+            self.cursor = self.lane.cursor()
+        result = getattr(self.cursor, method)(query, params)
+        self.description = self.cursor.description
+        self.rowcount = self.cursor.rowcount
+        return result
+
+    def execute(self, query, params=None):
+        return self._submit(self._execute, 'execute', query, params)
+
+    def executemany(self, query, param_list):
+        return self._submit(self._execute, 'executemany', query, param_list)
+
+    def _fetch(self, method, *args):
+        # Runs in the lane's thread, after any execute() submitted before.
+        if self.cursor is None:
+            raise Database.ProgrammingError("execute() has not been called.")
+        return getattr(self.cursor, method)(*args)
+
+    def fetchone(self):
+        return self._submit(self._fetch, 'fetchone')
+
+    def fetchmany(self, size=None):
+        return self._submit(lambda: self._fetch('fetchmany', size or connections[self.db.alias].fetch_size))
+
+    def fetchall(self):
+        return self._submit(self._fetch, 'fetchall')
+
+    def chunks(self, size=None):
+        """
+        Returns an AsyncChunks over the rows of the current result set, as
+        lists of up to `size` rows. The next list is fetched while the
+        current one is being processed.
+        """
+        return AsyncChunks(self, size)
+
+    def commit(self):
+        return self._submit(lambda: connections[self.db.alias]._commit())
+
+    def rollback(self):
+        return self._submit(lambda: connections[self.db.alias]._rollback())
+
+    def close(self):
+        """
+        Releases the cursor's lane once any call still running on it is
+        done, rolling back what wasn't committed.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        # Queued behind whatever the lane is running, so the lane is only
+        # handed to another cursor once it is idle.
+        future = self.db.loop.run_in_executor(self.lane.executor, self._close)
+        future.add_done_callback(lambda future: self.db._release(self.lane))
+
+    def _close(self):
+        # Runs in the lane's thread.
+        try:
+            if self.cursor is not None:
+                self.cursor.close()
+                self.cursor = None
+        finally:
+            self.lane.release()
+
+class AsyncChunks(object):
+    "Iterates over a result set one fetchmany() ahead of the consumer."
+    def __init__(self, cursor, size):
+        self.cursor = cursor
+        self.size = size
+        self._next = None
+
+    def next(self):
+        """
+        Returns a future resolving to the next list of rows, or failing with
+        StopAsyncIteration once they are exhausted.
+        """
+        current = self._next or self.cursor.fetchmany(self.size)
+        result = asyncio.Future(loop=self.cursor.db.loop)
+        def chain(future):
+            if result.done():
+                # Cancelled by the consumer.
+                return
+            if future.cancelled():
+                result.cancel()
+            elif future.exception() is not None:
+                result.set_exception(future.exception())
+            elif not future.result():
+                result.set_exception(StopAsyncIteration())
+            else:
+                try:
+                    self._next = self.cursor.fetchmany(self.size)
+                except Exception, e:
+                    # E.g. the cursor was closed meanwhile.
+                    result.set_exception(e)
+                else:
+                    result.set_result(future.result())
+        current.add_done_callback(chain)
+        self._next = None
+        return result
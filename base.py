@@ -4,21 +4,34 @@ Cubrid database backend for Django.
 Requires CUBRIDdb: http://www.cubrid.org/downloads#py
 """
 
+import sys
+import time
+
 try:
     import CUBRIDdb as Database
 except ImportError, e:
     from django.core.exceptions import ImproperlyConfigured
     raise ImproperlyConfigured("Error loading CUBRIDdb module: %s" % e)
 
+from django.conf import settings
 from django.db import utils
 from django.db.backends import *
 from django.db.backends.signals import connection_created
 from django.db.backends.cubrid.client import DatabaseClient
+from django.db.backends.cubrid.convert import decode, decoding_plan
+from django.db.backends.cubrid.counts import find_count_cache, get_count_cache
 from django.db.backends.cubrid.creation import DatabaseCreation
+from django.db.backends.cubrid.hints import current_hints
 from django.db.backends.cubrid.introspection import DatabaseIntrospection
+from django.db.backends.cubrid.cache import LRUCache
+from django.db.backends.cubrid.metrics import get_metrics
+from django.db.backends.cubrid.pool import get_pool
+from django.db.backends.cubrid.resultcache import get_result_cache
+from django.db.backends.cubrid.routing import get_endpoints
+from django.db.backends.cubrid.statements import StatementCache, target_table_re
+from django.db.backends.cubrid.timeouts import QueryTimeout, cancel_statement, watch
 from django.db.backends.cubrid.validation import DatabaseValidation
 from django.utils.safestring import SafeString, SafeUnicode
-from django.db.backends.cubrid.convert import CubridConvert
 
 DatabaseError = Database.DatabaseError
 IntegrityError = Database.IntegrityError
@@ -29,29 +42,193 @@ class CursorWrapper(object):
 
     Based on MySQL backend's CursorWrapper class.
     """
-    def __init__(self, cursor):
+    def __init__(self, cursor, db):
         self.cursor = cursor
+        self.db = db
+        self._primary_cursor = cursor
+        self._replica_cursor = None
+        # The decoding plan of the current result set, built on first fetch.
+        self._steps = None
 
     def execute(self, query, args=None):
+        statement = self.db.statements.statement(query)
+        self._steps = None
+        if self._primary_cursor is None:
+            self._reconnect()
+        if self.db.replicas is not None:
+            self._route(statement)
+        execute = self._execute
+        timeout = self._timeout()
+        if timeout:
+            execute = self._timed(execute, timeout)
+        metrics = self.db.metrics
+        if metrics is None:
+            return execute(statement, args)
+        started = time.time()
+        try:
+            result = execute(statement, args)
+        except:
+            metrics.record(statement, time.time() - started, 0, len(args or ()), error=True)
+            raise
+        metrics.record(statement, time.time() - started, self.cursor.rowcount, len(args or ()))
+        return result
+
+    def _execute(self, statement, args):
         try:
-            query = query.replace ("%s","?")
-            print args
-            args = CubridConvert().boolean_field(args)
-            return self.cursor.execute(query, args)
+            if statement.verb == 'TRUNCATE' and statement.sql.count(';') > 1:
+                result = self._execute_script(statement)
+            elif self.cursor is self._replica_cursor:
+                result = self._execute_on_replica(statement, args)
+            else:
+                result = self.cursor.execute(statement.sql, statement.params.adapt(args))
         except Database.IntegrityError, e:
             raise utils.IntegrityError, utils.IntegrityError(*tuple(e)), sys.exc_info()[2]
         except Database.DatabaseError, e:
             raise utils.DatabaseError, utils.DatabaseError(*tuple(e)), sys.exc_info()[2]
+        finally:
+            if statement.changes_schema:
+                self.db.schema_changed()
+        if statement.table is not None:
+            self.db.table_written(statement.table, truncated=statement.verb == 'TRUNCATE')
+        return result
+
+    def _timeout(self):
+        "Returns the timeout of the next statement: its hint, or OPTIONS['STATEMENT_TIMEOUT']."
+        hints = current_hints()
+        if hints:
+            return hints.get('timeout', self.db.statement_timeout)
+        return self.db.statement_timeout
+
+    def _timed(self, function, timeout):
+        """
+        Returns `function` wrapped to cancel the statement it runs after
+        `timeout` seconds, and to raise QueryTimeout then.
+        """
+        def timed(statement, args):
+            replica = self.cursor is self._replica_cursor
+            connection = replica and self.db.replica_connection or self.db.connection
+            watched = watch(timeout, lambda: cancel_statement(connection))
+            try:
+                result = function(statement, args)
+            except Exception:
+                if not watched.finish():
+                    raise
+            else:
+                if not watched.finish():
+                    return result
+            # Cancelled, even if the statement managed to complete.
+            self._timed_out(replica, watched.discard)
+            raise QueryTimeout("Statement cancelled after %s seconds: %s" % (timeout, statement.query))
+        return timed
+
+    def _timed_out(self, replica, discard):
+        """
+        Hands the connection of a cancelled statement back to its pool, or
+        discards it. The next statement gets a new connection.
+        """
+        if replica:
+            self.db._release_replica(discard=discard)
+            self._replica_cursor = None
+            self.cursor = self._primary_cursor
+        else:
+            cursor, self._primary_cursor = self._primary_cursor, None
+            self.cursor = None
+            try:
+                cursor.close()
+            except Database.Error:
+                pass
+            self.db._release_connection(discard=discard)
+            self.db.written_tables = set()
+
+    def _reconnect(self):
+        "Replaces the primary cursor released by a timeout."
+        self._primary_cursor = self.cursor = self.db._cursor().cursor
+
+    def _route(self, statement):
+        """
+        Points the wrapper at a replica cursor for reads run outside of
+        managed or dirty transactions, and at the primary one otherwise.
+        """
+        self.cursor = self._primary_cursor
+        if statement.read_only and not (self.db.is_managed() or self.db.is_dirty()):
+            if self._replica_cursor is None:
+                self._replica_cursor = self.db.replica_cursor()
+            if self._replica_cursor is not None:
+                self.cursor = self._replica_cursor
+
+    def _execute_on_replica(self, statement, args):
+        db = self.db
+        endpoint = db.replica_endpoint
+        started = time.time()
+        try:
+            result = self.cursor.execute(statement.sql, statement.params.adapt(args))
+        except Database.Error:
+            try:
+                db._ping(db.replica_connection)
+            except Database.Error:
+                # The replica is gone: eject it and read from the primary.
+                db.replicas.failure(endpoint)
+                db._release_replica(discard=True)
+                self._replica_cursor = None
+                self.cursor = self._primary_cursor
+                return self.cursor.execute(statement.sql, statement.params.adapt(args))
+            raise
+        db.replicas.success(endpoint, time.time() - started)
+        return result
+
+    def _execute_script(self, statement):
+        """
+        Runs the ';' separated statements that sql_flush() batches together,
+        in one call when CUBRIDdb offers a batch interface. Drivers without
+        Connection.batch_execute() get one execute() per statement, so the
+        flush then costs a round trip per statement again.
+        """
+        statements = [sql.strip() for sql in statement.sql.split(';') if sql.strip()]
+        if hasattr(self.db.connection, 'batch_execute'):
+            self.db.connection.batch_execute(statements)
+        else:
+            for sql in statements:
+                self.cursor.execute(sql)
+        if self.db.flush_dirty_only and self.db.dirty_tables is None:
+            # The first flush resets every table; writes are tracked from
+            # here on.
+            self.db.dirty_tables = set()
+        for sql in statements:
+            match = target_table_re.match(sql)
+            if match:
+                self.db.table_written(match.group(1).lower(), truncated=sql[:8].upper() == 'TRUNCATE')
 
     def executemany(self, query, args):
+        statement = self.db.statements.statement(query)
+        self._steps = None
+        if self._primary_cursor is None:
+            self._reconnect()
+        executemany = self._executemany
+        timeout = self._timeout()
+        if timeout:
+            executemany = self._timed(executemany, timeout)
+        metrics = self.db.metrics
+        if metrics is None:
+            return executemany(statement, args)
+        started = time.time()
+        try:
+            result = executemany(statement, args)
+        except:
+            metrics.record(statement, time.time() - started, 0, 0, error=True)
+            raise
+        metrics.record(statement, time.time() - started, self.cursor.rowcount, 0)
+        return result
+
+    def _executemany(self, statement, args):
         try:
-            query = query.replace ("%s","?")
-            args = CubridConvert().boolean_field(args)
-            return self.cursor.executemany(query, args)
+            result = self.cursor.executemany(statement.sql, statement.params.adapt_many(args))
         except Database.IntegrityError, e:
             raise utils.IntegrityError, utils.IntegrityError(*tuple(e)), sys.exc_info()[2]
         except Database.DatabaseError, e:
             raise utils.DatabaseError, utils.DatabaseError(*tuple(e)), sys.exc_info()[2]
+        if statement.table is not None:
+            self.db.table_written(statement.table)
+        return result
 
     def __getattr__(self, attr):
         if attr in self.__dict__:
@@ -60,16 +237,86 @@ class CursorWrapper(object):
             return getattr(self.cursor, attr)
 
     def __iter__(self):
-        return iter(self.cursor)
+        return self.stream()
+
+    def _decode(self, rows):
+        if self._steps is None:
+            self._steps = decoding_plan(self.cursor.description, rows)
+        return decode(rows, self._steps)
+
+    def fetchone(self):
+        row = self.cursor.fetchone()
+        if row is None:
+            return None
+        return self._decode([row])[0]
+
+    def fetchmany(self, size=None):
+        if size is None:
+            return self._decode(self.cursor.fetchmany())
+        return self._decode(self.cursor.fetchmany(size))
+
+    def fetchall(self):
+        return self._decode(self.cursor.fetchall())
+
+    def fetch_chunks(self, size=None):
+        """
+        Yields the rows of the current result set as lists of up to `size`
+        rows (OPTIONS['FETCH_SIZE'] by default), one fetchmany() per list, so
+        that only one chunk is held in memory at a time. Time to first row
+        and row counts are recorded in the connection's fetch_stats.
+        """
+        size = size or self.db.fetch_size
+        fetchmany = self.cursor.fetchmany
+        stats = self.db.fetch_stats = {'rows': 0, 'chunks': 0, 'time_to_first_row': None}
+        started = time.time()
+        while True:
+            rows = fetchmany(size)
+            if not rows:
+                break
+            if stats['time_to_first_row'] is None:
+                stats['time_to_first_row'] = time.time() - started
+            stats['rows'] += len(rows)
+            stats['chunks'] += 1
+            yield self._decode(rows)
+
+    def stream(self, size=None):
+        "Yields the rows of the current result set one at a time."
+        for rows in self.fetch_chunks(size):
+            for row in rows:
+                yield row
 
 class DatabaseFeatures(BaseDatabaseFeatures):
     interprets_empty_strings_as_nulls = True
-    # TODO: Go through BaseDatabaseFeatures attributes and methods.
-    # Implement differences here.
+    has_bulk_insert = True
+    # Only safe when no other session inserts into the same table while a
+    # bulk insert runs, as CUBRID does not reserve AUTO_INCREMENT values per
+    # statement. Enabled with OPTIONS['BULK_INSERT_IDS'].
+    can_return_ids_from_bulk_insert = False
+    uses_savepoints = True
+    # Enabled with OPTIONS['AUTOCOMMIT']; see transactions.py.
+    uses_autocommit = False
 
 class DatabaseOperations(BaseDatabaseOperations):
     compiler_module = "django.db.backends.cubrid.compiler"
 
+    def __init__(self, connection):
+        super(DatabaseOperations, self).__init__()
+        self.connection = connection
+
+    def bulk_batch_size(self, fields, objs):
+        """
+        Returns how many rows a multi-row INSERT may hold, staying under both
+        the row and the host variable limits set in OPTIONS.
+        """
+        options = self.connection.settings_dict.get('OPTIONS') or {}
+        max_rows = options.get('BULK_INSERT_BATCH_SIZE', 500)
+        max_params = options.get('BULK_INSERT_MAX_PARAMS', 5000)
+        return max(1, min(max_rows, max_params // max(len(fields), 1)))
+
+    def bulk_insert_sql(self, fields, num_values):
+        items_sql = "(%s)" % ", ".join(["%s"] * len(fields))
+        return "VALUES " + ", ".join([items_sql] * num_values)
+
     def date_extract_sql(self, lookup_type, field_name):
         if lookup_type == 'week_day':
             # DAYOFWEEK() returns an integer, 1-7, Sunday=1.
@@ -110,18 +357,48 @@ class DatabaseOperations(BaseDatabaseOperations):
         return 9223372036854775807
 
     def last_insert_id(self, cursor, table_name, pk_name):
+        # Prefer the key reported along with the INSERT itself, which saves
+        # a round trip per saved object. For multi-row INSERTs every source
+        # reports the first generated value.
+        lastrowid = getattr(cursor, 'lastrowid', None)
+        if lastrowid:
+            return int(lastrowid)
+        insert_id = getattr(self.connection.connection, 'insert_id', None)
+        if insert_id is not None:
+            value = insert_id()
+            if value:
+                return int(value)
         cursor.execute("SELECT LAST_INSERT_ID()")
         result = cursor.fetchone()
         return result[0]
 
+    def lookup_cast(self, lookup_type):
+        # Case-insensitive lookups compare LOWER(column), which a
+        # FunctionIndex on the column (see indexes.py) can serve.
+        if lookup_type in ('iexact', 'icontains', 'istartswith', 'iendswith'):
+            return 'LOWER(%s)'
+        return '%s'
+
+    def prep_for_iexact_query(self, x):
+        # iexact compares with =, where LIKE wildcards must not be escaped.
+        return x
+
     def random_function_sql(self):
         return 'RAND()'
 
     def sql_flush(self, style, tables, sequences):
+        # With OPTIONS['FLUSH_DIRTY_ONLY'], only the tables this connection
+        # wrote to since the last flush are reset, in a single statement
+        # that the cursor splits up again for the driver. Writes made by
+        # other connections go unnoticed, so this is meant for test runs.
+        # Tables stay dirty until the flush is executed, so SQL that is
+        # only printed (manage.py sqlflush) changes nothing.
+        if self.connection.flush_dirty_only:
+            tables, sequences = self._dirty_only(tables, sequences)
+
         # NB: The generated SQL below is specific to MySQL
         # 'TRUNCATE x;', 'TRUNCATE y;', 'TRUNCATE z;'... style SQL statements
         # to clear all tables of all data
-        print "sqlflush"
         if tables:
 #            sql = ['SET FOREIGN_KEY_CHECKS = 0;']
             sql = []
@@ -138,11 +415,21 @@ class DatabaseOperations(BaseDatabaseOperations):
                  style.SQL_KEYWORD('AUTO_INCREMENT'),
                  style.SQL_FIELD('= 1'),
                 ) for sequence in sequences])
-            print sql
+            if self.connection.flush_dirty_only:
+                return [' '.join(sql)]
             return sql
         else:
             return []
 
+    def _dirty_only(self, tables, sequences):
+        dirty = self.connection.dirty_tables
+        if dirty is None:
+            # Writes made before tracking started are unknown: everything
+            # is reset until a flush has run.
+            return tables, sequences
+        return ([table for table in tables if table.lower() in dirty],
+                [sequence for sequence in sequences if sequence['table'].lower() in dirty])
+
     def value_to_db_datetime(self, value):
         if value is None:
             return None
@@ -172,15 +459,21 @@ class DatabaseOperations(BaseDatabaseOperations):
     def max_name_length(self):
         return 64
 
+    def savepoint_create_sql(self, sid):
+        return "SAVEPOINT %s" % sid
+
+    def savepoint_rollback_sql(self, sid):
+        return "ROLLBACK TO SAVEPOINT %s" % sid
+
 class DatabaseWrapper(BaseDatabaseWrapper):
     vendor = 'cubrid'
     # Operators taken from MySQL implementation.
     # TODO: Check for differences between this syntax and CUBRID's.
     operators = {
         'exact': '= %s',
-        'iexact': 'LIKE %s',
+        'iexact': '= LOWER(%s)',
         'contains': 'IN %s',
-        'icontains': 'LIKE %s',
+        'icontains': 'LIKE LOWER(%s)',
         'regex': 'LIKE %s',
         'iregex': 'LIKE %s',
         'gt': '> %s',
@@ -189,8 +482,8 @@ class DatabaseWrapper(BaseDatabaseWrapper):
         'lte': '<= %s',
         'startswith': 'LIKE %s',
         'endswith': 'LIKE %s',
-        'istartswith': 'LIKE %s',
-        'iendswith': 'LIKE %s',
+        'istartswith': 'LIKE LOWER(%s)',
+        'iendswith': 'LIKE LOWER(%s)',
         }
 
     def __init__(self, *args, **kwargs):
@@ -198,53 +491,348 @@ class DatabaseWrapper(BaseDatabaseWrapper):
 
         self.server_version = None
         self.features = DatabaseFeatures(self)
-        self.ops = DatabaseOperations()
+        self.ops = DatabaseOperations(self)
         self.client = DatabaseClient(self)
         self.creation = DatabaseCreation(self)
         self.introspection = DatabaseIntrospection(self)
         self.validation = DatabaseValidation(self)
 
+        options = self.settings_dict.get('OPTIONS') or {}
+        self.health_check_interval = options.get('HEALTH_CHECK_INTERVAL', 10)
+        self._last_used = 0
+        self.statements = StatementCache(options.get('STATEMENT_CACHE_SIZE', 256))
+        self.fetch_size = options.get('FETCH_SIZE', 100)
+        self.compiled_sql = LRUCache(options.get('COMPILED_SQL_CACHE_SIZE', 512))
+        self.metrics = None
+        if options.get('METRICS'):
+            self.metrics = get_metrics(self.alias, options['METRICS'])
+        self.fetch_stats = None
+        self.flush_dirty_only = options.get('FLUSH_DIRTY_ONLY', False)
+        # Lower cased names of the tables written since the last flush; None
+        # until a flush has run with FLUSH_DIRTY_ONLY.
+        self.dirty_tables = None
+        if options.get('BULK_INSERT_IDS'):
+            self.features.can_return_ids_from_bulk_insert = True
+        # The primary endpoint of the current connection, when PRIMARIES
+        # lists several; see routing.py.
+        self.endpoint = None
+        self.primaries = self.replicas = None
+        if options.get('PRIMARIES'):
+            self.primaries = get_endpoints(self.alias, 'PRIMARIES', options)
+        if options.get('REPLICAS'):
+            self.replicas = get_endpoints(self.alias, 'REPLICAS', options)
+        self.replica_connection = None
+        self.replica_endpoint = None
+        self.result_cache = None
+        if options.get('RESULT_CACHE'):
+            self.result_cache = get_result_cache(self.alias, options['RESULT_CACHE'])
+        # Tables written in the current transaction, invalidated again in the
+        # result and count caches on commit.
+        self.written_tables = set()
+        if options.get('AUTOCOMMIT') and not settings.TRANSACTIONS_MANAGED:
+            self.features.uses_autocommit = True
+            # There is no transaction to hold savepoints until one is managed.
+            self.features.uses_savepoints = False
+        # Whether the driver commits each statement by itself: true outside
+        # of managed transactions with AUTOCOMMIT, false otherwise.
+        self.autocommit = self.features.uses_autocommit
+        # The depth of the transaction management block that turned
+        # autocommit off.
+        self._autocommit_depth = None
+        # Writes left before the next intermediate commit within a
+        # transactions.batch() block, or None outside of one.
+        self.writes_until_commit = None
+        self.commit_every = None
+        # Savepoints created and not yet committed or rolled back, which an
+        # intermediate commit would destroy.
+        self.open_savepoints = 0
+        self.statement_timeout = options.get('STATEMENT_TIMEOUT')
+        self.counts = None
+        if options.get('COUNTS'):
+            self.counts = get_count_cache(self.alias, options['COUNTS'])
+
+    def table_written(self, table, truncated=False):
+        """
+        Records a write to `table` made through this connection, for
+        FLUSH_DIRTY_ONLY and the result and count caches, and commits when a
+        batch() block has seen enough writes.
+        """
+        if self.dirty_tables is not None:
+            if truncated:
+                self.dirty_tables.discard(table)
+            else:
+                self.dirty_tables.add(table)
+        if self.result_cache is not None:
+            self.result_cache.invalidate((table,))
+            self.written_tables.add(table)
+        # Also built for CubridQuerySet.approximate() without COUNTS.
+        counts = find_count_cache(self.alias)
+        if counts is not None:
+            counts.invalidate((table,))
+            self.written_tables.add(table)
+        if self.writes_until_commit is not None:
+            self.writes_until_commit -= 1
+            if self.writes_until_commit <= 0 and not self.open_savepoints:
+                self._commit()
+
+    def schema_changed(self):
+        self.introspection.clear_cache()
+        if self.result_cache is not None:
+            self.result_cache.clear()
+
+    def _commit(self):
+        if not self.autocommit:
+            super(DatabaseWrapper, self)._commit()
+        self.open_savepoints = 0
+        if self.commit_every is not None:
+            self.writes_until_commit = self.commit_every
+        if self.written_tables:
+            # Readers may have cached or counted the old rows until the
+            # commit.
+            if self.result_cache is not None:
+                self.result_cache.invalidate(self.written_tables)
+            counts = find_count_cache(self.alias)
+            if counts is not None:
+                counts.invalidate(self.written_tables)
+            self.written_tables = set()
+
+    def _rollback(self):
+        if not self.autocommit:
+            super(DatabaseWrapper, self)._rollback()
+        self.open_savepoints = 0
+        self.written_tables = set()
+
+    def _savepoint(self, sid):
+        super(DatabaseWrapper, self)._savepoint(sid)
+        self.open_savepoints += 1
+
+    def _savepoint_commit(self, sid):
+        # CUBRID has no RELEASE SAVEPOINT; savepoints last until the
+        # transaction ends.
+        self.open_savepoints = max(self.open_savepoints - 1, 0)
+
+    def _savepoint_rollback(self, sid):
+        self.open_savepoints = max(self.open_savepoints - 1, 0)
+        super(DatabaseWrapper, self)._savepoint_rollback(sid)
+
+    def _enter_transaction_management(self, managed):
+        """
+        With AUTOCOMMIT, turns the driver's autocommit off when entering
+        transaction management, as the postgresql_psycopg2 backend switches
+        isolation levels.
+        """
+        if self.features.uses_autocommit and managed and self.autocommit:
+            self._set_autocommit(False)
+            self._autocommit_depth = len(self.transaction_state)
+
+    def _leave_transaction_management(self, managed):
+        """
+        With AUTOCOMMIT, turns the driver's autocommit back on when leaving
+        the block that turned it off.
+        """
+        if self._autocommit_depth == len(self.transaction_state):
+            self._autocommit_depth = None
+            if self.is_dirty():
+                # Django rolls the block back next, which must happen
+                # before autocommit is on again.
+                self._rollback()
+            self._set_autocommit(True)
+
+    def _set_autocommit(self, autocommit):
+        """
+        Switches the driver's autocommit mode. Savepoints are only used
+        while it is off, since there is no transaction to hold them
+        otherwise.
+        """
+        self.autocommit = autocommit
+        self.features.uses_savepoints = not autocommit
+        if self.connection is not None:
+            self.connection.set_autocommit(autocommit)
+
     def _valid_connection(self):
+        """
+        Checks that the current connection is usable. A connection used
+        within the last HEALTH_CHECK_INTERVAL seconds is trusted as is;
+        otherwise it is pinged. A dead connection is silently replaced only
+        between transactions; inside one, the error is raised instead, since
+        reconnecting would lose the work done so far.
+        """
         if self.connection is not None:
-            try:
-                self.connection.commit()
+            now = time.time()
+            if now - self._last_used < self.health_check_interval:
                 return True
-            except DatabaseError:
-                self.connection.close()
-                self.connection = None
+            try:
+                self._ping(self.connection)
+            except Database.Error, e:
+                if self.primaries is not None:
+                    self.primaries.failure(self.endpoint)
+                self._release_connection(discard=True)
+                if self.is_dirty():
+                    raise utils.DatabaseError, utils.DatabaseError(*tuple(e)), sys.exc_info()[2]
+                return False
+            self._last_used = now
+            return True
         return False
 
+    def _ping(self, connection):
+        "Raises a CUBRIDdb error if `connection` is no longer usable."
+        if hasattr(connection, 'ping'):
+            if connection.ping() in (0, False):
+                raise Database.OperationalError("Lost connection to CUBRID server")
+        else:
+            cursor = connection.cursor()
+            try:
+                cursor.execute("SELECT 1 FROM db_root")
+                cursor.fetchone()
+            finally:
+                cursor.close()
+
+    def _connection_url(self, endpoint=None):
+        settings_dict = self.settings_dict
+        host, port = settings_dict['HOST'], settings_dict['PORT']
+        if endpoint is not None:
+            host, port = endpoint.host, endpoint.port
+
+        # Connection to CUBRID database is made through connect() method.
+        # Syntax:
+        # connect (url[,user[password]])
+        #    url - CUBRID:host:port:db_name:db_user:db_password
+        #    user - Authorized username.
+        #    password - Password associated with the username.
+        url = "CUBRID"
+        if host.startswith('/'):
+            url += ':' + host
+        elif host:
+            url += ':' + host
+        else:
+            url += ':localhost'
+        if port:
+            url += ':' + port
+        if settings_dict['NAME']:
+            url += ':' + settings_dict['NAME']
+        if settings_dict['USER']:
+            url += ':' + settings_dict['USER']
+        if settings_dict['PASSWORD']:
+            url += ':' + settings_dict['PASSWORD']
+        return url
+
+    def _get_pool(self, endpoint=None):
+        """
+        Returns the connection pool for this database, or for one of its
+        PRIMARIES or REPLICAS, or None if pooling is not enabled in OPTIONS.
+        """
+        options = self.settings_dict.get('OPTIONS') or {}
+        if not options.get('POOL'):
+            return None
+        url = self._connection_url(endpoint)
+        return get_pool(url, lambda: Database.connect(url), options['POOL'])
+
+    def _get_current_pool(self):
+        return self._get_pool(self.endpoint)
+    pool = property(_get_current_pool)
+
+    def _release_connection(self, discard=False):
+        """
+        Hands the current connection back to the pool, or closes it when
+        pooling is disabled. Pooled connections are rolled back first so the
+        next user never inherits an open transaction.
+        """
+        connection, self.connection = self.connection, None
+        if connection is None:
+            return
+        self.statements.clear()
+        pool = self.pool
+        self.endpoint = None
+        self._return_connection(connection, pool, discard)
+
+    def _release_replica(self, discard=False):
+        connection, self.replica_connection = self.replica_connection, None
+        if connection is None:
+            return
+        self.replicas.release(self.replica_endpoint)
+        pool = self._get_pool(self.replica_endpoint)
+        self.replica_endpoint = None
+        self._return_connection(connection, pool, discard)
+
+    def _return_connection(self, connection, pool, discard):
+        if pool is None:
+            connection.close()
+            return
+        if not discard:
+            try:
+                connection.rollback()
+            except Database.Error:
+                discard = True
+        pool.put(connection, discard=discard)
+
     def _cursor(self):
         if not self._valid_connection():
-            settings_dict = self.settings_dict
-
-            # Connection to CUBRID database is made through connect() method.
-            # Syntax:
-            # connect (url[,user[password]])
-            #    url - CUBRID:host:port:db_name:db_user:db_password
-            #    user - Authorized username.
-            #    password - Password associated with the username.
-            url = "CUBRID"
-            if settings_dict['HOST'].startswith('/'):
-                url += ':' + settings_dict['HOST']
-            elif settings_dict['HOST']:
-                url += ':' + settings_dict['HOST']
-            else:
-                url += ':localhost'
-            if settings_dict['PORT']:
-                url += ':' + settings_dict['PORT']
-            if settings_dict['NAME']:
-                url += ':' + settings_dict['NAME']
-            if settings_dict['USER']:
-                url += ':' + settings_dict['USER']
-            if settings_dict['PASSWORD']:
-                url += ':' + settings_dict['PASSWORD']
-
-            self.connection = Database.connect(url)
+            self.connection = self._get_new_connection()
+            self.statements.clear()
+            if self.features.uses_autocommit:
+                # Pooled connections keep the mode their last user left.
+                self.connection.set_autocommit(self.autocommit)
             connection_created.send(sender=self.__class__, connection=self)
-        cursor = CursorWrapper(self.connection.cursor())
+        self._last_used = time.time()
+        cursor = CursorWrapper(self.connection.cursor(), self)
         return cursor
 
+    def replica_cursor(self):
+        """
+        Returns a cursor on this thread's replica connection, connecting to
+        a replica chosen by the balancing strategy if needed. Returns None
+        when every replica is ejected.
+        """
+        while self.replica_connection is None:
+            endpoint = self.replicas.choose()
+            if endpoint is None:
+                return None
+            try:
+                self.replica_connection = self._connect(endpoint)
+            except Database.Error:
+                self.replicas.failure(endpoint)
+                continue
+            self.replica_endpoint = endpoint
+            self.replicas.acquire(endpoint)
+        return self.replica_connection.cursor()
+
+    def _get_new_connection(self):
+        if self.primaries is None:
+            return self._connect()
+        for endpoint in self.primaries.failover_order():
+            try:
+                connection = self._connect(endpoint)
+            except Database.Error:
+                self.primaries.failure(endpoint)
+                error = sys.exc_info()
+                continue
+            self.primaries.success(endpoint)
+            self.endpoint = endpoint
+            return connection
+        raise error[0], error[1], error[2]
+
+    def _connect(self, endpoint=None):
+        pool = self._get_pool(endpoint)
+        if pool is None:
+            return Database.connect(self._connection_url(endpoint))
+        while True:
+            connection = pool.get()
+            # Connections that sat in the pool longer than the check interval
+            # may have been dropped by the broker in the meantime. Freshly
+            # opened ones are always trusted, so this loop terminates.
+            if time.time() - pool.last_used(connection) < self.health_check_interval:
+                return connection
+            try:
+                self._ping(connection)
+            except Database.Error:
+                pool.put(connection, discard=True)
+            else:
+                return connection
+
+    def close(self):
+        self._release_connection()
+        self._release_replica()
+
     def get_server_version(self):
         if not self.server_version:
             if not self._valid_connection():
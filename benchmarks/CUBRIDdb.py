@@ -0,0 +1,140 @@
+"""
+A stand-in for the CUBRIDdb driver, for running the benchmarks and the tests
+in ../tests offline.
+
+It implements just enough of the driver for the backend: connections,
+cursors, commit/rollback, autocommit and fetching. Statements are not parsed; every
+SELECT returns whatever the current responder gives for it (see respond()),
+and INSERTs hand out increasing ids. Calls are counted in CALLS.
+"""
+
+class Error(Exception):
+    pass
+
+class InterfaceError(Error):
+    pass
+
+class DatabaseError(Error):
+    pass
+
+class OperationalError(DatabaseError):
+    pass
+
+class IntegrityError(DatabaseError):
+    pass
+
+class ProgrammingError(DatabaseError):
+    pass
+
+CALLS = {}
+
+def count(name):
+    CALLS[name] = CALLS.get(name, 0) + 1
+
+def _no_rows(sql, params):
+    return []
+
+_responder = [_no_rows]
+
+def respond(responder):
+    """
+    Sets the function returning the rows, as a list of tuples, for each
+    (sql, params) that is not an INSERT, UPDATE or DELETE.
+    """
+    _responder[0] = responder or _no_rows
+
+class Cursor(object):
+    arraysize = 1
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.description = None
+        self.rowcount = -1
+        self.lastrowid = None
+        self._rows = []
+        self._position = 0
+
+    def execute(self, sql, params=None):
+        count('execute')
+        verb = sql.lstrip()[:6].upper()
+        if verb == 'INSERT':
+            self.connection.last_id += 1
+            self.lastrowid = self.connection.last_id
+            self._rows = []
+            self.rowcount = 1
+        elif verb in ('UPDATE', 'DELETE'):
+            self._rows = []
+            self.rowcount = 1
+        else:
+            self._rows = _responder[0](sql, params)
+            self.rowcount = len(self._rows)
+        self._position = 0
+        self.description = self._rows and [('c%d' % i, 0, 0, 0, 0, 0, 1)
+                                           for i in range(len(self._rows[0]))] or None
+        return self.rowcount
+
+    def executemany(self, sql, param_list):
+        count('executemany')
+        rows = 0
+        for params in param_list:
+            rows += self.execute(sql, params)
+        self.rowcount = rows
+        return rows
+
+    def fetchone(self):
+        count('fetchone')
+        if self._position >= len(self._rows):
+            return None
+        self._position += 1
+        return self._rows[self._position - 1]
+
+    def fetchmany(self, size=None):
+        count('fetchmany')
+        start = self._position
+        self._position = min(start + (size or self.arraysize), len(self._rows))
+        return self._rows[start:self._position]
+
+    def fetchall(self):
+        count('fetchall')
+        start, self._position = self._position, len(self._rows)
+        return self._rows[start:]
+
+    def close(self):
+        pass
+
+class Connection(object):
+    def __init__(self, url):
+        self.url = url
+        self.last_id = 0
+        self.autocommit = False
+
+    def cursor(self):
+        count('cursor')
+        return Cursor(self)
+
+    def commit(self):
+        count('commit')
+
+    def rollback(self):
+        count('rollback')
+
+    def set_autocommit(self, mode):
+        count('set_autocommit')
+        self.autocommit = mode
+
+    def close(self):
+        count('close')
+
+    def ping(self):
+        count('ping')
+        return 1
+
+    def insert_id(self):
+        return self.last_id
+
+    def server_version(self):
+        return '8.4.0.0000'
+
+def connect(url, *args):
+    count('connect')
+    return Connection(url)
@@ -0,0 +1,11 @@
+from django.db import models
+
+class Item(models.Model):
+    name = models.CharField(max_length=50)
+    value = models.IntegerField()
+    created = models.DateTimeField()
+    active = models.BooleanField()
+
+class Tag(models.Model):
+    item = models.ForeignKey(Item)
+    label = models.CharField(max_length=20)
@@ -0,0 +1,277 @@
+"""
+Benchmarks of the backend's own overhead, run against the stand-in CUBRIDdb
+driver in this directory, so no CUBRID server is needed.
+
+    python benchmarks/run.py [--output results.json] [--only NAME ...]
+    python benchmarks/run.py --compare before.json after.json [--threshold 10]
+
+Each benchmark is timed over several rounds and its best round is reported
+in operations per second, along with the peak number of objects one
+operation has alive at once, which any Python can measure, and, where
+tracemalloc is available (Python 3.4 and later), the peak memory it
+allocates. The backend measured is always the
+checkout containing this file, whatever copy Django may have installed, so
+runs on two commits can be compared with --compare, which exits with status
+1 if any benchmark got slower by more than the threshold percentage.
+"""
+
+import datetime
+import gc
+import imp
+import json
+import optparse
+import os
+import subprocess
+import sys
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCHMARKS_DIR)
+
+def setup():
+    # The stand-in driver and the benchmark app come first on the path.
+    sys.path.insert(0, BENCHMARKS_DIR)
+    # Registered before django.db is imported, as importing it loads the
+    # backend of the default database.
+    backend = imp.new_module('django.db.backends.cubrid')
+    backend.__path__ = [BACKEND_DIR]
+    backend.__file__ = os.path.join(BACKEND_DIR, '__init__.py')
+    sys.modules['django.db.backends.cubrid'] = backend
+
+    from django.conf import settings
+    settings.configure(
+        DATABASES={'default': {
+            'ENGINE': 'django.db.backends.cubrid',
+            'NAME': 'bench', 'USER': 'dba', 'PASSWORD': '',
+            'HOST': 'localhost', 'PORT': '33000',
+        }},
+        INSTALLED_APPS=('bench',),
+        DEBUG=False,
+    )
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+def peak_memory(op):
+    """
+    Returns the peak number of bytes allocated while running `op` once,
+    beyond what was allocated before, according to tracemalloc.
+    """
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        op()
+        return tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+
+def peak_objects(op):
+    """
+    Returns the peak number of objects tracked by the garbage collector
+    (instances, lists, dicts, tuples, frames...) alive at once while running
+    `op` once, beyond those alive before. It is sampled on every Python
+    function call and return, from the collector's allocation count, so it
+    misses what is allocated and freed within a single C call.
+    """
+    enabled = gc.isenabled()
+    gc.collect()
+    gc.disable()
+    peak = [0]
+    def sample(frame, event, arg):
+        count = gc.get_count()[0]
+        if count > peak[0]:
+            peak[0] = count
+    sys.setprofile(sample)
+    try:
+        op()
+    finally:
+        sys.setprofile(None)
+        if enabled:
+            gc.enable()
+    return peak[0]
+
+def row(i):
+    return (i, u'item %d' % i, i * 7, datetime.datetime(2011, 1, 1, 12, 0, i % 60), 1)
+
+def bench_statement_translation(connection, driver):
+    "Cursor round trip: SQL translation, parameter adaptation, rowcount."
+    cursor = connection.cursor()
+    params = [u'name', 42, datetime.datetime(2011, 1, 1), True]
+    def op():
+        cursor.execute("UPDATE bench_item SET name = %s, value = %s WHERE created > %s AND active = %s", params)
+        cursor.rowcount
+    return op
+
+def bench_valid_connection(connection, driver):
+    "Getting a cursor, which checks the connection first."
+    connection.cursor()
+    return connection.cursor
+
+def bench_insert_one(connection, driver):
+    from bench.models import Item
+    created = datetime.datetime(2011, 1, 1)
+    def op():
+        Item.objects.create(name=u'item', value=1, created=created, active=True)
+    return op
+
+def bench_get_one(connection, driver):
+    from bench.models import Item
+    canned = [row(1)]
+    driver.respond(lambda sql, params: canned)
+    def op():
+        Item.objects.get(pk=1)
+    return op
+
+def bench_update_one(connection, driver):
+    from bench.models import Item
+    def op():
+        Item.objects.filter(pk=1).update(value=2)
+    return op
+
+def bench_delete_one(connection, driver):
+    from bench.models import Item
+    def op():
+        Item.objects.filter(pk=1).delete()
+    return op
+
+def bench_bulk_insert_1000(connection, driver):
+    from bench.models import Item
+    from django.db.backends.cubrid.bulk import bulk_insert
+    created = datetime.datetime(2011, 1, 1)
+    def op():
+        bulk_insert(Item, [Item(name=u'item %d' % i, value=i, created=created, active=i % 2)
+                           for i in range(1000)])
+    return op
+
+def bench_iterate_10000(connection, driver):
+    from bench.models import Item
+    canned = [row(i) for i in range(10000)]
+    driver.respond(lambda sql, params: canned)
+    def op():
+        for item in Item.objects.all():
+            pass
+    return op
+
+def bench_compile_select(connection, driver):
+    from bench.models import Tag
+    def op():
+        qs = Tag.objects.select_related('item').filter(
+            item__value__gt=3, label__startswith=u'a').order_by('-item__created')[10:20]
+        qs.query.get_compiler(using='default').as_sql()
+    return op
+
+BENCHMARKS = [
+    # (name, function, operations per round)
+    ('statement_translation', bench_statement_translation, 2000),
+    ('valid_connection', bench_valid_connection, 2000),
+    ('insert_one', bench_insert_one, 500),
+    ('get_one', bench_get_one, 500),
+    ('update_one', bench_update_one, 500),
+    ('delete_one', bench_delete_one, 500),
+    ('bulk_insert_1000', bench_bulk_insert_1000, 5),
+    ('iterate_10000', bench_iterate_10000, 3),
+    ('compile_select', bench_compile_select, 500),
+]
+
+def measure(op, number, rounds):
+    op()  # Warm up caches.
+    times = []
+    for i in range(rounds):
+        started = time.time()
+        for j in xrange(number):
+            op()
+        times.append(time.time() - started)
+    best = min(times)
+    result = {
+        'ops_per_sec': number / best,
+        'best_round': best,
+        'mean_round': sum(times) / len(times),
+        'operations': number,
+        'peak_objects_per_op': peak_objects(op),
+    }
+    if tracemalloc is not None:
+        result['peak_bytes_per_op'] = peak_memory(op)
+    return result
+
+def git_revision():
+    try:
+        process = subprocess.Popen(['git', 'rev-parse', '--short', 'HEAD'],
+                                   cwd=BACKEND_DIR, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        return process.communicate()[0].strip() or None
+    except OSError:
+        return None
+
+def run(only, rounds):
+    setup()
+    import CUBRIDdb
+    from django.db import connection
+    results = {}
+    for name, function, number in BENCHMARKS:
+        if only and name not in only:
+            continue
+        CUBRIDdb.respond(None)
+        op = function(connection, CUBRIDdb)
+        results[name] = measure(op, number, rounds)
+        line = '%-24s %12.1f ops/s %10d peak objects/op' % (
+            name, results[name]['ops_per_sec'], results[name]['peak_objects_per_op'])
+        if 'peak_bytes_per_op' in results[name]:
+            line += ' %10d peak bytes/op' % results[name]['peak_bytes_per_op']
+        sys.stderr.write(line + '\n')
+    import django
+    return {
+        'revision': git_revision(),
+        'python': sys.version.split()[0],
+        'django': django.get_version(),
+        'tracemalloc': tracemalloc is not None,
+        'rounds': rounds,
+        'results': results,
+    }
+
+def compare(before_file, after_file, threshold):
+    before = json.load(open(before_file))
+    after = json.load(open(after_file))
+    regressions = []
+    memory = before.get('tracemalloc') and after.get('tracemalloc')
+    header = '%-24s %12s %12s %8s %22s' % ('benchmark', 'before', 'after', 'change', 'peak objects/op')
+    if memory:
+        header += ' %22s' % 'peak bytes/op'
+    print header
+    for name in sorted(after['results']):
+        if name not in before['results']:
+            continue
+        old, new = before['results'][name], after['results'][name]
+        change = (new['ops_per_sec'] / old['ops_per_sec'] - 1) * 100
+        line = '%-24s %12.1f %12.1f %+7.1f%%' % (name, old['ops_per_sec'], new['ops_per_sec'], change)
+        line += ' %10s -> %9s' % (old.get('peak_objects_per_op', '-'), new.get('peak_objects_per_op', '-'))
+        if memory:
+            line += ' %10d -> %9d' % (old['peak_bytes_per_op'], new['peak_bytes_per_op'])
+        print line
+        if change < -threshold:
+            regressions.append(name)
+    if regressions:
+        print 'Slower by more than %s%%: %s' % (threshold, ', '.join(regressions))
+        return 1
+    return 0
+
+def main():
+    parser = optparse.OptionParser(usage='%prog [--output FILE] [--only NAME ...] | --compare BEFORE AFTER')
+    parser.add_option('--output', help='write the results to this JSON file instead of stdout')
+    parser.add_option('--only', action='append', default=[], help='run only this benchmark (repeatable)')
+    parser.add_option('--rounds', type='int', default=5)
+    parser.add_option('--compare', nargs=2, metavar='BEFORE AFTER', help='compare two result files')
+    parser.add_option('--threshold', type='float', default=10.0,
+                      help='slowdown, in percent, reported as a regression by --compare')
+    options, args = parser.parse_args()
+    if options.compare:
+        return compare(options.compare[0], options.compare[1], options.threshold)
+    report = json.dumps(run(options.only, options.rounds), indent=2, sort_keys=True)
+    if options.output:
+        open(options.output, 'w').write(report + '\n')
+    else:
+        print report
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,396 @@
+"""
+Bulk data loading for the CUBRID backend.
+
+bulk_insert() sends multi-row INSERTs through the connection. For much
+larger loads, loaddb() and load_fixtures() write the rows to a temporary
+object file and hand it to the `cubrid loaddb` utility, which loads it
+without a round trip per statement:
+
+    from django.db.backends.cubrid.bulk import loaddb, load_fixtures
+
+    loaddb(Event(kind=1, created=now) for i in xrange(10 ** 8))
+    load_fixtures(['initial_data.json', 'events.xml.gz'])
+
+Secondary indexes of the loaded models are dropped before the load and
+rebuilt by loaddb once all rows are in, which is much faster than
+maintaining them row by row. Unique indexes, primary and foreign keys stay
+in place, so rows must come after the rows they reference, as with
+loaddata. Rows rejected by loaddb are reported in a LoadError, traced back
+to the object or fixture entry they came from.
+
+loaddb runs in its own transactions, committed every `commit_every` rows
+or at the end, so the connection must not have uncommitted changes. The
+database password is never put on loaddb's command line, where other users
+could read it with ps; loaddb reads it from a pipe when it prompts for it.
+"""
+
+import bz2
+import datetime
+import decimal
+import gzip
+import os
+import re
+import struct
+import subprocess
+import tempfile
+
+from django.core import serializers
+from django.core.management.color import no_style
+from django.db import connections, router, transaction, utils, DEFAULT_DB_ALIAS
+from django.db.models import AutoField
+from django.db.models.sql import InsertQuery
+from django.utils.encoding import smart_str
+
+# The statements of the indexes loaddb rebuilds after loading.
+index_re = re.compile(r'^CREATE (?:REVERSE )?INDEX (\S+) ON (\S+)')
+
+# How loaddb refers to the object file line of a rejected row.
+error_line_re = re.compile(r'\bline (\d+)', re.I)
+
+# One record per object file line in the side file mapping lines back to
+# their source: the index of the source name and the entry number in it.
+ORIGIN = struct.Struct('<iq')
+
+FIXTURE_OPENERS = {
+    '.gz': gzip.GzipFile,
+    '.bz2': bz2.BZ2File,
+}
+
+def bulk_insert(model, objs, using=None):
+    """
+    Inserts the model instances in `objs` (any iterable, including a
+    generator) using multi-row INSERT statements, the equivalent of
+    QuerySet.bulk_create() in later Django versions. Like it, save() is not
+    called and no signals are sent. Primary keys are set on objects saved
+    without one only when OPTIONS['BULK_INSERT_IDS'] is enabled.
+
+    Objects are consumed one batch at a time, so arbitrarily long iterables
+    can be inserted in constant memory.
+    """
+    if using is None:
+        using = router.db_for_write(model)
+    connection = connections[using]
+    fields = model._meta.local_fields
+    non_auto_fields = [f for f in fields if not isinstance(f, AutoField)]
+    batch_size = connection.ops.bulk_batch_size(fields, None)
+
+    if not transaction.is_managed(using=using):
+        transaction.enter_transaction_management(using=using)
+        forced_managed = True
+    else:
+        forced_managed = False
+    try:
+        with_pk, without_pk = [], []
+        for obj in objs:
+            if obj.pk is None:
+                without_pk.append(obj)
+                if len(without_pk) == batch_size:
+                    _insert(model, without_pk, non_auto_fields, using)
+                    without_pk = []
+            else:
+                with_pk.append(obj)
+                if len(with_pk) == batch_size:
+                    _insert(model, with_pk, fields, using)
+                    with_pk = []
+        if with_pk:
+            _insert(model, with_pk, fields, using)
+        if without_pk:
+            _insert(model, without_pk, non_auto_fields, using)
+        if forced_managed:
+            transaction.commit(using=using)
+        else:
+            transaction.commit_unless_managed(using=using)
+    finally:
+        if forced_managed:
+            transaction.leave_transaction_management(using=using)
+
+def _insert(model, objs, fields, using):
+    query = InsertQuery(model)
+    query.objs = objs
+    query.fields = fields
+    query.raw = False
+    query.get_compiler(using=using).execute_sql()
+
+class LoadError(utils.DatabaseError):
+    """
+    Raised when loaddb fails. `errors` lists (source, line, message) for
+    each rejected row it reported: the object or fixture entry the row came
+    from, its object file line and loaddb's message.
+    """
+    def __init__(self, message, errors=()):
+        super(LoadError, self).__init__(message)
+        self.errors = list(errors)
+
+def loaddb(objs, using=None, commit_every=None, defer_indexes=True):
+    """
+    Loads the model instances in `objs` (any iterable, including a
+    generator) with `cubrid loaddb` and returns the number of rows loaded.
+    Objects may be of several models, which the routers must send to the
+    same database unless `using` is given. Like bulk_insert(), save() is
+    not called, no signals are sent and primary keys are not set on objects
+    saved without one, but fields are filled in by pre_save(), as for
+    auto_now dates.
+    """
+    def records():
+        for number, obj in enumerate(objs):
+            yield obj, 0, number
+    return _load(records(), ['objects'], using, commit_every, defer_indexes, raw=False)
+
+def load_fixtures(fixture_files, using=DEFAULT_DB_ALIAS, commit_every=None, defer_indexes=True):
+    """
+    Loads the fixture files `fixture_files`, named with their serialization
+    format as extension, optionally followed by .gz or .bz2, with `cubrid
+    loaddb`. Many-to-many relations are loaded too. Returns the number of
+    rows loaded.
+    """
+    def records():
+        for source, fixture_file in enumerate(fixture_files):
+            name, compression = os.path.splitext(fixture_file)
+            opener = FIXTURE_OPENERS.get(compression)
+            if opener is None:
+                name, opener = fixture_file, open
+            format = os.path.splitext(name)[1][1:]
+            fixture = opener(fixture_file, 'rb')
+            try:
+                for number, deserialized in enumerate(serializers.deserialize(format, fixture, using=using)):
+                    obj = deserialized.object
+                    yield obj, source, number
+                    for accessor, pks in (deserialized.m2m_data or {}).items():
+                        through = getattr(obj.__class__, accessor).through
+                        if not through._meta.auto_created:
+                            continue
+                        field = obj._meta.get_field(accessor)
+                        from_attname = through._meta.get_field(field.m2m_field_name()).attname
+                        to_attname = through._meta.get_field(field.m2m_reverse_field_name()).attname
+                        for pk in pks:
+                            yield through(**{from_attname: obj.pk, to_attname: pk}), source, number
+            finally:
+                fixture.close()
+    # Fixture values are loaded as they are, like loaddata's raw saves.
+    return _load(records(), list(fixture_files), using, commit_every, defer_indexes, raw=True)
+
+def _load(records, sources, using, commit_every, defer_indexes, raw):
+    if using is not None:
+        _check_clean(using)
+    data_file = tempfile.NamedTemporaryFile(prefix='django_cubrid_', suffix='.obj', delete=False)
+    origins_file = tempfile.TemporaryFile()
+    index_file = None
+    try:
+        writer = ObjectFileWriter(data_file, origins_file, raw)
+        for obj, source, number in records:
+            writer.write(obj, source, number)
+        data_file.close()
+        if not writer.rows:
+            return 0
+        if using is None:
+            using = _route(writer.models)
+            _check_clean(using)
+        connection = connections[using]
+
+        deferred = []
+        if defer_indexes:
+            deferred = _drop_indexes(connection, writer.models)
+        options = []
+        if deferred:
+            index_file = tempfile.NamedTemporaryFile(prefix='django_cubrid_', suffix='.sql', delete=False)
+            index_file.write('\n'.join(deferred) + '\n')
+            index_file.close()
+            options.append('--index-file=%s' % index_file.name)
+        if commit_every:
+            options.append('--periodic-commit=%d' % commit_every)
+
+        status, output = _run_loaddb(connection, data_file.name, options)
+        errors = []
+        for line in output.splitlines():
+            match = error_line_re.search(line)
+            if match:
+                line_number = int(match.group(1))
+                errors.append((writer.origin(line_number, sources), line_number, line.strip()))
+        if status != 0 or errors:
+            if deferred:
+                # The index file may not have been run.
+                _create_indexes(connection, deferred)
+            raise LoadError("cubrid loaddb failed with status %s: %s" % (status, output.strip()), errors)
+
+        for table in writer.tables:
+            connection.table_written(table)
+        _reset_auto_increments(connection, writer.explicit_pk_models)
+        return writer.rows
+    finally:
+        origins_file.close()
+        os.unlink(data_file.name)
+        if index_file is not None:
+            os.unlink(index_file.name)
+
+def _check_clean(using):
+    if transaction.is_dirty(using=using):
+        raise transaction.TransactionManagementError(
+            "loaddb runs outside of the connection's transaction; commit pending changes first.")
+
+def _route(models):
+    "Returns the database the routers send writes of every one of `models` to."
+    databases = set([router.db_for_write(model) for model in models])
+    if len(databases) > 1:
+        raise ValueError("loaddb() got objects routed to several databases (%s); "
+                         "load them separately or pass `using`." % ', '.join(sorted(databases)))
+    return databases.pop()
+
+class ObjectFileWriter(object):
+    """
+    Writes model instances in loaddb's object file format: a `%class` line
+    naming the table and columns, then one line per row, repeated whenever
+    the model or the columns change. Each line's origin is recorded in
+    `origins_file`, so rows loaddb rejects can be traced back. Unless `raw`
+    is set, values go through each field's pre_save(), as in bulk_insert().
+    """
+    def __init__(self, data_file, origins_file, raw=False):
+        self.data_file = data_file
+        self.origins_file = origins_file
+        self.raw = raw
+        self.section = None
+        self.rows = 0
+        self.models = []
+        self.tables = set()
+        self.explicit_pk_models = set()
+
+    def write(self, obj, source, number):
+        model = obj.__class__
+        opts = model._meta
+        fields = opts.local_fields
+        if obj.pk is None:
+            fields = [f for f in fields if not isinstance(f, AutoField)]
+        elif isinstance(opts.pk, AutoField):
+            self.explicit_pk_models.add(model)
+        section = (model, len(fields))
+        if section != self.section:
+            self.section = section
+            if model not in self.models:
+                self.models.append(model)
+                self.tables.add(opts.db_table.lower())
+            self._write_line('%%class [%s] (%s)' % (opts.db_table,
+                ' '.join(['[%s]' % f.column for f in fields])), -1, -1)
+        values = []
+        for f in fields:
+            if self.raw:
+                value = getattr(obj, f.attname)
+            else:
+                value = f.pre_save(obj, True)
+            value = f.get_prep_value(value)
+            if f.rel is not None:
+                # Keys given as strings, as in fixtures, take the type of
+                # the key they point to.
+                value = f.rel.get_related_field().get_prep_value(value)
+            values.append(self.literal(value))
+        self._write_line(' '.join(values), source, number)
+        self.rows += 1
+
+    def _write_line(self, line, source, number):
+        if isinstance(line, unicode):
+            line = line.encode('utf-8')
+        self.data_file.write(line + '\n')
+        # Strings may contain line breaks.
+        self.origins_file.write(ORIGIN.pack(source, number) * (line.count('\n') + 1))
+
+    def literal(self, value):
+        if value is None:
+            return 'NULL'
+        if isinstance(value, bool):
+            return value and '1' or '0'
+        if isinstance(value, (int, long, decimal.Decimal)):
+            return str(value)
+        if isinstance(value, float):
+            return repr(value)
+        if isinstance(value, datetime.datetime):
+            if value.tzinfo is not None:
+                raise ValueError("Timezone-aware datetime not implemented yet.")
+            return "datetime '%s.%03d'" % (value.strftime('%Y-%m-%d %H:%M:%S'), value.microsecond // 1000)
+        if isinstance(value, datetime.date):
+            return "date '%s'" % value.isoformat()
+        if isinstance(value, datetime.time):
+            return "time '%s'" % value.strftime('%H:%M:%S')
+        if not isinstance(value, basestring):
+            value = unicode(value)
+        return "'%s'" % value.replace("'", "''")
+
+    def origin(self, line_number, sources):
+        "Describes where the row on object file line `line_number` came from."
+        self.origins_file.seek((line_number - 1) * ORIGIN.size)
+        packed = self.origins_file.read(ORIGIN.size)
+        if len(packed) != ORIGIN.size:
+            return None
+        source, number = ORIGIN.unpack(packed)
+        if source < 0:
+            return None
+        return '%s, entry %d' % (sources[source], number + 1)
+
+def _run_loaddb(connection, data_file, options):
+    """
+    Runs `cubrid loaddb` on `data_file` and returns its exit status and
+    output. The password is written to loaddb's standard input, for the
+    prompt it shows when none is given on the command line.
+    """
+    settings_dict = connection.settings_dict
+    database = settings_dict['NAME']
+    if settings_dict['HOST'] and settings_dict['HOST'] not in ('localhost', '127.0.0.1'):
+        database = '%s@%s' % (database, settings_dict['HOST'])
+    args = ['cubrid', 'loaddb', '--CS-mode', '--no-statistics', '--data-file=%s' % data_file]
+    if settings_dict['USER']:
+        args.append('--user=%s' % settings_dict['USER'])
+    password = settings_dict['PASSWORD']
+    kwargs = {}
+    if password and os.name == 'posix':
+        # Without a controlling terminal, the prompt reads standard input
+        # instead of the terminal's.
+        kwargs['preexec_fn'] = os.setsid
+    process = subprocess.Popen(args + options + [database], stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE, stderr=subprocess.STDOUT, **kwargs)
+    output = process.communicate(password and smart_str(password) + '\n' or '')[0]
+    return process.returncode, output
+
+def _drop_indexes(connection, models):
+    """
+    Drops the existing non-unique indexes Django creates for `models` and
+    returns the statements recreating them.
+    """
+    deferred = []
+    cursor = connection.cursor()
+    for model in models:
+        for sql in connection.creation.sql_indexes_for_model(model, no_style()):
+            match = index_re.match(sql)
+            if match is None:
+                continue
+            try:
+                cursor.execute('DROP INDEX %s ON %s' % match.groups())
+            except utils.DatabaseError:
+                # Not there; the load doesn't create it either.
+                continue
+            deferred.append(sql)
+    connection._commit()
+    return deferred
+
+def _create_indexes(connection, statements):
+    cursor = connection.cursor()
+    for sql in statements:
+        try:
+            cursor.execute(sql.rstrip(';'))
+        except utils.DatabaseError:
+            # Already rebuilt by loaddb.
+            pass
+    connection._commit()
+
+def _reset_auto_increments(connection, models):
+    """
+    Moves the AUTO_INCREMENT counters of `models` past the primary keys
+    loaded explicitly, which don't advance them.
+    """
+    if not models:
+        return
+    qn = connection.ops.quote_name
+    cursor = connection.cursor()
+    for model in models:
+        opts = model._meta
+        cursor.execute('SELECT MAX(%s) FROM %s' % (qn(opts.pk.column), qn(opts.db_table)))
+        maximum = cursor.fetchone()[0]
+        if maximum is not None:
+            cursor.execute('ALTER TABLE %s AUTO_INCREMENT = %d' % (qn(opts.db_table), maximum + 1))
+    connection._commit()
@@ -0,0 +1,135 @@
+"""
+Bounded caches used by the CUBRID backend.
+"""
+
+import threading
+
+# Indexes into the linked list nodes, which are plain lists for speed.
+PREV, NEXT, KEY, VALUE = 0, 1, 2, 3
+
+class LRUCache(object):
+    """
+    A mapping holding at most `max_size` entries, evicting the least recently
+    used one when full. A `max_size` of 0 disables caching altogether.
+
+    Entries are kept in a circular doubly linked list, so lookups, inserts
+    and evictions are all O(1). Hits, misses and evictions are counted for
+    stats(); subclasses can override evicted() to learn which entries were
+    dropped to make room.
+    """
+    def __init__(self, max_size=128):
+        self.max_size = max_size
+        self._map = {}
+        self._root = root = []
+        root[:] = [root, root, None, None]
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key, default=None):
+        self._lock.acquire()
+        try:
+            node = self._map.get(key)
+            if node is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            # Move the node to the most recently used end.
+            node[PREV][NEXT] = node[NEXT]
+            node[NEXT][PREV] = node[PREV]
+            root = self._root
+            last = root[PREV]
+            last[NEXT] = root[PREV] = node
+            node[PREV] = last
+            node[NEXT] = root
+            return node[VALUE]
+        finally:
+            self._lock.release()
+
+    def set(self, key, value):
+        if not self.max_size:
+            return
+        oldest = None
+        self._lock.acquire()
+        try:
+            node = self._map.get(key)
+            if node is not None:
+                node[VALUE] = value
+                return
+            root = self._root
+            if len(self._map) >= self.max_size:
+                oldest = root[NEXT]
+                oldest[PREV][NEXT] = oldest[NEXT]
+                oldest[NEXT][PREV] = oldest[PREV]
+                del self._map[oldest[KEY]]
+                self.evictions += 1
+            last = root[PREV]
+            node = [last, root, key, value]
+            last[NEXT] = root[PREV] = self._map[key] = node
+        finally:
+            self._lock.release()
+        if oldest is not None:
+            self.evicted(oldest[KEY], oldest[VALUE])
+
+    def evicted(self, key, value):
+        "Called, outside of the lock, for each entry dropped to make room."
+        pass
+
+    def pop(self, key, default=None):
+        self._lock.acquire()
+        try:
+            node = self._map.pop(key, None)
+            if node is None:
+                return default
+            node[PREV][NEXT] = node[NEXT]
+            node[NEXT][PREV] = node[PREV]
+            return node[VALUE]
+        finally:
+            self._lock.release()
+
+    def pop_oldest(self):
+        "Removes the least recently used entry and returns its (key, value), or None."
+        self._lock.acquire()
+        try:
+            node = self._root[NEXT]
+            if node is self._root:
+                return None
+            node[PREV][NEXT] = node[NEXT]
+            node[NEXT][PREV] = node[PREV]
+            del self._map[node[KEY]]
+            self.evictions += 1
+            return node[KEY], node[VALUE]
+        finally:
+            self._lock.release()
+
+    def clear(self):
+        self._lock.acquire()
+        try:
+            self._map.clear()
+            root = self._root
+            root[:] = [root, root, None, None]
+        finally:
+            self._lock.release()
+
+    def values(self):
+        self._lock.acquire()
+        try:
+            return [node[VALUE] for node in self._map.itervalues()]
+        finally:
+            self._lock.release()
+
+    def __contains__(self, key):
+        return key in self._map
+
+    def __len__(self):
+        return len(self._map)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._map),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': lookups and float(self.hits) / lookups or 0.0,
+        }
@@ -1,4 +1,17 @@
+import copy
+import datetime
+
+from django.db.backends.util import typecast_timestamp
+from django.db.models.fields import DateField, DateTimeField
 from django.db.models.sql import compiler
+from django.db.models.sql.aggregates import Count
+from django.db.models.sql.constants import MULTI, SINGLE
+from django.db.models.sql.datastructures import EmptyResultSet
+from django.db.models.sql.where import AND, Constraint, WhereNode
+from django.db.backends.cubrid.convert import decode
+from django.db.backends.cubrid.counts import get_count_cache
+from django.db.backends.cubrid.query import get_hints, query_hints, query_ordering
+from django.db.backends.cubrid.resultcache import MISS, make_key, tables_read
 
 class SQLCompiler(compiler.SQLCompiler):
 
@@ -9,61 +22,57 @@ class SQLCompiler(compiler.SQLCompiler):
 
         If 'with_limits' is False, any limit/offset information is not included
         in the query.
+
+        Everything but the WHERE and HAVING clauses and the limits is taken
+        from the connection's compiled SQL cache when a query of the same
+        shape was compiled before; see template_key().
         """
         if with_limits and self.query.low_mark == self.query.high_mark:
             return '', ()
 
         self.pre_sql_setup()
-        out_cols = self.get_columns(with_col_aliases)
-        ordering, ordering_group_by = self.get_ordering()
-
-        # This must come after 'select' and 'ordering' -- see docstring of
-        # get_from_clause() for details.
-        from_, f_params = self.get_from_clause()
 
         qn = self.quote_name_unless_alias
 
-        where, w_params = self.query.where.as_sql(qn=qn, connection=self.connection)
+        where, w_params = date_ranges(self.query.where).as_sql(qn=qn, connection=self.connection)
         having, h_params = self.query.having.as_sql(qn=qn, connection=self.connection)
+
+        cache = self.connection.compiled_sql
+        key = cache.max_size and self.template_key(with_col_aliases, where, having) or None
+        template = key is not None and cache.get(key) or None
+        if template is None:
+            template = self.compile_template(with_col_aliases)
+            if key is not None:
+                cache.set(key, template)
+        else:
+            self.query.ordering_aliases = template.ordering_aliases
+
+        hints = get_hints(self.query)
+        keyset = hints.get('keyset')
+        if keyset is not None:
+            self.check_keyset(keyset)
+
         params = []
         for val in self.query.extra_select.itervalues():
             params.extend(val[1])
 
-        result = ['SELECT']
-        if self.query.distinct:
-            result.append('DISTINCT')
-        result.append(', '.join(out_cols + self.query.ordering_aliases))
-
-        result.append('FROM')
-        result.extend(from_)
-        params.extend(f_params)
+        result = [template.select]
+        params.extend(template.from_params)
 
         if where:
             result.append('WHERE %s' % where)
             params.extend(w_params)
 
-        grouping, gb_params = self.get_grouping()
-        if grouping:
-            if ordering:
-                # If the backend can't group by PK (i.e., any database
-                # other than MySQL), then any fields mentioned in the
-                # ordering clause needs to be in the group by clause.
-                if not self.connection.features.allows_group_by_pk:
-                    for col, col_params in ordering_group_by:
-                        if col not in grouping:
-                            grouping.append(str(col))
-                            gb_params.extend(col_params)
-            else:
-                ordering = self.connection.ops.force_no_ordering()
-            result.append('GROUP BY %s' % ', '.join(grouping))
-            params.extend(gb_params)
+        if template.grouping:
+            result.append(template.grouping)
+            params.extend(template.group_params)
 
         if having:
             result.append('HAVING %s' % having)
             params.extend(h_params)
 
-        if ordering:
-            result.append('ORDER BY %s' % ', '.join(ordering))
+        if template.order_by:
+            result.append(template.order_by)
 
         if with_limits:
             if self.query.high_mark is not None:
@@ -80,11 +89,498 @@ class SQLCompiler(compiler.SQLCompiler):
                     else:
                         result.append('LIMIT %d' % val)
 
+        using_index = hints.get('using_index')
+        if using_index:
+            qn2 = self.connection.ops.quote_name
+            result.append('USING INDEX %s' % ', '.join([qn2(name) for name in using_index]))
+
         return ' '.join(result), tuple(params)
 
+    def compile_template(self, with_col_aliases):
+        """
+        Compiles the parts of the query that don't depend on parameter
+        values: the select list, FROM, GROUP BY and ORDER BY clauses.
+        """
+        out_cols = self.get_columns(with_col_aliases)
+        ordering, ordering_group_by = self.get_ordering()
+
+        # This must come after 'select' and 'ordering' -- see docstring of
+        # get_from_clause() for details.
+        from_, f_params = self.get_from_clause()
+
+        result = ['SELECT']
+        if self.query.distinct:
+            result.append('DISTINCT')
+        result.append(', '.join(out_cols + self.query.ordering_aliases))
+        result.append('FROM')
+        result.extend(from_)
+        template = SelectTemplate(' '.join(result), f_params, ordering,
+                                  self.query.ordering_aliases)
+
+        grouping, gb_params = self.get_grouping()
+        order_by = ordering
+        if grouping:
+            if ordering:
+                # If the backend can't group by PK (i.e., any database
+                # other than MySQL), then any fields mentioned in the
+                # ordering clause needs to be in the group by clause.
+                if not self.connection.features.allows_group_by_pk:
+                    for col, col_params in ordering_group_by:
+                        if col not in grouping:
+                            grouping.append(str(col))
+                            gb_params.extend(col_params)
+            else:
+                order_by = self.connection.ops.force_no_ordering()
+            template.grouping = 'GROUP BY %s' % ', '.join(grouping)
+            template.group_params = gb_params
+
+        if order_by:
+            template.order_by = 'ORDER BY %s' % ', '.join(order_by)
+        return template
+
+    def template_key(self, with_col_aliases, where, having):
+        """
+        Returns a key identifying the shape of the query, or None if the
+        query contains parts that can't be reliably fingerprinted, in which
+        case it is always compiled in full.
+
+        The key covers everything compile_template() reads: selected
+        columns, joins and their reference counts, ordering, grouping,
+        aggregates and deferred fields, plus the rendered WHERE and HAVING
+        SQL (not their parameters). Limits aren't part of it; they are
+        rendered for every query.
+        """
+        query = self.query
+        for col in query.select:
+            if not isinstance(col, (list, tuple)):
+                return None
+        if query.group_by is not None:
+            for col in query.group_by:
+                if not isinstance(col, (list, tuple)):
+                    return None
+        aggregates = []
+        for alias, aggregate in query.aggregate_select.items():
+            aggregates.append((alias, aggregate.__class__, aggregate.col,
+                               tuple(sorted(aggregate.extra.items()))))
+        deferred_names, defer = query.deferred_loading
+        key = (
+            self.__class__, with_col_aliases, where, having,
+            query.model, query.distinct, query.default_cols,
+            tuple(query.tables),
+            tuple(sorted(query.alias_map.items())),
+            tuple(sorted(query.alias_refcount.items())),
+            tuple([(table, tuple(aliases)) for table, aliases in sorted(query.table_map.items())]),
+            tuple(sorted(query.included_inherited_models.items())),
+            tuple([tuple(col) for col in query.select]),
+            tuple([tuple(col) for col in query.related_select_cols]),
+            tuple([(alias, value[0]) for alias, value in query.extra_select.items()]),
+            tuple(query.extra_tables),
+            tuple(query.order_by), tuple(query.extra_order_by),
+            query.default_ordering, query.standard_ordering,
+            query.group_by is not None and tuple([tuple(col) for col in query.group_by]),
+            tuple(aggregates),
+            (frozenset(deferred_names), defer),
+        )
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def check_keyset(self, keyset):
+        """
+        Raises ValueError if the query is now ordered differently than when
+        CubridQuerySet.after() added its keyset condition, which only selects
+        the following rows in that ordering. Unordered queries, like those of
+        delete(), select the same rows and are let through.
+        """
+        ordering = tuple(query_ordering(self.query))
+        if ordering and (ordering, self.query.standard_ordering) != keyset:
+            raise ValueError("The ordering of a queryset can't change after after().")
+
+    def results_iter(self):
+        """
+        Returns an iterator over the results from executing this query,
+        like Django's, but with BooleanField and NullBooleanField columns,
+        which CUBRID returns as smallints, converted one chunk of rows at a
+        time rather than by a resolve_columns() call per row.
+        """
+        steps = None
+        has_aggregate_select = bool(self.query.aggregate_select)
+        for rows in self.execute_sql(MULTI):
+            if steps is None:
+                # related_select_fields isn't populated until execute_sql()
+                # has been called.
+                steps = self.boolean_steps(self.result_fields())
+            rows = decode(rows, steps)
+            if not has_aggregate_select:
+                for row in rows:
+                    yield row
+                continue
+            aggregate_start = len(self.query.extra_select.keys()) + len(self.query.select)
+            aggregate_end = aggregate_start + len(self.query.aggregate_select)
+            for row in rows:
+                yield tuple(row[:aggregate_start]) + tuple([
+                    self.query.resolve_aggregate(value, aggregate, self.connection)
+                    for (alias, aggregate), value
+                    in zip(self.query.aggregate_select.items(), row[aggregate_start:aggregate_end])
+                ]) + tuple(row[aggregate_end:])
+
+    def result_fields(self):
+        "Returns the model fields of the selected columns, as Django's results_iter() does."
+        if self.query.select_fields:
+            fields = self.query.select_fields + self.query.related_select_fields
+        else:
+            fields = self.query.model._meta.fields
+        # If the field was deferred, exclude it from being passed
+        # into `resolve_columns` because it wasn't selected.
+        only_load = self.deferred_to_columns()
+        if only_load:
+            db_table = self.query.model._meta.db_table
+            fields = [f for f in fields if db_table in only_load and
+                      f.column in only_load[db_table]]
+        return fields
+
+    def boolean_steps(self, fields):
+        "Returns the decoding steps converting the boolean columns among `fields`."
+        offset = len(self.query.extra_select)
+        return tuple([(offset + index, bool) for index, field in enumerate(fields)
+                      if field is not None and
+                      field.get_internal_type() in ('BooleanField', 'NullBooleanField')])
+
+    def resolve_columns(self, row, fields=()):
+        return decode([row], self.boolean_steps(fields))[0]
+
+    def execute_sql(self, result_type=MULTI):
+        """
+        Runs the query like Django does, except that MULTI results are
+        streamed in chunks of OPTIONS['FETCH_SIZE'] rows through the
+        backend's cursor instead of fixed 100-row chunks.
+
+        Queries with a `cache` hint are answered from the connection's
+        result cache when possible, and COUNT(*) queries from the count
+        cache when OPTIONS['COUNTS'] or an `approximate_count` hint allow it;
+        see counts.py.
+        """
+        hints = getattr(self.query, 'cubrid_hints', None)
+        if not hints or 'timeout' not in hints:
+            return self._execute_sql(result_type)
+        # The cursor reads timeouts from the hints active in the thread.
+        block = query_hints(timeout=hints['timeout'])
+        block.__enter__()
+        try:
+            return self._execute_sql(result_type)
+        finally:
+            block.__exit__(None, None, None)
+
+    def _execute_sql(self, result_type):
+        if result_type == SINGLE and not self.connection.is_dirty() and self.is_count():
+            hint = get_hints(self.query).get('approximate_count')
+            if hint or self.connection.counts is not None:
+                return self.execute_count(hint)
+        if (result_type in (MULTI, SINGLE) and self.connection.result_cache is not None and
+                not self.connection.is_dirty()):
+            ttl = get_hints(self.query).get('cache')
+            if ttl:
+                return self.execute_cached(result_type, ttl is not True and ttl or None)
+        if result_type != MULTI:
+            return super(SQLCompiler, self).execute_sql(result_type)
+        cursor = super(SQLCompiler, self).execute_sql(None)
+        if cursor is None:
+            # The query can't return any rows.
+            return iter([])
+        chunks = cursor.fetch_chunks()
+        if self.query.ordering_aliases:
+            chunks = trim_chunks(chunks, len(self.query.ordering_aliases))
+        if not self.connection.features.can_use_chunked_reads:
+            return list(chunks)
+        return chunks
+
+    def is_count(self):
+        "Returns True if the query only selects COUNT(*)."
+        query = self.query
+        if query.select or query.extra_select or query.group_by or len(query.aggregate_select) != 1:
+            return False
+        aggregate = query.aggregate_select.values()[0]
+        return isinstance(aggregate, Count) and aggregate.col == '*' and not aggregate.extra.get('distinct')
+
+    def is_unfiltered(self):
+        "Returns True if the query covers every row of a single table."
+        query = self.query
+        return (not query.where.children and not query.having.children and
+                not query.distinct and query.low_mark == 0 and query.high_mark is None and
+                len([alias for alias in query.tables if query.alias_refcount[alias]]) == 1)
+
+    def execute_count(self, hint):
+        """
+        Runs a COUNT(*) query through the count cache: unfiltered counts of
+        large tables are estimated when allowed, other counts memoized.
+        """
+        counts = self.connection.counts
+        if counts is None:
+            counts = get_count_cache(self.connection.alias, True)
+        ttl = hint is not True and hint or None
+        try:
+            sql, params = self.as_sql()
+            if not sql:
+                raise EmptyResultSet
+        except EmptyResultSet:
+            return None
+        cursor = self.connection.cursor()
+        if (hint or counts.approximate) and self.is_unfiltered():
+            table = self.query.alias_map[self.query.tables[0]][0]
+            estimate = counts.estimate(cursor, self.connection.ops.quote_name, table, ttl)
+            if estimate is not None and estimate >= counts.min_approximate:
+                counts.estimated += 1
+                return (estimate,)
+        key = make_key(self.connection.settings_dict['NAME'], sql, params)
+        result = counts.get(key)
+        if result is None:
+            tables = tables_read(sql)
+            # Taken before the count runs, as in execute_cached().
+            versions = counts.versions(tables)
+            cursor.execute(sql, params)
+            result = cursor.fetchone()
+            counts.counted += 1
+            counts.set(key, result, ttl, tables, versions)
+        return result
+
+    def execute_cached(self, result_type, ttl):
+        try:
+            sql, params = self.as_sql()
+            if not sql:
+                raise EmptyResultSet
+        except EmptyResultSet:
+            if result_type == MULTI:
+                return iter([])
+            return
+        result_cache = self.connection.result_cache
+        key = make_key(self.connection.settings_dict['NAME'], sql, params)
+        result = result_cache.get(key)
+        if result is not MISS:
+            return result
+        tables = tables_read(sql)
+        # Taken before the query runs, so that a write made meanwhile makes
+        # the new entry stale straight away.
+        versions = result_cache.versions(tables)
+        cursor = self.connection.cursor()
+        cursor.execute(sql, params)
+        if result_type == SINGLE:
+            result = cursor.fetchone()
+            if result and self.query.ordering_aliases:
+                result = result[:-len(self.query.ordering_aliases)]
+        else:
+            chunks = cursor.fetch_chunks()
+            if self.query.ordering_aliases:
+                chunks = trim_chunks(chunks, len(self.query.ordering_aliases))
+            result = list(chunks)
+        result_cache.set(key, tables, versions, result, ttl)
+        return result
+
+
+class SelectTemplate(object):
+    "The parameter-independent parts of a compiled SELECT."
+    __slots__ = ('select', 'from_params', 'ordering', 'ordering_aliases',
+                 'grouping', 'group_params', 'order_by')
+
+    def __init__(self, select, from_params, ordering, ordering_aliases):
+        self.select = select
+        self.from_params = from_params
+        self.ordering = ordering
+        self.ordering_aliases = ordering_aliases
+        self.grouping = None
+        self.group_params = ()
+        self.order_by = None
+
+DATE_PARTS = ('year', 'month', 'day')
+
+def date_ranges(node):
+    """
+    Returns the where tree `node`, or a rewritten copy of it in which year,
+    year and month, or year, month and day lookups ANDed together on the
+    same date or datetime column become a half-open range on the column:
+
+        date__year=2011, date__month=3
+        -> date >= '2011-03-01' AND date < '2011-04-01'
+
+    Unlike EXTRACT(), the range can use an index on the column. Month or day
+    lookups without a year, and week_day lookups, match several ranges and
+    are left alone.
+    """
+    if not _has_year_lookup(node):
+        return node
+    children = []
+    pending = list(node.children)
+    while pending:
+        child = pending.pop(0)
+        if isinstance(child, WhereNode):
+            if (node.connector == AND and child.connector == AND and not child.negated and
+                    child.children):
+                # a AND (b AND c) is a AND b AND c, which lets the parts of a
+                # date, each added as its own subtree, be merged.
+                pending[0:0] = child.children
+                continue
+            child = date_ranges(child)
+        children.append(child)
+    if node.connector == AND:
+        children = _merge_date_parts(children)
+    node = copy.copy(node)
+    node.children = children
+    return node
+
+def _has_year_lookup(node):
+    for child in node.children:
+        if isinstance(child, tuple):
+            if child[1] == 'year':
+                return True
+        elif isinstance(child, WhereNode) and _has_year_lookup(child):
+            return True
+    return False
+
+def _merge_date_parts(children):
+    columns = {}
+    for index, child in enumerate(children):
+        if (isinstance(child, tuple) and child[1] in DATE_PARTS and
+                isinstance(child[0], Constraint) and isinstance(child[0].field, DateField)):
+            parts = columns.setdefault((child[0].alias, child[0].col), {})
+            parts.setdefault(child[1], []).append(index)
+    replaced = {}
+    for parts in columns.values():
+        if 'year' not in parts or [p for p in parts.values() if len(p) > 1]:
+            continue
+        used = [parts['year'][0]]
+        values = [children[used[0]][3]]
+        if 'month' in parts:
+            used.append(parts['month'][0])
+            values.append(children[used[1]][3])
+            if 'day' in parts:
+                used.append(parts['day'][0])
+                values.append(children[used[2]][3])
+        try:
+            start, end = date_range(*[int(value) for value in values])
+        except ValueError:
+            # An impossible date, e.g. February 30th; nothing matches
+            # either way.
+            continue
+        constraint = children[used[0]][0]
+        annotation = True
+        if isinstance(constraint.field, DateTimeField):
+            start = datetime.datetime(start.year, start.month, start.day)
+            end = datetime.datetime(end.year, end.month, end.day)
+            annotation = datetime.datetime
+        replaced[used[0]] = [(constraint, 'gte', annotation, start),
+                             (constraint, 'lt', annotation, end)]
+        for index in used[1:]:
+            replaced[index] = []
+    if not replaced:
+        return children
+    result = []
+    for index, child in enumerate(children):
+        result.extend(replaced.get(index, [child]))
+    return result
+
+def date_range(year, month=None, day=None):
+    "Returns the first date of the given year, month or day and the first one after it."
+    if day is not None:
+        start = datetime.date(year, month, day)
+        return start, start + datetime.timedelta(days=1)
+    if month is not None:
+        start = datetime.date(year, month, 1)
+        if month == 12:
+            return start, datetime.date(year + 1, 1, 1)
+        return start, datetime.date(year, month + 1, 1)
+    return datetime.date(year, 1, 1), datetime.date(year + 1, 1, 1)
+
+def trim_chunks(chunks, trim):
+    "Drops the trailing `trim` ordering columns from each row of `chunks`."
+    for rows in chunks:
+        yield [r[:-trim] for r in rows]
 
 class SQLInsertCompiler(compiler.SQLInsertCompiler, SQLCompiler):
-    pass
+    """
+    Inserts many objects with multi-row INSERT statements.
+
+    Bulk insert queries carry `objs` and `fields` (see bulk.bulk_insert() and
+    QuerySet.bulk_create() in later Django versions) and are compiled into a
+    sequence of (sql, params) pairs, each inserting up to
+    ops.bulk_batch_size() rows. Rows are prepared one chunk at a time, so the
+    whole batch is never held as parameters in memory. Plain single-row
+    insert queries are left to Django.
+    """
+    def as_sql(self):
+        if not hasattr(self.query, 'objs'):
+            return super(SQLInsertCompiler, self).as_sql()
+        return [(sql, params) for sql, params, objs in self.bulk_as_sql()]
+
+    def bulk_as_sql(self):
+        """
+        Yields (sql, params, objs) for each statement of a bulk insert, where
+        `objs` are the instances inserted by that statement.
+        """
+        qn = self.connection.ops.quote_name
+        opts = self.query.model._meta
+        fields = self.query.fields
+        objs = self.query.objs
+        if not fields:
+            # Nothing but the auto-incremented primary key to insert.
+            sql = 'INSERT INTO %s DEFAULT VALUES' % qn(opts.db_table)
+            for obj in objs:
+                yield sql, (), [obj]
+            return
+
+        insert = 'INSERT INTO %s (%s)' % (qn(opts.db_table),
+                                          ', '.join([qn(f.column) for f in fields]))
+        if [f for f in fields if hasattr(f, 'get_placeholder')]:
+            # Placeholders may depend on the value; one statement per row.
+            for obj in objs:
+                values = self.prepare_row(fields, obj)
+                placeholders = [self.placeholder(f, v) for f, v in zip(fields, values)]
+                yield '%s VALUES (%s)' % (insert, ', '.join(placeholders)), values, [obj]
+            return
+
+        batch_size = self.connection.ops.bulk_batch_size(fields, objs)
+        full_sql = None
+        chunk, chunk_objs = [], []
+        for obj in objs:
+            chunk.extend(self.prepare_row(fields, obj))
+            chunk_objs.append(obj)
+            if len(chunk_objs) == batch_size:
+                if full_sql is None:
+                    full_sql = '%s %s' % (insert, self.connection.ops.bulk_insert_sql(fields, batch_size))
+                yield full_sql, tuple(chunk), chunk_objs
+                chunk, chunk_objs = [], []
+        if chunk_objs:
+            sql = '%s %s' % (insert, self.connection.ops.bulk_insert_sql(fields, len(chunk_objs)))
+            yield sql, tuple(chunk), chunk_objs
+
+    def prepare_row(self, fields, obj):
+        "Returns the database values of `fields` for `obj`."
+        if self.query.raw:
+            return [f.get_db_prep_save(getattr(obj, f.attname), connection=self.connection)
+                    for f in fields]
+        return [f.get_db_prep_save(f.pre_save(obj, True), connection=self.connection)
+                for f in fields]
+
+    def execute_sql(self, return_id=False):
+        if not hasattr(self.query, 'objs'):
+            return super(SQLInsertCompiler, self).execute_sql(return_id)
+        self.return_id = return_id
+        cursor = self.connection.cursor()
+        opts = self.query.model._meta
+        set_pks = (self.connection.features.can_return_ids_from_bulk_insert and
+                   opts.has_auto_field and opts.pk not in self.query.fields)
+        for sql, params, objs in self.bulk_as_sql():
+            cursor.execute(sql, params)
+            if set_pks:
+                # A multi-row INSERT takes consecutive AUTO_INCREMENT values,
+                # and LAST_INSERT_ID() reports the first of them.
+                first = self.connection.ops.last_insert_id(cursor, opts.db_table, opts.pk.column)
+                for offset, obj in enumerate(objs):
+                    obj.pk = first + offset
+        if not (return_id and cursor):
+            return
+        return self.connection.ops.last_insert_id(cursor,
+                self.query.model._meta.db_table, self.query.model._meta.pk.column)
 
 class SQLDeleteCompiler(compiler.SQLDeleteCompiler, SQLCompiler):
     pass
@@ -93,9 +589,19 @@ class SQLUpdateCompiler(compiler.SQLUpdateCompiler, SQLCompiler):
     pass
 
 class SQLAggregateCompiler(compiler.SQLAggregateCompiler, SQLCompiler):
+    # Counts of sliced or distinct querysets come through here, and are
+    # memoized by SQLCompiler.execute_sql() like other counts.
     pass
 
 class SQLDateCompiler(compiler.SQLDateCompiler, SQLCompiler):
-    pass
+    def resolve_columns(self, row, fields=()):
+        # Django typecasts dates() values itself only for backends without
+        # resolve_columns(), so do it here, should CUBRIDdb return a string.
+        return decode([row], ((len(self.query.extra_select), to_datetime),))[0]
+
+def to_datetime(value):
+    if isinstance(value, datetime.datetime):
+        return value
+    return typecast_timestamp(str(value))
 
 
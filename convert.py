@@ -1,15 +1,144 @@
 """
-Convert True/False to 1/0. Needed for Cubrid R4.0
+Adapts query parameters to types CUBRIDdb accepts, and result columns to
+the Python types Django expects.
+
+CUBRID R4.0 has no boolean type, so True/False are sent as 1/0; datetimes,
+dates, times and Decimals are sent in their string forms.
+
+Adaptation is planned once per statement and per distinct row "signature"
+(the tuple of parameter types). Rows that need no adaptation are passed to
+the driver untouched, and executemany() rows are adapted lazily, so bulk
+loads never build an adapted copy of the whole batch.
+
+Results are decoded with a plan built once per result set from the column
+types in cursor.description: dates, times, datetimes and numerics that the
+driver returns as strings are parsed, and every other column is left alone
+without being looked at.
 """
-class CubridConvert():
-    def boolean_field(self, args):
-		if args <> None:
-			print "replacing bool"
-			args = list(args)
-			for i, j in enumerate(args):
-				if j == bool(j):
-					args[i] = int(j)
-			args = tuple(args)
-		return args
+import datetime
+import decimal
+
+from django.db.backends.util import typecast_date, typecast_time, typecast_timestamp
+
+# Maps a parameter type to the callable adapting values of exactly that type.
+ADAPTERS = {
+    bool: int,
+    datetime.datetime: unicode,
+    datetime.date: lambda value: value.isoformat(),
+    datetime.time: unicode,
+    decimal.Decimal: str,
+}
+
+# Column type codes in cursor.description (CCI's U-types) and the callables
+# parsing the strings the driver may return for them.
+TYPE_NUMERIC = 7
+TYPE_DATE = 13
+TYPE_TIME = 14
+TYPE_TIMESTAMP = 15
+TYPE_DATETIME = 22
+
+CONVERTERS = {
+    TYPE_NUMERIC: decimal.Decimal,
+    TYPE_DATE: typecast_date,
+    TYPE_TIME: typecast_time,
+    TYPE_TIMESTAMP: typecast_timestamp,
+    TYPE_DATETIME: typecast_timestamp,
+}
+
+# Upper bound of plans kept per statement; rows with unusual signatures
+# beyond it are adapted with a plan computed on the fly.
+MAX_PLANS = 32
+
+def plan(signature):
+    """
+    Returns the (position, adapter) pairs needed for rows whose parameter
+    types are `signature`. An empty tuple means rows pass through as is.
+    """
+    steps = []
+    for index, type_ in enumerate(signature):
+        adapter = ADAPTERS.get(type_)
+        if adapter is not None:
+            steps.append((index, adapter))
+    return tuple(steps)
+
+class ParameterAdapter(object):
+    "Adapts parameter rows for a single statement."
+    __slots__ = ('_plans',)
+
+    def __init__(self):
+        self._plans = {}
+
+    def adapt(self, row):
+        if not row:
+            return row
+        signature = tuple(map(type, row))
+        steps = self._plans.get(signature)
+        if steps is None:
+            steps = plan(signature)
+            if len(self._plans) < MAX_PLANS:
+                self._plans[signature] = steps
+        if not steps:
+            return row
+        row = list(row)
+        for index, adapter in steps:
+            row[index] = adapter(row[index])
+        return row
+
+    def adapt_many(self, rows):
+        "Lazily adapts an iterable of rows, for executemany()."
+        adapt = self.adapt
+        for row in rows:
+            yield adapt(row)
+
+def decoding_plan(description, rows):
+    """
+    Returns the (position, converter) pairs decoding the result set
+    described by `description`, whose first batch of rows is `rows`.
+    Columns the driver already returns as Python objects are left out; so
+    are all columns, and the plan is empty, for drivers that never return
+    strings for them.
+    """
+    if not description:
+        return ()
+    steps = []
+    for index, column in enumerate(description):
+        converter = CONVERTERS.get(column[1])
+        if converter is None:
+            continue
+        for row in rows:
+            value = row[index]
+            if value is not None:
+                if isinstance(value, basestring):
+                    steps.append((index, converter))
+                break
+        else:
+            # Only NULLs so far; parse whatever strings come later.
+            steps.append((index, _strings_only(converter)))
+    return tuple(steps)
 
+def _strings_only(converter):
+    def convert(value):
+        if isinstance(value, basestring):
+            return converter(value)
+        return value
+    return convert
 
+def decode(rows, steps):
+    """
+    Applies the (position, converter) pairs `steps` to the non-NULL values
+    of a batch of rows, returning a new list of rows. `rows` itself is never
+    modified, as it may be shared, e.g. with the result cache; without
+    steps, it is returned as is.
+    """
+    if not steps:
+        return rows
+    decoded = []
+    append = decoded.append
+    for row in rows:
+        row = list(row)
+        for index, converter in steps:
+            value = row[index]
+            if value is not None:
+                row[index] = converter(value)
+        append(tuple(row))
+    return decoded
@@ -0,0 +1,156 @@
+"""
+Approximate and memoized COUNT(*) for the CUBRID backend.
+
+Paginators and admin changelists count the rows of their queryset on every
+request, which on large tables means a full index scan each time. Counting
+shortcuts are enabled for every count() run on a database with a 'COUNTS'
+entry in OPTIONS:
+
+    'OPTIONS': {
+        'COUNTS': {
+            # Unfiltered counts of tables whose statistics estimate at
+            # least MIN_APPROXIMATE rows are answered from the estimate.
+            'APPROXIMATE': True,
+            'MIN_APPROXIMATE': 100000,
+            # Seconds other counts, and estimates, are remembered for;
+            # 0 always counts again.
+            'TTL': 10,
+            'MAX_ENTRIES': 1000,
+        },
+    }
+
+or for the count() of a single queryset with CubridQuerySet.approximate(),
+which also approximates unfiltered counts whatever APPROXIMATE says:
+
+    paginator = Paginator(Event.objects.approximate(30), 50)
+
+Estimates come from the cardinality CUBRID keeps for the table's primary
+key (or another unique index), which is as recent as the table's last
+UPDATE STATISTICS. Memoized counts are forgotten as soon as this process
+writes to a table they read, as the result cache does (see resultcache.py);
+writes made by other processes are only picked up after TTL seconds. Counts
+are never memoized inside transactions with pending writes.
+"""
+
+import threading
+import time
+
+from django.db.backends.cubrid.cache import LRUCache
+
+class CountCache(object):
+    """
+    Remembers row counts and table estimates for `ttl` seconds, or until a
+    table a count read is written to.
+    """
+    def __init__(self, approximate=False, min_approximate=100000, ttl=10, max_entries=1000):
+        self.approximate = approximate
+        self.min_approximate = min_approximate
+        self.ttl = ttl
+        self._entries = LRUCache(max_entries)
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.estimated = self.counted = 0
+
+    def versions(self, tables):
+        "Returns the current versions of `tables`, to pass to set()."
+        versions = self._versions
+        return tuple([versions.get(table, 0) for table in tables])
+
+    def invalidate(self, tables):
+        "Makes the memoized counts reading any of `tables` stale."
+        self._lock.acquire()
+        try:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+        finally:
+            self._lock.release()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, tables, versions, value = entry
+        if expires < time.time() or self.versions(tables) != versions:
+            self._entries.pop(key)
+            return None
+        return value
+
+    def set(self, key, value, ttl=None, tables=(), versions=()):
+        """
+        Remembers `value` until `ttl` seconds have passed or one of `tables`
+        moves past its `versions`, as taken before the count ran.
+        """
+        ttl = ttl or self.ttl
+        if ttl:
+            self._entries.set(key, (time.time() + ttl, tables, versions, value))
+
+    def estimate(self, cursor, qn, table, ttl=None):
+        """
+        Returns the number of rows of `table` according to its statistics,
+        or None if it has no unique index statistics.
+        """
+        key = ('estimate', table)
+        estimate = self.get(key)
+        if estimate is None:
+            estimate = estimate_rows(cursor, qn, table)
+            if estimate is None:
+                # Remembered too, so tables without statistics aren't asked
+                # again on every count.
+                estimate = -1
+            self.set(key, estimate, ttl)
+        if estimate < 0:
+            return None
+        return estimate
+
+    def stats(self):
+        return {
+            'estimated': self.estimated,
+            'counted': self.counted,
+            'entries': len(self._entries),
+            'hits': self._entries.hits,
+            'misses': self._entries.misses,
+        }
+
+def estimate_rows(cursor, qn, table):
+    """
+    Returns the cardinality of the primary key or of the largest unique
+    index of `table`, from SHOW INDEX, or None when there is none.
+    """
+    # Table, Non_unique, Key_name, Seq_in_index, Column_name, Collation,
+    # Cardinality, ...
+    cursor.execute('SHOW INDEX IN %s' % qn(table))
+    estimate = None
+    for row in cursor.fetchall():
+        if not row[1] and row[3] == 1 and row[6] is not None:
+            estimate = max(estimate, int(row[6]))
+    return estimate
+
+_count_caches = {}
+_count_caches_lock = threading.Lock()
+
+def find_count_cache(alias):
+    "Returns the CountCache of the database `alias`, or None if none was built."
+    return _count_caches.get(alias)
+
+def get_count_cache(alias, options):
+    """
+    Returns the process-wide CountCache for the database `alias`, built
+    from the 'COUNTS' entry of its OPTIONS on first use.
+    """
+    count_cache = _count_caches.get(alias)
+    if count_cache is not None:
+        return count_cache
+    if options is True:
+        options = {}
+    _count_caches_lock.acquire()
+    try:
+        count_cache = _count_caches.get(alias)
+        if count_cache is None:
+            count_cache = _count_caches[alias] = CountCache(
+                approximate=options.get('APPROXIMATE', False),
+                min_approximate=options.get('MIN_APPROXIMATE', 100000),
+                ttl=options.get('TTL', 10),
+                max_entries=options.get('MAX_ENTRIES', 1000))
+    finally:
+        _count_caches_lock.release()
+    return count_cache
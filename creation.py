@@ -2,15 +2,31 @@ import sys
 import os
 import time
 import subprocess
+import threading
 
+try:
+    from hashlib import md5
+except ImportError:
+    from md5 import md5
+
+from django.db import utils
 from django.db.backends.creation import BaseDatabaseCreation
+from django.db.backends.cubrid.indexes import model_indexes
 from django.core.management import call_command
 from django.conf import settings
+from django.utils.encoding import smart_str
 
 # The prefix to put on the default database name when creating
 # the test database.
 TEST_DATABASE_PREFIX = 'test_'
 
+# The suffix to put on the test database name to name the template
+# database when TEST_TEMPLATE is True.
+TEST_TEMPLATE_SUFFIX = '_tpl'
+
+# Table holding the schema fingerprint in template and kept test databases.
+FINGERPRINT_TABLE = 'django_cubrid_schema'
+
 class DatabaseCreation(BaseDatabaseCreation):
     # This dictionary maps Field objects to their associated CUBRID column
     # types, as strings. Column-type strings can contain format strings; they'll
@@ -59,21 +75,90 @@ class DatabaseCreation(BaseDatabaseCreation):
 
             return output, pending
 
+    def sql_indexes_for_model(self, model, style):
+        """
+        Returns the CREATE INDEX statements for the model's db_index fields
+        and for the indexes in its `cubrid_indexes` (see indexes.py).
+        """
+        output = super(DatabaseCreation, self).sql_indexes_for_model(model, style)
+        if not model._meta.managed or model._meta.proxy:
+            return output
+        for index in model_indexes(model):
+            output.append(index.sql(model, style, self.connection))
+        return output
+
     def create_test_db(self, verbosity=1, autoclobber=False):
         """
         Creates a test database, prompting the user for confirmation if the
         database already exists. Returns the name of the test database created.
+
+        Two settings avoid building the schema on every run:
+
+        TEST_TEMPLATE: True or a database name. The schema is built once into
+            a template database (by default the test database name followed
+            by TEST_TEMPLATE_SUFFIX), then cloned with `cubrid copydb`. The
+            template is rebuilt when the schema fingerprint changes.
+        TEST_KEEPDB: if True, the test database is kept by destroy_test_db()
+            and reused as is by the next run, as long as its schema
+            fingerprint still matches.
         """
         if verbosity >= 1:
             print "Creating test database '%s'..." % self.connection.alias
 
-        test_database_name = self._create_test_db(verbosity, autoclobber)
+        test_database_name = self._get_test_db_name()
+        template_name = self._get_test_template_name()
+        fingerprint = None
+        if template_name or self.connection.settings_dict.get('TEST_KEEPDB'):
+            fingerprint = self._schema_fingerprint()
 
-        self.connection.close()
+        if (self.connection.settings_dict.get('TEST_KEEPDB') and
+                self._read_fingerprint(test_database_name) == fingerprint):
+            if verbosity >= 1:
+                print "Using existing test database '%s'..." % test_database_name
+            self._use_test_db(test_database_name)
+        elif template_name:
+            if self._read_fingerprint(template_name) != fingerprint:
+                self._build_template(template_name, fingerprint, verbosity)
+            else:
+                self._stop_server(template_name)
+            self._clone_test_db(template_name, test_database_name, verbosity)
+            self._use_test_db(test_database_name)
+        else:
+            if fingerprint is not None:
+                # A kept test database whose schema is out of date.
+                self._stop_server(test_database_name)
+                self._cubrid("deletedb", test_database_name)
+            test_database_name = self._create_test_db(verbosity, autoclobber)
+            self._use_test_db(test_database_name)
+            self._create_test_schema(verbosity)
+            if fingerprint is not None:
+                self._write_fingerprint(fingerprint)
+
+        # Get a cursor (even though we don't need one yet). This has
+        # the side effect of initializing the test database.
+        cursor = self.connection.cursor()
+
+        return test_database_name
+
+    def _get_test_db_name(self):
+        if self.connection.settings_dict['TEST_NAME']:
+            return self.connection.settings_dict['TEST_NAME']
+        return TEST_DATABASE_PREFIX + self.connection.settings_dict['NAME']
+
+    def _get_test_template_name(self):
+        template = self.connection.settings_dict.get('TEST_TEMPLATE')
+        if template is True:
+            return self._get_test_db_name() + TEST_TEMPLATE_SUFFIX
+        return template or None
+
+    def _use_test_db(self, test_database_name):
+        self._disconnect()
         self.connection.settings_dict["NAME"] = test_database_name
         can_rollback = self._rollback_works()
         self.connection.settings_dict["SUPPORTS_TRANSACTIONS"] = can_rollback
 
+    def _create_test_schema(self, verbosity):
+        "Creates the tables, initial data and cache table in the current database."
         call_command('syncdb',
             verbosity=verbosity,
             interactive=False,
@@ -97,20 +182,198 @@ class DatabaseCreation(BaseDatabaseCreation):
                 _, cache_name, _ = parse_backend_uri(settings.CACHE_BACKEND)
                 call_command('createcachetable', cache_name, database=self.connection.alias)
 
-        # Get a cursor (even though we don't need one yet). This has
-        # the side effect of initializing the test database.
+    def _schema_fingerprint(self):
+        """
+        Returns a hash of the SQL creating every installed model, computed
+        without touching the database. Initial data fixtures are not part of
+        it; delete the template to pick up changes to them.
+        """
+        from django.core.management.color import no_style
+        from django.core.management.sql import custom_sql_for_model
+        from django.db import models
+        style = no_style()
+        statements = []
+        for model in models.get_models(include_auto_created=True):
+            output, pending = self.sql_create_model(model, style)
+            statements.extend(output)
+            for target, references in pending.items():
+                for source, field in references:
+                    statements.append('%s.%s -> %s' % (source._meta.db_table,
+                        field.column, target._meta.db_table))
+            statements.extend(self.sql_indexes_for_model(model, style))
+            statements.extend(custom_sql_for_model(model, style, self.connection))
+        statements.sort()
+        return md5(smart_str('\n'.join(statements))).hexdigest()
+
+    def _read_fingerprint(self, database_name):
+        """
+        Starts the server of `database_name` and returns the fingerprint
+        stored in it, or None if the database does not exist or has none.
+        The connection is left pointing at `database_name`.
+        """
+        # Fails harmlessly when the database is missing or already running.
+        self._cubrid("server", "start", database_name)
+        self._disconnect()
+        self.connection.settings_dict["NAME"] = database_name
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute("SELECT fingerprint FROM %s" % self.connection.ops.quote_name(FINGERPRINT_TABLE))
+            row = cursor.fetchone()
+        except utils.DatabaseError:
+            row = None
+        self._disconnect()
+        return row and row[0] or None
+
+    def _write_fingerprint(self, fingerprint):
+        qn = self.connection.ops.quote_name
         cursor = self.connection.cursor()
+        cursor.execute("CREATE TABLE %s (fingerprint varchar(32))" % qn(FINGERPRINT_TABLE))
+        cursor.execute("INSERT INTO %s (fingerprint) VALUES (%%s)" % qn(FINGERPRINT_TABLE), [fingerprint])
+        self.connection._commit()
 
-        return test_database_name
+    def _build_template(self, template_name, fingerprint, verbosity):
+        "(Re)creates the template database with the current schema."
+        if verbosity >= 1:
+            print "Building test template database '%s'..." % template_name
+        self._stop_server(template_name)
+        self._cubrid("deletedb", template_name)
+        self._cubrid('createdb', '--db-volume-size=20M', '--log-volume-size=20M', template_name)
+        self._cubrid("server", "start", template_name)
+        self._disconnect()
+        self.connection.settings_dict["NAME"] = template_name
+        self._create_test_schema(verbosity)
+        self._write_fingerprint(fingerprint)
+        self._stop_server(template_name)
+
+    def _clone_test_db(self, template_name, test_database_name, verbosity):
+        """
+        Replaces `test_database_name` with a copy of the (stopped) template
+        and starts its server.
+        """
+        if verbosity >= 1:
+            print "Cloning test database from template '%s'..." % template_name
+        self._copy_db(template_name, test_database_name)
+        self._start_db(test_database_name)
+
+    def _copy_db(self, source_name, database_name):
+        "Replaces `database_name` with a copy of the stopped database `source_name`, left stopped."
+        self._cubrid("server", "stop", database_name)
+        if self._cubrid("copydb", "--replace", source_name, database_name) != 0:
+            raise utils.DatabaseError("Could not copy test database '%s' to '%s'."
+                                      % (source_name, database_name))
+
+    def _start_db(self, database_name):
+        self._cubrid("server", "start", database_name)
+
+    def create_worker_test_dbs(self, count, verbosity=1):
+        """
+        Provisions `count` independent test databases for parallel test
+        workers and returns one settings dictionary per worker. Each worker
+        process applies its own before running tests:
+
+            connection.settings_dict.update(worker_settings[i])
+
+        The databases are cloned from the template database (see
+        create_test_db), which is built or rebuilt first if needed, in rounds
+        that also copy from the clones already made, and their servers are
+        then started concurrently. The template is named after the test
+        database when TEST_TEMPLATE is not set.
+        """
+        if verbosity >= 1:
+            print "Creating %d test databases for '%s'..." % (count, self.connection.alias)
+        settings_dict = self.connection.settings_dict
+        old_name = settings_dict['NAME']
+        old_supports_transactions = settings_dict.get('SUPPORTS_TRANSACTIONS')
+
+        template_name = self._get_test_template_name() or self._get_test_db_name() + TEST_TEMPLATE_SUFFIX
+        names = [self._get_worker_db_name(index) for index in range(count)]
+        fingerprint = self._schema_fingerprint()
+        if self._read_fingerprint(template_name) != fingerprint:
+            self._build_template(template_name, fingerprint, verbosity)
+        else:
+            self._stop_server(template_name)
+
+        if verbosity >= 1:
+            print "Cloning test databases from template '%s'..." % template_name
+        # copydb runs in standalone mode and locks its source while it reads
+        # it, so no source may feed two copies at once. Each round copies
+        # from the template and from every clone made so far, doubling the
+        # number of copies: N clones take about log2(N) rounds.
+        sources, pending = [template_name], list(names)
+        while pending:
+            targets, pending = pending[:len(sources)], pending[len(sources):]
+            self._run_parallel(self._copy_db, zip(sources, targets))
+            sources.extend(targets)
+        self._run_parallel(self._start_db, [(name,) for name in names])
+
+        # The clones are identical, so probing one is enough.
+        self._use_test_db(names[0])
+        can_rollback = settings_dict["SUPPORTS_TRANSACTIONS"]
+        self._disconnect()
+        settings_dict['NAME'] = old_name
+        settings_dict['SUPPORTS_TRANSACTIONS'] = old_supports_transactions
+
+        return [dict(settings_dict, NAME=name, SUPPORTS_TRANSACTIONS=can_rollback)
+                for name in names]
+
+    def destroy_worker_test_dbs(self, worker_settings, verbosity=1):
+        """
+        Stops and deletes, concurrently, the databases returned by
+        create_worker_test_dbs(). They are kept when TEST_KEEPDB is set.
+        """
+        if self.connection.settings_dict.get('TEST_KEEPDB'):
+            return
+        if verbosity >= 1:
+            print "Destroying %d test databases for '%s'..." % (len(worker_settings), self.connection.alias)
+        self._run_parallel(self._delete_db,
+                           [(worker['NAME'],) for worker in worker_settings])
+
+    def _get_worker_db_name(self, index):
+        return '%s_%d' % (self._get_test_db_name(), index + 1)
+
+    def _delete_db(self, database_name):
+        self._cubrid("server", "stop", database_name)
+        self._cubrid("deletedb", database_name)
+
+    def _run_parallel(self, function, calls):
+        """
+        Runs function(*args) for every `args` in `calls`, each in its own
+        thread, and re-raises the first error once all have finished.
+        """
+        errors = []
+        def run(args):
+            try:
+                function(*args)
+            except Exception:
+                errors.append(sys.exc_info())
+        threads = [threading.Thread(target=run, args=(args,)) for args in calls]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0][0], errors[0][1], errors[0][2]
+
+    def _stop_server(self, database_name):
+        self._disconnect()
+        self._cubrid("server", "stop", database_name)
+
+    def _disconnect(self):
+        "Closes the connection, including idle pooled connections, so a server can stop."
+        pool = self.connection.pool
+        self.connection.close()
+        if pool is not None:
+            pool.close()
+
+    def _cubrid(self, *args):
+        "Runs the `cubrid` utility and returns its exit status."
+        return subprocess.call(["cubrid"] + list(args))
 
     def _create_test_db(self, verbosity, autoclobber):
         "Internal implementation - creates the test db tables."
         suffix = self.sql_table_creation_suffix()
 
-        if self.connection.settings_dict['TEST_NAME']:
-            test_database_name = self.connection.settings_dict['TEST_NAME']
-        else:
-            test_database_name = TEST_DATABASE_PREFIX + self.connection.settings_dict['NAME']
+        test_database_name = self._get_test_db_name()
 
         qn = self.connection.ops.quote_name
 
@@ -163,10 +426,12 @@ class DatabaseCreation(BaseDatabaseCreation):
         """
         if verbosity >= 1:
             print "Destroying test database '%s'..." % self.connection.alias
-        self.connection.close()
+        self._disconnect()
         test_database_name = self.connection.settings_dict['NAME']
         self.connection.settings_dict['NAME'] = old_database_name
 
+        if self.connection.settings_dict.get('TEST_KEEPDB'):
+            return
         self._destroy_test_db(test_database_name, verbosity)
 
     def _destroy_test_db(self, test_database_name, verbosity):
@@ -0,0 +1,39 @@
+"""
+The per-thread stack of query hints, kept apart from query.py so that the
+backend's cursor can read it without importing the ORM.
+"""
+
+import threading
+
+_local = threading.local()
+
+def current_hints():
+    "Returns the hints active in this thread, as a possibly empty dict."
+    stack = getattr(_local, 'stack', None)
+    if stack:
+        return stack[-1]
+    return {}
+
+class query_hints(object):
+    """
+    Applies `hints` to every query run within the block:
+
+        with query_hints(timeout=5):
+            ...
+
+    Blocks can be nested; inner hints override outer ones.
+    """
+    def __init__(self, **hints):
+        self.hints = hints
+
+    def __enter__(self):
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        hints = dict(current_hints())
+        hints.update(self.hints)
+        stack.append(hints)
+        return hints
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _local.stack.pop()
@@ -0,0 +1,169 @@
+"""
+CUBRID index types for models.
+
+Models list the indexes the backend should create, besides those of
+db_index and unique fields, in a `cubrid_indexes` attribute:
+
+    from django.db.backends.cubrid.indexes import (Index, ReverseIndex,
+        FilteredIndex, FunctionIndex, CoveringIndex)
+
+    class Account(models.Model):
+        email = models.CharField(max_length=100)
+        domain = models.CharField(max_length=50)
+        active = models.BooleanField()
+        created = models.DateTimeField()
+
+        cubrid_indexes = [
+            Index('domain', 'created'),
+            # email__endswith='@example.com'
+            ReverseIndex('email'),
+            # email__iexact, __istartswith and __icontains compare LOWER(email)
+            FunctionIndex('email'),
+            # Only the active rows are indexed.
+            FilteredIndex('created', where='active = 1'),
+            # values_list('domain', 'email').filter(domain=...) is answered
+            # from the index alone.
+            CoveringIndex('domain', include=['email']),
+        ]
+
+They are created by syncdb along with the model's other indexes, and are
+listed by `manage.py sqlindexes`. Indexes declared on abstract models are
+inherited by their children; those of a concrete parent stay on the
+parent's table under multi-table inheritance.
+
+The optimizer picks reverse, function and covering indexes by itself. It
+only uses a filtered index when the query names it, with
+CubridQuerySet.using_index():
+
+    Account.objects.using_index(FilteredIndex.name_for(Account, 'created'))
+"""
+
+from django.db.backends.util import truncate_name
+
+class Index(object):
+    "A plain, possibly unique, index on one or more fields."
+    keyword = 'INDEX'
+
+    def __init__(self, *fields, **kwargs):
+        if not fields:
+            raise ValueError("%s needs at least one field." % self.__class__.__name__)
+        self.fields = fields
+        self.name = kwargs.pop('name', None)
+        self.unique = kwargs.pop('unique', False)
+        if kwargs:
+            raise TypeError("%s got unexpected arguments: %s"
+                            % (self.__class__.__name__, ', '.join(kwargs)))
+
+    def columns(self, model):
+        "Returns the column names of the index key."
+        return [_local_column(model, name) for name in self.fields]
+
+    def key_sql(self, model, qn):
+        return ', '.join([qn(column) for column in self.columns(model)])
+
+    def get_name(self, model, connection):
+        if self.name:
+            return self.name
+        return self.name_for(model, *self.fields, connection=connection)
+
+    @classmethod
+    def name_for(cls, model, *fields, **kwargs):
+        """
+        Returns the name given to an index of this class on `fields` when
+        it isn't named explicitly, for the default database or `connection`.
+        """
+        from django.db import connection
+        connection = kwargs.get('connection') or connection
+        columns = [_local_column(model, name) for name in fields]
+        name = '%s_%s_%s' % (model._meta.db_table, cls.__name__.lower(),
+                             connection.creation._digest(*columns))
+        return truncate_name(name, connection.ops.max_name_length())
+
+    def sql(self, model, style, connection):
+        "Returns the CREATE INDEX statement for this index on `model`."
+        qn = connection.ops.quote_name
+        keyword = self.keyword
+        if self.unique:
+            keyword = keyword.replace('INDEX', 'UNIQUE INDEX')
+        return (style.SQL_KEYWORD('CREATE %s' % keyword) + ' ' +
+                style.SQL_TABLE(qn(self.get_name(model, connection))) + ' ' +
+                style.SQL_KEYWORD('ON') + ' ' +
+                style.SQL_TABLE(qn(model._meta.db_table)) + ' ' +
+                '(%s)' % style.SQL_FIELD(self.key_sql(model, qn)) +
+                self.suffix_sql(model, style, connection) + ';')
+
+    def suffix_sql(self, model, style, connection):
+        return ''
+
+class ReverseIndex(Index):
+    """
+    An index on the reversed values of its columns, which CUBRID uses for
+    LIKE '%suffix' conditions, i.e. endswith lookups.
+    """
+    keyword = 'REVERSE INDEX'
+
+class FilteredIndex(Index):
+    """
+    An index on only the rows matching `where`, a SQL condition on the
+    table's columns. It is smaller than a full index but must be named in
+    the queries meant to use it; see CubridQuerySet.using_index().
+    """
+    def __init__(self, *fields, **kwargs):
+        self.where = kwargs.pop('where', None)
+        if not self.where:
+            raise ValueError("FilteredIndex needs a where condition.")
+        super(FilteredIndex, self).__init__(*fields, **kwargs)
+
+    def suffix_sql(self, model, style, connection):
+        return ' %s %s' % (style.SQL_KEYWORD('WHERE'), self.where)
+
+class FunctionIndex(Index):
+    """
+    An index on `function`(column) for a single field. The default, LOWER,
+    matches how the backend compiles iexact, istartswith, icontains and
+    iendswith lookups.
+    """
+    def __init__(self, field, **kwargs):
+        self.function = kwargs.pop('function', 'LOWER')
+        super(FunctionIndex, self).__init__(field, **kwargs)
+
+    def key_sql(self, model, qn):
+        return '%s(%s)' % (self.function, qn(self.columns(model)[0]))
+
+class CoveringIndex(Index):
+    """
+    An index on `fields` followed by the `include` fields. Queries filtering
+    or ordering on the leading fields and reading only indexed columns are
+    answered from the index without touching the table.
+    """
+    def __init__(self, *fields, **kwargs):
+        include = tuple(kwargs.pop('include', ()))
+        super(CoveringIndex, self).__init__(*(fields + include), **kwargs)
+
+def _local_column(model, name):
+    """
+    Returns the column of the field `name` of `model`'s own table. Fields
+    inherited from a concrete parent live in the parent's table and can't
+    be indexed along with the child's columns.
+    """
+    field = model._meta.get_field(name)
+    if field not in model._meta.local_fields:
+        raise ValueError("Can't index %s.%s: the field is stored in the table of %s."
+                         % (model.__name__, name, field.model.__name__))
+    return field.column
+
+def model_indexes(model):
+    """
+    Returns the indexes listed in the `cubrid_indexes` attribute of `model`
+    and of its abstract parents. Those of concrete parents, and of their
+    own abstract parents, belong to the parents' tables and are left out.
+    """
+    inherited = set()
+    for parent in model._meta.parents:
+        inherited.update(parent.__mro__)
+    indexes = []
+    for klass in reversed(model.__mro__):
+        meta = getattr(klass, '_meta', None)
+        if klass is model or (meta is not None and meta.abstract and klass not in inherited):
+            indexes.extend(klass.__dict__.get('cubrid_indexes', ()))
+    return indexes
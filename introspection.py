@@ -1,9 +1,206 @@
+import re
+
 from django.db.backends import BaseDatabaseIntrospection
 
+# CUBRID's catalog flags foreign key indexes (db_index.is_foreign_key) but has
+# no view naming the table a key references, so the keys of the tables the
+# catalog flags are read from SHOW CREATE TABLE. Identifiers are quoted with
+# brackets, backticks or double quotes depending on the server version, and
+# the referenced column list is omitted when the key references the primary
+# key.
+foreign_key_re = re.compile(r'FOREIGN KEY\s*\(\s*([^)]*?)\s*\)\s*REFERENCES\s+([\[`"]?[\w.]+[\]`"]?)(?:\s*\(\s*([^)]*?)\s*\))?', re.I)
+
+# Precision the catalog reports for STRING (VARCHAR without a length).
+STRING_MAX_LENGTH = 1073741823
+
+# Statement verbs after which cached catalog data may be stale. TRUNCATE
+# only removes rows, which the cursor reports through table_written().
+SCHEMA_VERBS = frozenset(['CREATE', 'ALTER', 'DROP', 'RENAME'])
+
+# The AUTO_INCREMENT resets sql_flush() runs after TRUNCATE leave the schema
+# as it was.
+auto_increment_reset_re = re.compile(r'^\s*ALTER\s+TABLE\s+\S+\s+AUTO_INCREMENT\s*=\s*\d+\s*;?\s*$', re.I)
+
+def changes_schema(verb, sql):
+	"Returns True if the statement `sql`, starting with `verb`, may change the schema."
+	return verb in SCHEMA_VERBS and not (verb == 'ALTER' and auto_increment_reset_re.match(sql))
+
+def unquote(name):
+	return name.strip('[]`" ')
+
 class DatabaseIntrospection(BaseDatabaseIntrospection):
+	"""
+	Introspection backed by CUBRID's system catalog.
+
+	Columns and indexes of every user table are read with one query each the
+	first time any table is inspected, and kept until the connection runs a
+	schema changing statement (see changes_schema()) or clear_cache() is called.
+	Changes made by other connections are not noticed. The index query also
+	tells which tables have foreign keys; only those are read with SHOW CREATE
+	TABLE, once each.
+	"""
+	# Keyed by db_attribute.data_type.
+	data_types_reverse = {
+		'BIGINT': 'BigIntegerField',
+		'BLOB': 'TextField',
+		'CHAR': 'CharField',
+		'CLOB': 'TextField',
+		'DATE': 'DateField',
+		'DATETIME': 'DateTimeField',
+		'DOUBLE': 'FloatField',
+		'FLOAT': 'FloatField',
+		'INTEGER': 'IntegerField',
+		'MONETARY': 'DecimalField',
+		'NCHAR': 'CharField',
+		'NUMERIC': 'DecimalField',
+		'SHORT': 'SmallIntegerField',
+		'SMALLINT': 'SmallIntegerField',
+		'STRING': 'CharField',
+		'TIME': 'TimeField',
+		'TIMESTAMP': 'DateTimeField',
+		'VARCHAR': 'CharField',
+		'VARNCHAR': 'CharField',
+	}
+
+	def __init__(self, connection):
+		super(DatabaseIntrospection, self).__init__(connection)
+		self.clear_cache()
+
+	def clear_cache(self):
+		"Forgets everything read from the catalog."
+		self._tables = None
+		self._columns = None
+		self._indexes = None
+		# Tables with at least one foreign key, from the index query.
+		self._foreign_key_tables = None
+		self._foreign_keys = {}
+
+	def get_field_type(self, data_type, description):
+		if data_type == 'STRING' and description[3] == STRING_MAX_LENGTH:
+			return 'TextField'
+		return super(DatabaseIntrospection, self).get_field_type(data_type, description)
 
 	def get_table_list(self, cursor):
 		"Returns a list of table names in the current database."
-		cursor.execute("SHOW TABLES")
-		return [row[0] for row in cursor.fetchall()]
-		
\ No newline at end of file
+		if self._tables is None:
+			cursor.execute("""
+				SELECT class_name FROM db_class
+				WHERE is_system_class = 'NO' AND class_type = 'CLASS'""")
+			self._tables = [row[0] for row in cursor.fetchall()]
+		return list(self._tables)
+
+	def _load_columns(self, cursor):
+		cursor.execute("""
+			SELECT a.class_name, a.attr_name, a.data_type, a.prec, a.scale, a.is_nullable
+			FROM db_attribute a, db_class c
+			WHERE a.class_name = c.class_name
+				AND c.is_system_class = 'NO'
+				AND a.attr_type = 'INSTANCE'
+			ORDER BY a.class_name, a.def_order""")
+		columns = {}
+		for table, name, data_type, prec, scale, nullable in cursor.fetchall():
+			# (name, type_code, display_size, internal_size, precision, scale, null_ok)
+			columns.setdefault(table, []).append(
+				(name, data_type, None, prec, prec, scale, nullable == 'YES'))
+		self._columns = columns
+
+	def _load_indexes(self, cursor):
+		cursor.execute("""
+			SELECT i.class_name, i.index_name, i.is_unique, i.is_primary_key,
+				i.is_foreign_key, k.key_attr_name
+			FROM db_index i, db_index_key k, db_class c
+			WHERE i.class_name = c.class_name
+				AND c.is_system_class = 'NO'
+				AND k.class_name = i.class_name
+				AND k.index_name = i.index_name
+			ORDER BY i.class_name, i.index_name, k.key_order""")
+		indexes = {}
+		foreign_key_tables = set()
+		for table, name, unique, primary_key, foreign_key, column in cursor.fetchall():
+			table_indexes = indexes.setdefault(table, {})
+			if name not in table_indexes:
+				table_indexes[name] = (unique == 'YES', primary_key == 'YES', [])
+			table_indexes[name][2].append(column)
+			if foreign_key == 'YES':
+				foreign_key_tables.add(table)
+		self._indexes = indexes
+		self._foreign_key_tables = foreign_key_tables
+
+	def get_table_description(self, cursor, table_name):
+		"Returns a description of the table, with the DB-API cursor.description interface."
+		if self._columns is None:
+			self._load_columns(cursor)
+		return list(self._columns.get(table_name, []))
+
+	def _name_to_index(self, cursor, table_name):
+		"""
+		Returns a dictionary of {field_name: field_index} for the given table.
+		Indexes are 0-based.
+		"""
+		return dict([(d[0], i) for i, d in enumerate(self.get_table_description(cursor, table_name))])
+
+	def _primary_key_columns(self, cursor, table_name):
+		if self._indexes is None:
+			self._load_indexes(cursor)
+		for unique, primary_key, columns in self._indexes.get(table_name, {}).values():
+			if primary_key:
+				return columns
+		return []
+
+	def get_key_columns(self, cursor, table_name):
+		"""
+		Returns a list of (column_name, referenced_table_name,
+		referenced_column_name) for all single column foreign keys of the
+		given table.
+		"""
+		if self._indexes is None:
+			self._load_indexes(cursor)
+		if table_name not in self._foreign_key_tables:
+			return []
+		if table_name not in self._foreign_keys:
+			cursor.execute("SHOW CREATE TABLE %s" % self.connection.ops.quote_name(table_name))
+			key_columns = []
+			for row in cursor.fetchall():
+				for columns, other_table, other_columns in foreign_key_re.findall(row[1]):
+					columns = [unquote(c) for c in columns.split(',')]
+					other_table = unquote(other_table)
+					if other_columns:
+						other_columns = [unquote(c) for c in other_columns.split(',')]
+					else:
+						other_columns = self._primary_key_columns(cursor, other_table)
+					if len(columns) == 1 and len(other_columns) == 1:
+						key_columns.append((columns[0], other_table, other_columns[0]))
+			self._foreign_keys[table_name] = key_columns
+		return list(self._foreign_keys[table_name])
+
+	def get_relations(self, cursor, table_name):
+		"""
+		Returns a dictionary of {field_index: (field_index_other_table, other_table)}
+		representing all relationships to the given table. Indexes are 0-based.
+		"""
+		my_field_dict = self._name_to_index(cursor, table_name)
+		relations = {}
+		for my_fieldname, other_table, other_field in self.get_key_columns(cursor, table_name):
+			other_field_index = self._name_to_index(cursor, other_table).get(other_field)
+			if my_fieldname in my_field_dict and other_field_index is not None:
+				relations[my_field_dict[my_fieldname]] = (other_field_index, other_table)
+		return relations
+
+	def get_indexes(self, cursor, table_name):
+		"""
+		Returns a dictionary of fieldname -> infodict for the given table,
+		where each infodict is in the format:
+			{'primary_key': boolean representing whether it's the primary key,
+			 'unique': boolean representing whether it's a unique index}
+		Only single column indexes are included.
+		"""
+		if self._indexes is None:
+			self._load_indexes(cursor)
+		indexes = {}
+		for unique, primary_key, columns in self._indexes.get(table_name, {}).values():
+			if len(columns) != 1:
+				continue
+			info = indexes.setdefault(columns[0], {'primary_key': False, 'unique': False})
+			info['primary_key'] = info['primary_key'] or primary_key
+			info['unique'] = info['unique'] or unique or primary_key
+		return indexes
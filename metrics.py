@@ -0,0 +1,193 @@
+"""
+Per-statement query metrics for the CUBRID backend.
+
+Metrics are enabled per database with a 'METRICS' entry in OPTIONS:
+
+    'OPTIONS': {
+        'METRICS': {
+            'SLOW_QUERY_THRESHOLD': 0.5,  # seconds; None disables the log
+            'EXPORTER': 'django.db.backends.cubrid.metrics.StatsdExporter',
+            'EXPORTER_OPTIONS': {'host': '127.0.0.1', 'port': 8125},
+        },
+    }
+
+Setting 'METRICS' to True records metrics without a slow query log or an
+exporter. Statements are grouped by fingerprint: their SQL with numbers and
+placeholder lists collapsed, so that `IN (?, ?)` and `IN (?, ?, ?)` or
+different LIMITs count as the same statement. connection.metrics.snapshot()
+returns the recorded data; slow statements are logged as warnings on the
+'django.db.backends.cubrid' logger.
+
+When 'METRICS' is not set, connection.metrics is None and the cursor skips
+timing altogether.
+"""
+
+import bisect
+import logging
+import re
+import socket
+import threading
+
+try:
+    from hashlib import md5
+except ImportError:
+    from md5 import md5
+
+from django.utils.importlib import import_module
+
+logger = logging.getLogger('django.db.backends.cubrid')
+
+# Upper bounds, in seconds, of the latency histogram buckets. The last
+# bucket holds everything slower.
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+placeholder_list_re = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+number_re = re.compile(r'\b\d+\b')
+
+def fingerprint(sql):
+    "Returns `sql` with literal numbers and placeholder lists collapsed."
+    return number_re.sub('N', placeholder_list_re.sub('(?+)', sql))
+
+class StatementMetrics(object):
+    "Counters for one statement fingerprint."
+    __slots__ = ('fingerprint', 'count', 'errors', 'total_time', 'max_time',
+                 'rows', 'params', 'histogram')
+
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+        self.count = self.errors = self.rows = self.params = 0
+        self.total_time = self.max_time = 0.0
+        self.histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def as_dict(self):
+        return {
+            'fingerprint': self.fingerprint,
+            'count': self.count,
+            'errors': self.errors,
+            'total_time': self.total_time,
+            'max_time': self.max_time,
+            'mean_time': self.count and self.total_time / self.count or 0.0,
+            'rows': self.rows,
+            'params': self.params,
+            'histogram': zip(LATENCY_BUCKETS + (None,), self.histogram),
+        }
+
+class QueryMetrics(object):
+    """
+    Collects latency histograms, row and parameter counts per statement
+    fingerprint, logs slow statements and forwards every sample to an
+    optional exporter.
+    """
+    def __init__(self, alias, slow_query_threshold=None, exporter=None):
+        self.alias = alias
+        self.slow_query_threshold = slow_query_threshold
+        self.exporter = exporter
+        self._lock = threading.Lock()
+        self._statements = {}
+
+    def record(self, statement, seconds, rows, params, error=False):
+        fp = statement.fingerprint
+        self._lock.acquire()
+        try:
+            metrics = self._statements.get(fp)
+            if metrics is None:
+                metrics = self._statements[fp] = StatementMetrics(fp)
+            metrics.count += 1
+            if error:
+                metrics.errors += 1
+            metrics.total_time += seconds
+            if seconds > metrics.max_time:
+                metrics.max_time = seconds
+            if rows > 0:
+                metrics.rows += rows
+            metrics.params += params
+            metrics.histogram[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        finally:
+            self._lock.release()
+        if self.slow_query_threshold is not None and seconds >= self.slow_query_threshold:
+            logger.warning("Slow query on '%s' (%.3f s, %d rows, %d params): %s",
+                           self.alias, seconds, rows, params, statement.sql)
+        if self.exporter is not None:
+            self.exporter.export(statement, seconds, rows, params, error)
+
+    def snapshot(self):
+        """
+        Returns the recorded metrics as a list of dictionaries, slowest
+        fingerprint (by total time) first.
+        """
+        self._lock.acquire()
+        try:
+            result = [m.as_dict() for m in self._statements.itervalues()]
+        finally:
+            self._lock.release()
+        result.sort(key=lambda m: m['total_time'], reverse=True)
+        return result
+
+    def reset(self):
+        self._lock.acquire()
+        try:
+            self._statements = {}
+        finally:
+            self._lock.release()
+
+class StatsdExporter(object):
+    """
+    Sends each sample as StatsD lines over UDP:
+
+        <prefix>.<fingerprint hash>.time:<ms>|ms
+        <prefix>.<fingerprint hash>.rows:<rows>|c
+        <prefix>.errors:1|c
+
+    The fingerprint hash is the first 12 hex digits of its MD5, which keeps
+    metric names short and stable across processes. Send errors are
+    ignored; metrics must never break queries.
+    """
+    def __init__(self, host='127.0.0.1', port=8125, prefix='cubrid'):
+        self.address = (host, port)
+        self.prefix = prefix
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._names = {}
+
+    def export(self, statement, seconds, rows, params, error):
+        name = self._names.get(statement.fingerprint)
+        if name is None:
+            name = self._names[statement.fingerprint] = '%s.%s' % (
+                self.prefix, md5(statement.fingerprint).hexdigest()[:12])
+        lines = ['%s.time:%.3f|ms' % (name, seconds * 1000)]
+        if rows > 0:
+            lines.append('%s.rows:%d|c' % (name, rows))
+        if error:
+            lines.append('%s.errors:1|c' % self.prefix)
+        try:
+            self.socket.sendto('\n'.join(lines), self.address)
+        except socket.error:
+            pass
+
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+def get_metrics(alias, options):
+    """
+    Returns the process-wide QueryMetrics for the database `alias`, built
+    from the 'METRICS' entry of its OPTIONS on first use.
+    """
+    metrics = _metrics.get(alias)
+    if metrics is not None:
+        return metrics
+    if options is True:
+        options = {}
+    _metrics_lock.acquire()
+    try:
+        metrics = _metrics.get(alias)
+        if metrics is None:
+            exporter = None
+            if options.get('EXPORTER'):
+                module, attr = options['EXPORTER'].rsplit('.', 1)
+                exporter_class = getattr(import_module(module), attr)
+                exporter = exporter_class(**options.get('EXPORTER_OPTIONS', {}))
+            metrics = _metrics[alias] = QueryMetrics(alias,
+                slow_query_threshold=options.get('SLOW_QUERY_THRESHOLD'),
+                exporter=exporter)
+    finally:
+        _metrics_lock.release()
+    return metrics
@@ -0,0 +1,300 @@
+"""
+Connection pooling for the CUBRID backend.
+
+Pools are shared by every thread of the process and are keyed by the
+connection URL, so all DatabaseWrapper instances pointing at the same broker
+draw from the same set of CUBRIDdb connections. A pool is enabled by adding a
+'POOL' entry to the OPTIONS of a database:
+
+    'OPTIONS': {
+        'POOL': {
+            'MIN_SIZE': 2,        # connections kept open even when idle
+            'MAX_SIZE': 20,       # hard cap of broker sessions per process
+            'IDLE_TIMEOUT': 300,  # seconds before an idle connection is closed
+            'MAX_LIFETIME': 3600, # seconds before a connection is recycled
+            'WAIT_TIMEOUT': 30,   # seconds to wait for a free connection
+        },
+    }
+
+Setting 'POOL' to True uses the defaults below.
+"""
+
+import threading
+import time
+
+from django.db import utils
+
+DEFAULT_POOL_OPTIONS = {
+    'MIN_SIZE': 0,
+    'MAX_SIZE': 10,
+    'IDLE_TIMEOUT': 300,
+    'MAX_LIFETIME': 3600,
+    'WAIT_TIMEOUT': 30,
+}
+
+class PoolTimeout(utils.DatabaseError):
+    """
+    Raised when no pooled connection became available within WAIT_TIMEOUT.
+    """
+    pass
+
+class _Slot(object):
+    "Bookkeeping for one pooled connection."
+    __slots__ = ('connection', 'created', 'last_used', 'generation')
+
+    def __init__(self, connection, now, generation):
+        self.connection = connection
+        self.created = now
+        self.last_used = now
+        # The pool's generation when the connection was opened; close()
+        # starts a new one, retiring connections checked out before it.
+        self.generation = generation
+
+class ConnectionPool(object):
+    """
+    A bounded pool of raw CUBRIDdb connections.
+
+    `connect` is a callable taking no arguments and returning a new raw
+    connection. Connections are handed out most-recently-used first, so that
+    under light load the surplus ages out through IDLE_TIMEOUT.
+    """
+    def __init__(self, connect, min_size=0, max_size=10, idle_timeout=300,
+                 max_lifetime=3600, wait_timeout=30):
+        if max_size < 1 or min_size > max_size:
+            raise ValueError("Invalid pool bounds: MIN_SIZE=%s, MAX_SIZE=%s" % (min_size, max_size))
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        self.wait_timeout = wait_timeout
+
+        self._cond = threading.Condition(threading.Lock())
+        self._idle = []
+        self._in_use = {}
+        # Number of open connections plus connections being opened.
+        self._size = 0
+        self._filled = False
+        self._generation = 0
+        self._counters = {
+            'created': 0,
+            'closed': 0,
+            'checkouts': 0,
+            'checkins': 0,
+            'waits': 0,
+            'timeouts': 0,
+        }
+
+    def get(self):
+        "Checks a connection out of the pool, opening one if allowed."
+        if not self._filled:
+            self._fill()
+        deadline = None
+        self._cond.acquire()
+        try:
+            while True:
+                self._prune(time.time())
+                if self._idle:
+                    slot = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    slot = None
+                    break
+                now = time.time()
+                if deadline is None:
+                    deadline = now + self.wait_timeout
+                    self._counters['waits'] += 1
+                if now >= deadline:
+                    self._counters['timeouts'] += 1
+                    raise PoolTimeout("No CUBRID connection available after %s seconds "
+                                      "(MAX_SIZE=%d)" % (self.wait_timeout, self.max_size))
+                self._cond.wait(deadline - now)
+        finally:
+            self._cond.release()
+
+        if slot is None:
+            slot = self._open()
+        self._cond.acquire()
+        try:
+            self._in_use[id(slot.connection)] = slot
+            self._counters['checkouts'] += 1
+        finally:
+            self._cond.release()
+        return slot.connection
+
+    def put(self, connection, discard=False):
+        """
+        Returns a connection to the pool. Broken connections should be
+        returned with `discard` set; connections past MAX_LIFETIME are closed
+        here as well.
+        """
+        now = time.time()
+        self._cond.acquire()
+        try:
+            slot = self._in_use.pop(id(connection), None)
+            if slot is None:
+                # Not ours (e.g. the pool was reset in between); just drop it.
+                discard = True
+            else:
+                self._counters['checkins'] += 1
+                if self.max_lifetime and now - slot.created >= self.max_lifetime:
+                    discard = True
+                elif slot.generation != self._generation:
+                    # Checked out before close().
+                    discard = True
+            if discard:
+                self._counters['closed'] += 1
+                if slot is not None:
+                    self._size -= 1
+            else:
+                slot.last_used = now
+                self._idle.append(slot)
+            self._cond.notify()
+        finally:
+            self._cond.release()
+        if discard:
+            self._close(connection)
+
+    def last_used(self, connection):
+        """
+        Returns when a checked out connection was last returned to the pool
+        (or opened, for a new one). Callers use it to decide whether the
+        connection needs a liveness check before use.
+        """
+        return self._in_use[id(connection)].last_used
+
+    def stats(self):
+        "Returns a dictionary describing the current state of the pool."
+        self._cond.acquire()
+        try:
+            stats = dict(self._counters)
+            stats.update({
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': len(self._in_use),
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+            })
+        finally:
+            self._cond.release()
+        return stats
+
+    def close(self):
+        "Closes all idle connections. Checked out ones are closed on return."
+        self._cond.acquire()
+        try:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._counters['closed'] += len(idle)
+            self._generation += 1
+            self._filled = False
+            self._cond.notify_all()
+        finally:
+            self._cond.release()
+        for slot in idle:
+            self._close(slot.connection)
+
+    def _fill(self):
+        "Opens connections until MIN_SIZE is reached."
+        while True:
+            self._cond.acquire()
+            try:
+                if self._size >= self.min_size:
+                    self._filled = True
+                    return
+                self._size += 1
+            finally:
+                self._cond.release()
+            slot = self._open()
+            self._cond.acquire()
+            try:
+                self._idle.append(slot)
+                self._cond.notify()
+            finally:
+                self._cond.release()
+
+    def _open(self):
+        "Opens a new connection for a slot already reserved in self._size."
+        try:
+            connection = self._connect()
+        except:
+            self._cond.acquire()
+            try:
+                self._size -= 1
+                self._cond.notify()
+            finally:
+                self._cond.release()
+            raise
+        self._cond.acquire()
+        try:
+            self._counters['created'] += 1
+            return _Slot(connection, time.time(), self._generation)
+        finally:
+            self._cond.release()
+
+    def _prune(self, now):
+        """
+        Drops expired idle connections. Must be called with the lock held;
+        the connections themselves are closed outside of it by _close().
+        """
+        expired = []
+        keep = []
+        # The oldest idle connections are at the front of the list.
+        for slot in self._idle:
+            too_old = self.max_lifetime and now - slot.created >= self.max_lifetime
+            too_idle = (self.idle_timeout and now - slot.last_used >= self.idle_timeout and
+                        self._size - len(expired) > self.min_size)
+            if too_old or too_idle:
+                expired.append(slot)
+            else:
+                keep.append(slot)
+        if expired:
+            self._idle = keep
+            self._size -= len(expired)
+            self._counters['closed'] += len(expired)
+            self._filled = False
+            # Closing can block on the network; release the lock meanwhile.
+            self._cond.release()
+            try:
+                for slot in expired:
+                    self._close(slot.connection)
+            finally:
+                self._cond.acquire()
+
+    def _close(self, connection):
+        "Closes a connection already counted as closed, without the lock held."
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(url, connect, options):
+    """
+    Returns the process-wide pool for `url`, creating it from the 'POOL'
+    entry of a database's OPTIONS on first use.
+    """
+    pool = _pools.get(url)
+    if pool is not None:
+        return pool
+    if options is True:
+        options = {}
+    config = dict(DEFAULT_POOL_OPTIONS)
+    config.update(options)
+    _pools_lock.acquire()
+    try:
+        pool = _pools.get(url)
+        if pool is None:
+            pool = ConnectionPool(connect,
+                min_size=config['MIN_SIZE'],
+                max_size=config['MAX_SIZE'],
+                idle_timeout=config['IDLE_TIMEOUT'],
+                max_lifetime=config['MAX_LIFETIME'],
+                wait_timeout=config['WAIT_TIMEOUT'])
+            _pools[url] = pool
+    finally:
+        _pools_lock.release()
+    return pool
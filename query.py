@@ -0,0 +1,226 @@
+"""
+QuerySet extensions for the CUBRID backend.
+
+Models opt in by using CubridManager as their manager:
+
+    class Event(models.Model):
+        ...
+        objects = CubridManager()
+
+Queryset methods attach "hints" that the backend's compiler and cursor read
+when the query runs. Hints can also be applied to every query run in a block
+of code, whatever manager the models use, with the query_hints() context
+manager.
+"""
+
+from django.db import models
+from django.db.models.query import QuerySet
+from django.db.backends.cubrid.hints import current_hints, query_hints
+
+# Hints that only make sense for the query they were set on, and are
+# therefore never pushed to queries run on behalf of it (e.g. count()).
+QUERY_ONLY_HINTS = ('keyset', 'using_index')
+
+def get_hints(query):
+    """
+    Returns the hints for running `query`: those active in the thread,
+    overridden by those set on the queryset the query belongs to.
+    """
+    hints = getattr(query, 'cubrid_hints', None)
+    if not hints:
+        return current_hints()
+    merged = dict(current_hints())
+    merged.update(hints)
+    return merged
+
+def query_ordering(query):
+    "Returns the ordering `query` runs with: its own, or its model's default."
+    if query.extra_order_by:
+        return query.extra_order_by
+    if query.order_by:
+        return query.order_by
+    if query.default_ordering:
+        return query.model._meta.ordering
+    return []
+
+class CubridQuerySet(QuerySet):
+    """
+    A QuerySet carrying backend hints. Hints are kept across filter(),
+    order_by(), slicing and the like, but are dropped by values() and
+    values_list(), which return plain Django querysets.
+    """
+    def __init__(self, *args, **kwargs):
+        super(CubridQuerySet, self).__init__(*args, **kwargs)
+        self._hints = {}
+
+    def _clone(self, klass=None, setup=False, **kwargs):
+        c = super(CubridQuerySet, self)._clone(klass, setup, **kwargs)
+        c._hints = dict(self._hints)
+        return c
+
+    def hints(self, **hints):
+        "Returns a copy of this queryset with `hints` added."
+        c = self._clone()
+        c._hints.update(hints)
+        return c
+
+    def after(self, *values):
+        """
+        Keyset ("seek") pagination: returns the rows that come after the row
+        whose ordering columns had `values`, in the queryset's ordering.
+
+            page = Event.objects.order_by('created', 'id')[:50]
+            last = list(page)[-1]
+            next_page = Event.objects.order_by('created', 'id').after(
+                last.created, last.id)[:50]
+
+        Unlike offsets, the cost of a page does not grow with its position.
+        The ordering must be on plain, non-NULL fields and should end with a
+        unique one, typically the primary key. The bound is an ordinary
+        filter, so count(), exists(), update() and delete() honour it too;
+        the ordering can't be changed afterwards.
+        """
+        if not values:
+            raise ValueError("after() needs the ordering values of the last row seen.")
+        ordering = self._keyset_ordering()
+        if len(values) != len(ordering):
+            raise ValueError("Keyset pagination got %d values for %d ordering fields."
+                             % (len(values), len(ordering)))
+        c = self.filter(keyset_q(ordering, values))
+        # Checked by the compiler: the filter only holds for this ordering.
+        c._hints['keyset'] = (tuple(query_ordering(self.query)), self.query.standard_ordering)
+        return c
+
+    def _keyset_ordering(self):
+        """
+        Returns the queryset's ordering as (field path, descending) pairs,
+        taking reverse() into account.
+        """
+        if self.query.extra_order_by:
+            raise ValueError("Keyset pagination can't follow an extra() ordering.")
+        ordering = []
+        for name in query_ordering(self.query):
+            if not isinstance(name, basestring) or name == '?' or '.' in name:
+                raise ValueError("Keyset pagination can't follow ordering by %r." % (name,))
+            descending = name.startswith('-')
+            ordering.append((name.lstrip('-+'), descending != (not self.query.standard_ordering)))
+        if not ordering:
+            raise ValueError("Keyset pagination requires an ordered queryset.")
+        return ordering
+
+    def cache(self, ttl=None):
+        """
+        Returns a copy of this queryset whose results, and those of count(),
+        exists() and aggregate(), are kept in the database's result cache
+        for `ttl` seconds, or its default TTL. See resultcache.py; without a
+        RESULT_CACHE in OPTIONS, this does nothing.
+        """
+        return self.hints(cache=ttl or True)
+
+    def timeout(self, seconds):
+        """
+        Returns a copy of this queryset whose statements are cancelled, and
+        raise QueryTimeout, after running for `seconds`; None disables
+        OPTIONS['STATEMENT_TIMEOUT']. See timeouts.py.
+        """
+        return self.hints(timeout=seconds)
+
+    def approximate(self, ttl=None):
+        """
+        Returns a copy of this queryset whose count() is estimated from the
+        table statistics when unfiltered, and otherwise remembered for `ttl`
+        seconds, or the COUNTS TTL. See counts.py.
+        """
+        return self.hints(approximate_count=ttl or True)
+
+    def using_index(self, *names):
+        """
+        Returns a copy of this queryset whose query tells CUBRID to choose
+        among the indexes `names` (USING INDEX). This is how queries use a
+        FilteredIndex; see indexes.py.
+        """
+        return self.hints(using_index=names)
+
+    def iterator(self):
+        # The query is compiled without being cloned first, so the hints
+        # can travel on it.
+        self.query.cubrid_hints = self._hints
+        return super(CubridQuerySet, self).iterator()
+
+    def _pushed_hints(self):
+        return query_hints(**dict([(k, v) for k, v in self._hints.items()
+                                   if k not in QUERY_ONLY_HINTS]))
+
+    def count(self):
+        hints = self._pushed_hints()
+        hints.__enter__()
+        try:
+            return super(CubridQuerySet, self).count()
+        finally:
+            hints.__exit__(None, None, None)
+
+    def aggregate(self, *args, **kwargs):
+        hints = self._pushed_hints()
+        hints.__enter__()
+        try:
+            return super(CubridQuerySet, self).aggregate(*args, **kwargs)
+        finally:
+            hints.__exit__(None, None, None)
+
+    def exists(self):
+        hints = self._pushed_hints()
+        hints.__enter__()
+        try:
+            return super(CubridQuerySet, self).exists()
+        finally:
+            hints.__exit__(None, None, None)
+
+def keyset_q(ordering, values):
+    """
+    Returns the condition selecting the rows that come after the row with
+    `values` in `ordering`, a list of (field path, descending) pairs.
+
+    For ordering (a, b, c) this is
+        a >= x AND (a > x OR (a = x AND (b > y OR (b = y AND c > z))))
+    The leading range on `a` lets CUBRID use an index on the ordering
+    columns for a range scan starting at the last row seen, instead of
+    scanning and discarding every row before it as LIMIT offset,count
+    does.
+    """
+    def after(name, descending, value, inclusive=False):
+        lookup = descending and 'lt' or 'gt'
+        if inclusive:
+            lookup += 'e'
+        return models.Q(**{'%s__%s' % (name, lookup): value})
+
+    (name, descending), value = ordering[-1], values[-1]
+    q = after(name, descending, value)
+    for (name, descending), value in reversed(zip(ordering[:-1], values[:-1])):
+        q = after(name, descending, value) | (models.Q(**{name: value}) & q)
+    if len(ordering) > 1:
+        (name, descending), value = ordering[0], values[0]
+        q = after(name, descending, value, inclusive=True) & q
+    return q
+
+class CubridManager(models.Manager):
+    "A manager returning CubridQuerySets."
+    def get_query_set(self):
+        return CubridQuerySet(self.model, using=self._db)
+
+    def hints(self, **hints):
+        return self.get_query_set().hints(**hints)
+
+    def after(self, *values):
+        return self.get_query_set().after(*values)
+
+    def cache(self, ttl=None):
+        return self.get_query_set().cache(ttl)
+
+    def timeout(self, seconds):
+        return self.get_query_set().timeout(seconds)
+
+    def approximate(self, ttl=None):
+        return self.get_query_set().approximate(ttl)
+
+    def using_index(self, *names):
+        return self.get_query_set().using_index(*names)
@@ -0,0 +1,278 @@
+"""
+Query result caching for the CUBRID backend.
+
+The cache is enabled per database with a 'RESULT_CACHE' entry in OPTIONS:
+
+    'OPTIONS': {
+        'RESULT_CACHE': {
+            'BACKEND': 'local',   # or 'django'
+            'TTL': 60,            # seconds, for queries not giving their own
+            # 'local' only:
+            'MAX_ENTRIES': 1000,
+            'MAX_BYTES': 16 * 1024 * 1024,  # estimated size of cached rows
+            # 'django' only: the name of the cache in CACHES to use.
+            'CACHE': 'default',
+        },
+    }
+
+Queries still have to opt in, with CubridQuerySet.cache():
+
+    Country.objects.cache(300).filter(active=True)
+
+or, for every query run in a block, with query_hints(cache=300). Results are
+keyed on the database name, the SQL and its parameters.
+
+Every table has a version number, bumped whenever the backend writes to it
+(again when the transaction commits). Entries remember the versions of the
+tables their query read, as they were before the query ran, and are stale
+as soon as any of them moves. With the 'local' backend this only sees
+writes made by this process; with 'django', versions live in the shared
+cache, so every process using the same cache sees every write made through
+the backend. Writes made outside of it, e.g. by other applications, are
+only picked up when entries expire.
+
+The cache is skipped inside transactions with pending writes, so
+uncommitted rows are never cached.
+"""
+
+import re
+import sys
+import threading
+import time
+
+try:
+    from hashlib import md5
+except ImportError:
+    from md5 import md5
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.cubrid.cache import LRUCache
+from django.utils.encoding import smart_str
+
+# Returned by get() on a miss, as None is a valid cached row.
+MISS = object()
+
+# How long the 'django' backend keeps table versions. It must be longer
+# than any TTL, or an entry could outlive the version that invalidated it.
+VERSION_TIMEOUT = 30 * 24 * 3600
+
+# Tables named in FROM and JOIN clauses, and in the comma separated FROM
+# lists of extra(tables=...). Over-matching merely adds versions to check.
+table_re = re.compile(r'(?:\bFROM|\bJOIN|,)\s+`(\w+)`', re.I)
+
+def tables_read(sql):
+    "Returns the sorted, lower cased names of the tables `sql` reads."
+    tables = set([table.lower() for table in table_re.findall(sql)])
+    return tuple(sorted(tables))
+
+def make_key(database, sql, params):
+    return md5(smart_str(u'%s\n%s\n%r' % (database, sql, tuple(params)))).hexdigest()
+
+def estimate_size(value):
+    "Returns a rough estimate of the memory used by a cached result."
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum([estimate_size(item) for item in value])
+    return sys.getsizeof(value)
+
+class ResultCacheBase(object):
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self.hits = self.misses = self.stale = self.sets = self.invalidations = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'stale': self.stale,
+            'sets': self.sets,
+            'invalidations': self.invalidations,
+            'hit_rate': lookups and float(self.hits) / lookups or 0.0,
+        }
+
+class _Entries(LRUCache):
+    def __init__(self, max_size, owner):
+        super(_Entries, self).__init__(max_size)
+        self.owner = owner
+
+    def evicted(self, key, entry):
+        self.owner._forget(entry)
+
+class LocalResultCache(ResultCacheBase):
+    "An in-process cache bounded in entries and in estimated bytes."
+    def __init__(self, ttl=60, max_entries=1000, max_bytes=16 * 1024 * 1024):
+        super(LocalResultCache, self).__init__(ttl)
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries = _Entries(max_entries, self)
+        self._versions = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def versions(self, tables):
+        versions = self._versions
+        return (self._generation,) + tuple([versions.get(table, 0) for table in tables])
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return MISS
+        expires, tables, versions, value, size = entry
+        if expires < time.time() or self.versions(tables) != versions:
+            if self._entries.pop(key) is not None:
+                self._forget(entry)
+            self.stale += 1
+            self.misses += 1
+            return MISS
+        self.hits += 1
+        return value
+
+    def set(self, key, tables, versions, value, ttl=None):
+        if not self._entries.max_size:
+            # MAX_ENTRIES = 0: nothing is stored, so nothing is counted.
+            return
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        old = self._entries.pop(key)
+        if old is not None:
+            self._forget(old)
+        self._lock.acquire()
+        try:
+            self.bytes += size
+        finally:
+            self._lock.release()
+        self._entries.set(key, (time.time() + (ttl or self.ttl), tables, versions, value, size))
+        self.sets += 1
+        while self.bytes > self.max_bytes:
+            oldest = self._entries.pop_oldest()
+            if oldest is None:
+                break
+            self._forget(oldest[1])
+
+    def _forget(self, entry):
+        self._lock.acquire()
+        try:
+            self.bytes -= entry[4]
+        finally:
+            self._lock.release()
+
+    def invalidate(self, tables):
+        self._lock.acquire()
+        try:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+        finally:
+            self._lock.release()
+        self.invalidations += 1
+
+    def clear(self):
+        self._lock.acquire()
+        try:
+            # Also invalidates results of queries running right now.
+            self._generation += 1
+        finally:
+            self._lock.release()
+        self._entries.clear()
+        self._lock.acquire()
+        try:
+            self.bytes = 0
+        finally:
+            self._lock.release()
+
+    def stats(self):
+        stats = super(LocalResultCache, self).stats()
+        stats.update({
+            'entries': len(self._entries),
+            'max_entries': self._entries.max_size,
+            'bytes': self.bytes,
+            'max_bytes': self.max_bytes,
+            'evictions': self._entries.evictions,
+        })
+        return stats
+
+class DjangoResultCache(ResultCacheBase):
+    """
+    A cache kept in one of Django's caches, shared by every process using
+    it. Size limits and eviction are left to that cache.
+    """
+    def __init__(self, cache, prefix, ttl=60):
+        super(DjangoResultCache, self).__init__(ttl)
+        self.cache = cache
+        self.prefix = prefix
+
+    def _version_keys(self, tables):
+        return ['%s:generation' % self.prefix] + ['%s:table:%s' % (self.prefix, table) for table in tables]
+
+    def versions(self, tables):
+        keys = self._version_keys(tables)
+        found = self.cache.get_many(keys)
+        return tuple([found.get(key, 0) for key in keys])
+
+    def get(self, key):
+        entry = self.cache.get('%s:result:%s' % (self.prefix, key))
+        if entry is None:
+            self.misses += 1
+            return MISS
+        tables, versions, value = entry
+        if self.versions(tables) != versions:
+            self.stale += 1
+            self.misses += 1
+            return MISS
+        self.hits += 1
+        return value
+
+    def set(self, key, tables, versions, value, ttl=None):
+        self.cache.set('%s:result:%s' % (self.prefix, key), (tables, versions, value), ttl or self.ttl)
+        self.sets += 1
+
+    def _bump(self, key):
+        if not self.cache.add(key, 1, VERSION_TIMEOUT):
+            try:
+                self.cache.incr(key)
+            except ValueError:
+                # Expired in between; entries checked against it are stale.
+                self.cache.add(key, 1, VERSION_TIMEOUT)
+
+    def invalidate(self, tables):
+        for key in self._version_keys(tables)[1:]:
+            self._bump(key)
+        self.invalidations += 1
+
+    def clear(self):
+        self._bump(self._version_keys(())[0])
+
+_result_caches = {}
+_result_caches_lock = threading.Lock()
+
+def get_result_cache(alias, options):
+    """
+    Returns the process-wide result cache for the database `alias`, built
+    from the 'RESULT_CACHE' entry of its OPTIONS on first use.
+    """
+    result_cache = _result_caches.get(alias)
+    if result_cache is not None:
+        return result_cache
+    if options is True:
+        options = {}
+    _result_caches_lock.acquire()
+    try:
+        result_cache = _result_caches.get(alias)
+        if result_cache is None:
+            backend = options.get('BACKEND', 'local')
+            ttl = options.get('TTL', 60)
+            if backend == 'local':
+                result_cache = LocalResultCache(ttl,
+                    max_entries=options.get('MAX_ENTRIES', 1000),
+                    max_bytes=options.get('MAX_BYTES', 16 * 1024 * 1024))
+            elif backend == 'django':
+                from django.core.cache import get_cache
+                result_cache = DjangoResultCache(get_cache(options.get('CACHE', 'default')),
+                    'cubrid:%s' % alias, ttl)
+            else:
+                raise ImproperlyConfigured("RESULT_CACHE BACKEND must be 'local' or 'django', not '%s'." % backend)
+            _result_caches[alias] = result_cache
+    finally:
+        _result_caches_lock.release()
+    return result_cache
@@ -0,0 +1,183 @@
+"""
+Primary failover and read-replica balancing for the CUBRID backend.
+
+Both are configured in OPTIONS:
+
+    'OPTIONS': {
+        # Tried in order when connecting; defaults to HOST and PORT.
+        'PRIMARIES': ['db1:33000', 'db2:33000'],
+        # Serve SELECTs run outside of managed transactions.
+        'REPLICAS': ['ro1:33000', ('ro2', 33000)],
+        'BALANCING': 'least-connections',  # or 'latency'
+        'EJECT_BACKOFF': 1,       # seconds, doubled on each failure in a row
+        'MAX_EJECT_BACKOFF': 60,  # seconds
+    }
+
+Endpoints are 'host:port' strings, (host, port) pairs or dictionaries with
+'HOST' and 'PORT' keys. An endpoint that fails to connect or answer is
+ejected for EJECT_BACKOFF seconds, twice as long after each further failure
+in a row, up to MAX_EJECT_BACKOFF; its first success clears the record.
+
+Replicas are balanced by the number of connections this process holds to
+each ('least-connections'), or at random weighted by the inverse of their
+recent query latency ('latency'). Reads go to the primary when every
+replica is ejected.
+"""
+
+import random
+import threading
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+
+BALANCING_STRATEGIES = ('least-connections', 'latency')
+
+# Weight of the newest sample in the moving average of query latency.
+LATENCY_DECAY = 0.2
+
+class Endpoint(object):
+    "A broker address and what is known about its health."
+    __slots__ = ('host', 'port', 'connections', 'latency', 'failures', 'ejected_until')
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = str(port)
+        self.connections = 0
+        self.latency = None
+        self.failures = 0
+        self.ejected_until = 0
+
+    def __repr__(self):
+        return '<Endpoint %s:%s>' % (self.host, self.port)
+
+def parse_endpoint(value):
+    if isinstance(value, dict):
+        return Endpoint(value.get('HOST', ''), value.get('PORT', ''))
+    if isinstance(value, basestring):
+        host, _, port = value.rpartition(':')
+        if not host:
+            raise ImproperlyConfigured("CUBRID endpoint '%s' must be given as 'host:port'." % value)
+        return Endpoint(host, port)
+    host, port = value
+    return Endpoint(host, port)
+
+class EndpointSet(object):
+    """
+    A group of interchangeable endpoints shared by all the connections of a
+    database alias in this process.
+    """
+    def __init__(self, endpoints, balancing='least-connections', backoff=1, max_backoff=60):
+        if balancing not in BALANCING_STRATEGIES:
+            raise ImproperlyConfigured("BALANCING must be one of %s, not '%s'."
+                                       % (', '.join(BALANCING_STRATEGIES), balancing))
+        self.endpoints = [parse_endpoint(endpoint) for endpoint in endpoints]
+        self.balancing = balancing
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+
+    def available(self):
+        "Returns the endpoints that are not ejected, in configuration order."
+        now = time.time()
+        return [endpoint for endpoint in self.endpoints if endpoint.ejected_until <= now]
+
+    def failover_order(self):
+        """
+        Returns every endpoint, available ones first in configuration order,
+        then ejected ones by how soon their ejection ends. Used for primaries,
+        where trying an ejected endpoint beats not connecting at all.
+        """
+        available = self.available()
+        ejected = [endpoint for endpoint in self.endpoints if endpoint not in available]
+        ejected.sort(key=lambda endpoint: endpoint.ejected_until)
+        return available + ejected
+
+    def choose(self):
+        "Returns the available endpoint to use next, or None if all are ejected."
+        available = self.available()
+        if not available:
+            return None
+        if self.balancing == 'latency':
+            known = [endpoint.latency for endpoint in available if endpoint.latency]
+            # Endpoints without samples yet are weighted like the fastest one,
+            # so they get some traffic to measure.
+            default = known and min(known) or 1.0
+            weights = [1.0 / (endpoint.latency or default) for endpoint in available]
+            point = random.random() * sum(weights)
+            for endpoint, weight in zip(available, weights):
+                point -= weight
+                if point <= 0:
+                    return endpoint
+            return available[-1]
+        fewest = min([endpoint.connections for endpoint in available])
+        return random.choice([endpoint for endpoint in available if endpoint.connections == fewest])
+
+    def acquire(self, endpoint):
+        self._lock.acquire()
+        try:
+            endpoint.connections += 1
+        finally:
+            self._lock.release()
+
+    def release(self, endpoint):
+        self._lock.acquire()
+        try:
+            endpoint.connections -= 1
+        finally:
+            self._lock.release()
+
+    def success(self, endpoint, seconds=None):
+        self._lock.acquire()
+        try:
+            endpoint.failures = 0
+            endpoint.ejected_until = 0
+            if seconds is not None:
+                if endpoint.latency is None:
+                    endpoint.latency = seconds
+                else:
+                    endpoint.latency += LATENCY_DECAY * (seconds - endpoint.latency)
+        finally:
+            self._lock.release()
+
+    def failure(self, endpoint):
+        "Ejects `endpoint`, for longer after each failure in a row."
+        self._lock.acquire()
+        try:
+            endpoint.failures += 1
+            delay = min(self.backoff * 2 ** (endpoint.failures - 1), self.max_backoff)
+            endpoint.ejected_until = time.time() + delay
+        finally:
+            self._lock.release()
+
+    def stats(self):
+        now = time.time()
+        return [{
+            'endpoint': '%s:%s' % (endpoint.host, endpoint.port),
+            'connections': endpoint.connections,
+            'latency': endpoint.latency,
+            'failures': endpoint.failures,
+            'ejected_for': max(endpoint.ejected_until - now, 0),
+        } for endpoint in self.endpoints]
+
+_endpoint_sets = {}
+_endpoint_sets_lock = threading.Lock()
+
+def get_endpoints(alias, key, options):
+    """
+    Returns the process-wide EndpointSet for the `key` ('PRIMARIES' or
+    'REPLICAS') entry of the OPTIONS of database `alias`.
+    """
+    endpoints = _endpoint_sets.get((alias, key))
+    if endpoints is not None:
+        return endpoints
+    _endpoint_sets_lock.acquire()
+    try:
+        endpoints = _endpoint_sets.get((alias, key))
+        if endpoints is None:
+            endpoints = _endpoint_sets[(alias, key)] = EndpointSet(options[key],
+                balancing=options.get('BALANCING', 'least-connections'),
+                backoff=options.get('EJECT_BACKOFF', 1),
+                max_backoff=options.get('MAX_EJECT_BACKOFF', 60))
+    finally:
+        _endpoint_sets_lock.release()
+    return endpoints
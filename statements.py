@@ -0,0 +1,60 @@
+"""
+Per-connection cache of translated SQL statements.
+
+Django builds SQL with the '%s' paramstyle while CUBRIDdb expects '?'. The
+translation is done once per distinct statement text and kept in a bounded
+LRU cache attached to the DatabaseWrapper. The cache is cleared whenever the
+underlying connection is replaced, so anything tied to a connection can be
+hung on a Statement safely.
+"""
+
+import re
+
+from django.db.backends.cubrid.cache import LRUCache
+from django.db.backends.cubrid.convert import ParameterAdapter
+from django.db.backends.cubrid.introspection import changes_schema
+from django.db.backends.cubrid.metrics import fingerprint
+
+# Matches the table written by INSERT, UPDATE, DELETE and TRUNCATE statements.
+target_table_re = re.compile(r'^\s*(?:INSERT\s+INTO|UPDATE|DELETE\s+FROM|TRUNCATE(?:\s+TABLE)?)\s+[`"\[]?(\w+)', re.I)
+
+class Statement(object):
+    """
+    A Django SQL string, its CUBRIDdb translation, its leading keyword
+    (upper cased), the table it writes to if any (lower cased), whether a
+    replica may run it, whether it may change the schema and the adapter for
+    its parameters.
+    """
+    __slots__ = ('query', 'sql', 'verb', 'table', 'read_only', 'changes_schema', 'params',
+                 '_fingerprint')
+
+    def __init__(self, query):
+        self.query = query
+        self.sql = query.replace("%s", "?")
+        words = query.split(None, 1)
+        self.verb = words and words[0].upper() or ''
+        self.table = None
+        if self.verb in ('INSERT', 'UPDATE', 'DELETE', 'TRUNCATE'):
+            match = target_table_re.match(query)
+            if match:
+                self.table = match.group(1).lower()
+        self.read_only = self.verb == 'SELECT' and 'FOR UPDATE' not in query.upper()
+        self.changes_schema = changes_schema(self.verb, query)
+        self.params = ParameterAdapter()
+        self._fingerprint = None
+
+    def _get_fingerprint(self):
+        # Only needed when metrics are enabled, so computed on first use.
+        if self._fingerprint is None:
+            self._fingerprint = fingerprint(self.sql)
+        return self._fingerprint
+    fingerprint = property(_get_fingerprint)
+
+class StatementCache(LRUCache):
+    def statement(self, query):
+        "Returns the Statement for `query`, translating it on a miss."
+        statement = self.get(query)
+        if statement is None:
+            statement = Statement(query)
+            self.set(query, statement)
+        return statement
@@ -0,0 +1,57 @@
+"""
+Behaviour tests of the backend, run against the stand-in CUBRIDdb driver in
+../benchmarks, so no CUBRID server is needed.
+
+    python tests/run.py [-v] [NAME ...]
+
+NAME runs a single test module, e.g. `timeouts` for test_timeouts.py. As
+with the benchmarks, the backend tested is always the checkout containing
+this file, whatever copy Django may have installed.
+"""
+
+import imp
+import optparse
+import os
+import sys
+import unittest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(TESTS_DIR)
+BENCHMARKS_DIR = os.path.join(BACKEND_DIR, 'benchmarks')
+
+def setup():
+    # The test app and the stand-in driver come first on the path.
+    sys.path[:0] = [TESTS_DIR, BENCHMARKS_DIR]
+    # Registered before django.db is imported, as importing it loads the
+    # backend of the default database.
+    backend = imp.new_module('django.db.backends.cubrid')
+    backend.__path__ = [BACKEND_DIR]
+    backend.__file__ = os.path.join(BACKEND_DIR, '__init__.py')
+    sys.modules['django.db.backends.cubrid'] = backend
+
+    from django.conf import settings
+    settings.configure(
+        DATABASES={'default': {
+            'ENGINE': 'django.db.backends.cubrid',
+            'NAME': 'test', 'USER': 'dba', 'PASSWORD': '',
+            'HOST': 'localhost', 'PORT': '33000',
+        }},
+        INSTALLED_APPS=('testapp',),
+        DEBUG=False,
+    )
+
+def main():
+    parser = optparse.OptionParser(usage='%prog [-v] [NAME ...]')
+    parser.add_option('-v', '--verbose', action='store_true', default=False)
+    options, names = parser.parse_args()
+    setup()
+    loader = unittest.TestLoader()
+    if names:
+        suite = loader.loadTestsFromNames(['test_%s' % name for name in names])
+    else:
+        suite = loader.discover(TESTS_DIR, pattern='test_*.py')
+    result = unittest.TextTestRunner(verbosity=options.verbose and 2 or 1).run(suite)
+    sys.exit(not result.wasSuccessful())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+What the tests share: a database per test, so that pools and caches, which
+are process-wide, start empty, and a record of the statements sent to the
+stand-in driver.
+"""
+
+import datetime
+import itertools
+import unittest
+
+import CUBRIDdb
+from django.db import connections
+
+_aliases = itertools.count()
+
+def item_rows(sql, params):
+    "A responder answering every query on testapp.Item with two rows."
+    if 'COUNT(*)' in sql:
+        return [(2,)]
+    created = datetime.datetime(2011, 1, 1, 12, 0)
+    return [(1, 'first', 10, created), (2, 'second', 20, created)]
+
+class BackendTestCase(unittest.TestCase):
+    def setUp(self):
+        CUBRIDdb.CALLS.clear()
+        CUBRIDdb.respond(None)
+        self.statements = []
+        execute = CUBRIDdb.Cursor.execute
+        statements = self.statements
+        def recording_execute(cursor, sql, params=None):
+            statements.append(sql)
+            return execute(cursor, sql, params)
+        self.patch(CUBRIDdb.Cursor, 'execute', recording_execute)
+
+    def patch(self, owner, name, value):
+        "Sets `owner`.`name` to `value` until the test ends."
+        missing = object()
+        old = owner.__dict__.get(name, missing)
+        setattr(owner, name, value)
+        if old is missing:
+            self.addCleanup(delattr, owner, name)
+        else:
+            self.addCleanup(setattr, owner, name, old)
+
+    def database(self, **options):
+        """
+        Returns the connection to a new database alias with `options` as its
+        OPTIONS, closed when the test ends.
+        """
+        alias = 'test%d' % _aliases.next()
+        connections.databases[alias] = {
+            'ENGINE': 'django.db.backends.cubrid',
+            'NAME': alias, 'USER': 'dba', 'PASSWORD': '',
+            'HOST': 'localhost', 'PORT': '33000',
+            'OPTIONS': options,
+        }
+        connection = connections[alias]
+        self.addCleanup(connection.close)
+        return connection
+
+    def executed(self, prefix):
+        "Returns the statements sent so far that start with `prefix`."
+        return [sql for sql in self.statements if sql.startswith(prefix)]
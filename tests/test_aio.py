@@ -0,0 +1,38 @@
+import unittest
+
+import CUBRIDdb
+from django.core.exceptions import ImproperlyConfigured
+
+try:
+    from django.db.backends.cubrid.aio import AsyncConnection, asyncio
+except ImproperlyConfigured:
+    asyncio = None
+
+from support import BackendTestCase, item_rows
+
+@unittest.skipIf(asyncio is None, "needs asyncio or trollius")
+class AsyncCursorTests(BackendTestCase):
+    def setUp(self):
+        super(AsyncCursorTests, self).setUp()
+        CUBRIDdb.respond(item_rows)
+        self.db = AsyncConnection(self.database().alias, max_workers=1)
+        self.addCleanup(self.run_until_complete, self.db.close)
+        self.cursor = self.run_until_complete(self.db.cursor)
+        self.addCleanup(self.cursor.close)
+
+    def run_until_complete(self, function, *args):
+        return self.db.loop.run_until_complete(function(*args))
+
+    def test_fetch(self):
+        self.run_until_complete(self.cursor.execute, 'SELECT id FROM testapp_item')
+        self.assertEqual(len(self.run_until_complete(self.cursor.fetchone)), 4)
+        self.assertEqual(len(self.run_until_complete(self.cursor.fetchall)), 1)
+        self.assertEqual(self.cursor.rowcount, 2)
+
+    def test_fetch_before_execute(self):
+        for fetch in (self.cursor.fetchone, self.cursor.fetchmany, self.cursor.fetchall):
+            self.assertRaises(CUBRIDdb.ProgrammingError, self.run_until_complete, fetch)
+
+    def test_fetch_after_pending_execute(self):
+        self.cursor.execute('SELECT id FROM testapp_item')
+        self.assertEqual(len(self.run_until_complete(self.cursor.fetchall)), 2)
@@ -0,0 +1,167 @@
+import datetime
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+
+import CUBRIDdb
+from django.db import router, transaction
+from django.db.backends.cubrid.bulk import LoadError, ObjectFileWriter, bulk_insert, loaddb
+
+from support import BackendTestCase
+from testapp.models import Item, Tag
+
+# Stands in for the cubrid utility: records its arguments, standard input
+# and object file, and fails on FAIL_LINE when set.
+FAKE_CUBRID = """#!/bin/sh
+echo "$@" > "%(dir)s/argv"
+cat > "%(dir)s/stdin"
+for arg in "$@"; do
+    case $arg in --data-file=*) cp "${arg#--data-file=}" "%(dir)s/data.obj";; esac
+done
+if [ -n "$FAIL_LINE" ]; then
+    echo "Error on line $FAIL_LINE: unique constraint violated"
+    exit 3
+fi
+"""
+
+class ObjectFileWriterTests(unittest.TestCase):
+    def write(self, objs, raw=False):
+        data_file = tempfile.TemporaryFile()
+        origins_file = tempfile.TemporaryFile()
+        self.addCleanup(origins_file.close)
+        writer = ObjectFileWriter(data_file, origins_file, raw)
+        for number, obj in enumerate(objs):
+            writer.write(obj, 0, number)
+        data_file.seek(0)
+        lines = data_file.read().splitlines()
+        data_file.close()
+        return writer, lines
+
+    def test_object_file(self):
+        created = datetime.datetime(2011, 1, 2, 3, 4, 5, 678000)
+        writer, lines = self.write([Item(name="it's", value=1, created=created)], raw=True)
+        self.assertEqual(lines, [
+            '%class [testapp_item] ([name] [value] [created])',
+            "'it''s' 1 datetime '2011-01-02 03:04:05.678'",
+        ])
+        self.assertEqual(writer.rows, 1)
+        self.assertEqual(writer.tables, set(['testapp_item']))
+
+    def test_class_line_per_model(self):
+        writer, lines = self.write([Item(name='a'), Tag(item_id='3', label='x'), Item(pk=7, name='b')])
+        self.assertEqual([line for line in lines if line.startswith('%class')], [
+            '%class [testapp_item] ([name] [value] [created])',
+            '%class [testapp_tag] ([item_id] [label])',
+            '%class [testapp_item] ([id] [name] [value] [created])',
+        ])
+        # Keys given as strings take the type of the key they point to.
+        self.assertEqual(lines[3], "3 'x'")
+        self.assertEqual(writer.explicit_pk_models, set([Item]))
+
+    def test_pre_save(self):
+        writer, lines = self.write([Item(name='a')])
+        self.assertTrue(lines[1].startswith("'a' 0 datetime '"))
+        writer, lines = self.write([Item(name='a')], raw=True)
+        self.assertEqual(lines[1], "'a' 0 NULL")
+
+    def test_origin(self):
+        writer, lines = self.write([Item(name='a'), Item(name='multi\nline'), Item(name='c')])
+        self.assertEqual(writer.origin(2, ['objects']), 'objects, entry 1')
+        self.assertEqual(writer.origin(4, ['objects']), 'objects, entry 2')
+        self.assertEqual(writer.origin(5, ['objects']), 'objects, entry 3')
+        self.assertEqual(writer.origin(1, ['objects']), None)
+
+class BulkInsertTests(BackendTestCase):
+    def test_batches(self):
+        db = self.database(BULK_INSERT_BATCH_SIZE=2)
+        bulk_insert(Item, [Item(name=str(i)) for i in range(5)], using=db.alias)
+        self.assertEqual(len(self.executed('INSERT')), 3)
+
+    def test_max_params(self):
+        # Batches are sized for all four columns: two rows in eight parameters.
+        db = self.database(BULK_INSERT_MAX_PARAMS=8)
+        bulk_insert(Item, [Item(name=str(i)) for i in range(4)], using=db.alias)
+        self.assertEqual(len(self.executed('INSERT')), 2)
+
+class LoaddbTests(BackendTestCase):
+    def setUp(self):
+        super(LoaddbTests, self).setUp()
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        script = os.path.join(self.dir, 'cubrid')
+        f = open(script, 'w')
+        f.write(FAKE_CUBRID % {'dir': self.dir})
+        f.close()
+        os.chmod(script, stat.S_IRWXU)
+        self.environ('PATH', self.dir + os.pathsep + os.environ['PATH'])
+        self.db = self.database()
+
+    def environ(self, name, value):
+        old = os.environ.get(name)
+        os.environ[name] = value
+        if old is None:
+            self.addCleanup(os.environ.pop, name)
+        else:
+            self.addCleanup(os.environ.__setitem__, name, old)
+
+    def read(self, name):
+        f = open(os.path.join(self.dir, name))
+        try:
+            return f.read()
+        finally:
+            f.close()
+
+    def test_loads(self):
+        self.assertEqual(loaddb([Item(name='a'), Item(name='b')], using=self.db.alias), 2)
+        argv = self.read('argv').split()
+        self.assertEqual(argv[:3], ['loaddb', '--CS-mode', '--no-statistics'])
+        self.assertEqual(argv[-1], self.db.alias)
+        self.assertEqual(len(self.read('data.obj').splitlines()), 3)
+
+    def test_password_on_stdin(self):
+        self.db.settings_dict['PASSWORD'] = 'secret'
+        loaddb([Item(name='a')], using=self.db.alias)
+        self.assertFalse('secret' in self.read('argv'))
+        self.assertEqual(self.read('stdin'), 'secret\n')
+
+    def test_defers_indexes(self):
+        loaddb([Tag(item_id=1, label='x')], using=self.db.alias)
+        self.assertEqual(len(self.executed('DROP INDEX')), 2)
+        self.assertTrue('--index-file=' in self.read('argv'))
+
+    def test_explicit_keys_move_auto_increment(self):
+        CUBRIDdb.respond(lambda sql, params: [(7,)])
+        loaddb([Item(pk=7, name='a')], using=self.db.alias, defer_indexes=False)
+        self.assertEqual(self.executed('ALTER TABLE'), ['ALTER TABLE `testapp_item` AUTO_INCREMENT = 8'])
+
+    def test_rejected_rows(self):
+        self.environ('FAIL_LINE', '3')
+        try:
+            loaddb([Item(name='a'), Item(name='b')], using=self.db.alias, defer_indexes=False)
+        except LoadError, e:
+            self.assertEqual(e.errors, [('objects, entry 2', 3, 'Error on line 3: unique constraint violated')])
+        else:
+            self.fail("LoadError not raised")
+
+    def test_routing(self):
+        loaddb([Item(name='a')])
+        self.assertEqual(self.read('argv').split()[-1], 'test')
+
+        class ItemRouter(object):
+            def db_for_write(self, model, **hints):
+                return model is Item and 'other' or None
+        self.patch(router, 'routers', [ItemRouter()])
+        self.assertRaises(ValueError, loaddb, [Item(name='a'), Tag(item_id=1, label='x')])
+
+    def test_refuses_pending_changes(self):
+        alias = self.db.alias
+        transaction.enter_transaction_management(using=alias)
+        transaction.managed(True, using=alias)
+        try:
+            Item.objects.using(alias).create(name='a')
+            self.assertRaises(transaction.TransactionManagementError, loaddb, [Item(name='b')], using=alias)
+        finally:
+            transaction.rollback(using=alias)
+            transaction.leave_transaction_management(using=alias)
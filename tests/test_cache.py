@@ -0,0 +1,25 @@
+import unittest
+
+from django.db.backends.cubrid.cache import LRUCache
+
+class LRUCacheTests(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual((cache.get('a'), cache.get('b'), cache.get('c')), (1, None, 3))
+        self.assertEqual(cache.evictions, 1)
+
+    def test_pop_oldest(self):
+        cache = LRUCache(3)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.pop_oldest(), ('a', 1))
+        self.assertEqual(len(cache), 1)
+
+    def test_size_zero_stores_nothing(self):
+        cache = LRUCache(0)
+        cache.set('a', 1)
+        self.assertEqual(len(cache), 0)
@@ -0,0 +1,110 @@
+from django.db.models import Count, Max, Q
+
+from support import BackendTestCase
+from testapp.models import Entry, Item, Special
+
+class CompiledSQLCacheTests(BackendTestCase):
+    """
+    Queries compiled from a cached template must come out exactly as when
+    compiled in full, whatever was compiled before them.
+    """
+    def setUp(self):
+        super(CompiledSQLCacheTests, self).setUp()
+        self.cached = self.database()
+        self.uncached = self.database(COMPILED_SQL_CACHE_SIZE=0)
+
+    def compile(self, db, queryset, **kwargs):
+        return queryset.all().query.get_compiler(db.alias).as_sql(**kwargs)
+
+    def check(self, *querysets, **kwargs):
+        "Compiles each of `querysets` in turn, both ways."
+        for queryset in querysets:
+            expected = self.compile(self.uncached, queryset, **kwargs)
+            # Once to fill the cache, once from it.
+            self.assertEqual(self.compile(self.cached, queryset, **kwargs), expected)
+            self.assertEqual(self.compile(self.cached, queryset, **kwargs), expected)
+
+    def test_hits(self):
+        self.check(Item.objects.filter(value=1), Item.objects.filter(value=2))
+        self.assertTrue(self.cached.compiled_sql.hits >= 3)
+        self.assertEqual(len(self.uncached.compiled_sql), 0)
+
+    def test_lookups(self):
+        self.check(
+            Item.objects.filter(value=1),
+            Item.objects.filter(value__gt=1),
+            Item.objects.filter(value__in=[1, 2]),
+            Item.objects.filter(value__in=[1, 2, 3]),
+            Item.objects.filter(name__iexact='a'),
+            Item.objects.filter(name__startswith='a'),
+            Item.objects.filter(name__isnull=True),
+            Item.objects.exclude(value=1),
+            Item.objects.filter(Q(value=1) | Q(name='a')),
+            Item.objects.filter(value=1).order_by('-name'),
+            Item.objects.filter(value=1).order_by('name'),
+            Item.objects.filter(value=1).distinct(),
+            Item.objects.filter(value=1)[5:10],
+        )
+
+    def test_columns(self):
+        self.check(
+            Item.objects.all(),
+            Item.objects.values('name'),
+            Item.objects.values('value'),
+            Item.objects.values_list('name', 'value'),
+            Item.objects.only('name'),
+            Item.objects.defer('name'),
+        )
+
+    def test_select_related(self):
+        self.check(
+            Entry.objects.all(),
+            Entry.objects.select_related('item'),
+            Entry.objects.select_related('item').filter(item__name='a'),
+            Entry.objects.filter(item__name='a'),
+            Entry.objects.filter(item__tag__label='a'),
+        )
+
+    def test_extra(self):
+        self.check(
+            Item.objects.extra(select={'twice': 'value * %s'}, select_params=(2,)),
+            Item.objects.extra(select={'twice': 'value * %s'}, select_params=(3,)),
+            Item.objects.extra(select={'twice': 'value + %s'}, select_params=(3,)),
+            Item.objects.extra(where=['value > %s'], params=[1]),
+            Item.objects.extra(tables=['testapp_tag'], where=['testapp_tag.item_id = testapp_item.id']),
+            Item.objects.extra(order_by=['-value']),
+        )
+
+    def test_annotate(self):
+        self.check(
+            Item.objects.annotate(tags=Count('tag')),
+            Item.objects.annotate(entries=Count('entry')),
+            Item.objects.annotate(tags=Count('tag', distinct=True)),
+            Item.objects.annotate(tags=Count('tag')).filter(tags__gt=1),
+            Item.objects.annotate(tags=Count('tag')).filter(tags__gt=2).order_by('tags'),
+            Item.objects.values('name').annotate(latest=Max('created')),
+        )
+
+    def test_inheritance(self):
+        self.check(
+            Special.objects.all(),
+            Special.objects.filter(name='a'),
+            Special.objects.filter(rank=1),
+            Special.objects.values('rank'),
+            Item.objects.filter(special__rank=1),
+        )
+
+    def test_dates(self):
+        self.check(
+            Item.objects.dates('created', 'year'),
+            Item.objects.dates('created', 'month'),
+            Item.objects.dates('created', 'month', order='DESC'),
+            Entry.objects.dates('day', 'day'),
+        )
+
+    def test_with_col_aliases(self):
+        queryset = Item.objects.annotate(tags=Count('tag'))
+        self.check(queryset)
+        self.check(queryset, with_col_aliases=True)
+        self.assertNotEqual(self.compile(self.cached, queryset),
+                            self.compile(self.cached, queryset, with_col_aliases=True))
@@ -0,0 +1,59 @@
+import CUBRIDdb
+from django.db.backends.cubrid.transactions import atomic
+
+from support import BackendTestCase, item_rows
+from testapp.models import Item
+
+class CountCacheTests(BackendTestCase):
+    def setUp(self):
+        super(CountCacheTests, self).setUp()
+        CUBRIDdb.respond(item_rows)
+
+    def counts(self):
+        return len(self.executed('SELECT COUNT(*)'))
+
+    def test_memoized(self):
+        db = self.database(COUNTS={'TTL': 60})
+        items = Item.objects.using(db.alias).filter(value__gt=5)
+        self.assertEqual(items.count(), 2)
+        self.assertEqual(items.count(), 2)
+        self.assertEqual(self.counts(), 1)
+
+    def test_invalidated_by_writes(self):
+        db = self.database(COUNTS={'TTL': 60})
+        items = Item.objects.using(db.alias).filter(value__gt=5)
+        items.count()
+        Item.objects.using(db.alias).create(name='third', value=30)
+        items.count()
+        self.assertEqual(self.counts(), 2)
+
+    def test_hint_invalidated_by_writes(self):
+        db = self.database()
+        items = Item.objects.using(db.alias).filter(value__gt=5).approximate(60)
+        items.count()
+        items.count()
+        Item.objects.using(db.alias).create(name='third', value=30)
+        items.count()
+        self.assertEqual(self.counts(), 2)
+
+    def test_estimate(self):
+        def rows(sql, params):
+            if sql.startswith('SHOW INDEX'):
+                return [('testapp_item', 0, 'pk', 1, 'id', 'A', 500000, None, None, 'NO', 'BTREE', None)]
+            return item_rows(sql, params)
+        CUBRIDdb.respond(rows)
+        db = self.database(COUNTS={'APPROXIMATE': True, 'MIN_APPROXIMATE': 1000})
+        self.assertEqual(Item.objects.using(db.alias).count(), 500000)
+        # Filtered counts are exact.
+        self.assertEqual(Item.objects.using(db.alias).filter(value__gt=5).count(), 2)
+        self.assertEqual(self.counts(), 1)
+
+    def test_not_memoized_with_pending_writes(self):
+        db = self.database(COUNTS={'TTL': 60})
+        items = Item.objects.using(db.alias).filter(value__gt=5)
+        items.count()
+        with atomic(db.alias):
+            Item.objects.using(db.alias).create(name='third', value=30)
+            items.count()
+            items.count()
+        self.assertEqual(self.counts(), 3)
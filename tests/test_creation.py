@@ -0,0 +1,52 @@
+import threading
+import time
+
+from support import BackendTestCase
+
+class WorkerTestDatabaseTests(BackendTestCase):
+    def setUp(self):
+        super(WorkerTestDatabaseTests, self).setUp()
+        self.db = self.database()
+        self.db.settings_dict['TEST_TEMPLATE'] = 'tpl'
+        creation = self.db.creation
+        self.commands = []
+        self.patch(creation, '_cubrid', lambda *args: self.commands.append(args) or 0)
+        self.patch(creation, '_schema_fingerprint', lambda: 'schema')
+        self.patch(creation, '_read_fingerprint', lambda name: 'schema')
+        self.patch(creation, '_rollback_works', lambda: True)
+
+    def test_clones_in_doubling_rounds(self):
+        lock = threading.Lock()
+        reading = set()
+        made = set(['tpl'])
+        self.rounds = []
+        copy_db = self.db.creation._copy_db
+        def copy(source_name, database_name):
+            lock.acquire()
+            try:
+                # Sources must be complete, and feed one copy at a time.
+                self.assertTrue(source_name in made)
+                self.assertFalse(source_name in reading)
+                reading.add(source_name)
+                if len(reading) == 1:
+                    self.rounds.append(0)
+                self.rounds[-1] += 1
+            finally:
+                lock.release()
+            copy_db(source_name, database_name)
+            time.sleep(0.02)
+            lock.acquire()
+            try:
+                reading.remove(source_name)
+                made.add(database_name)
+            finally:
+                lock.release()
+        self.patch(self.db.creation, '_copy_db', copy)
+
+        workers = self.db.creation.create_worker_test_dbs(6, verbosity=0)
+        names = ['test_%s_%d' % (self.db.alias, i) for i in range(1, 7)]
+        self.assertEqual([worker['NAME'] for worker in workers], names)
+        self.assertEqual(self.rounds, [1, 2, 3])
+        self.assertEqual(made, set(['tpl'] + names))
+        starts = [args[-1] for args in self.commands if args[:2] == ('server', 'start')]
+        self.assertEqual(sorted(starts), names)
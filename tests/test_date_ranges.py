@@ -0,0 +1,79 @@
+import datetime
+
+import CUBRIDdb
+from django.db.models import Q
+
+from support import BackendTestCase
+from testapp.models import Entry, Item
+
+DAY = '`testapp_entry`.`day`'
+
+class DateRangeTests(BackendTestCase):
+    "Year, month and day lookups on one column become a range on it."
+    def setUp(self):
+        super(DateRangeTests, self).setUp()
+        self.db = self.database()
+
+    def where(self, queryset):
+        "Returns the WHERE clause of `queryset`, spaced out evenly, and its parameters."
+        sql, params = queryset.query.get_compiler(self.db.alias).as_sql(with_limits=False)
+        return ' '.join(sql[sql.index(' WHERE ') + 7:].split()), list(params)
+
+    def assertRange(self, queryset, start, end):
+        self.assertEqual(self.where(queryset),
+                         ('(%s >= %%s AND %s < %%s )' % (DAY, DAY), [start, end]))
+
+    def test_year(self):
+        self.assertRange(Entry.objects.filter(day__year=2011), '2011-01-01', '2012-01-01')
+
+    def test_year_and_month(self):
+        self.assertRange(Entry.objects.filter(day__year=2011, day__month=12), '2011-12-01', '2012-01-01')
+        # Added one filter() at a time.
+        self.assertRange(Entry.objects.filter(day__month=3).filter(day__year=2011),
+                         '2011-03-01', '2011-04-01')
+
+    def test_year_month_and_day(self):
+        self.assertRange(Entry.objects.filter(day__year=2012, day__month=2, day__day=29),
+                         '2012-02-29', '2012-03-01')
+
+    def test_datetime(self):
+        where, params = self.where(Item.objects.filter(created__year=2011, created__month=3))
+        self.assertEqual(where, '(`testapp_item`.`created` >= %s AND `testapp_item`.`created` < %s )')
+        self.assertEqual(params, ['2011-03-01 00:00:00', '2011-04-01 00:00:00'])
+
+    def test_impossible_date(self):
+        where, params = self.where(Entry.objects.filter(day__year=2011, day__month=2, day__day=30))
+        # As Django writes them: nothing matches either way.
+        self.assertEqual(where.count('EXTRACT('), 2)
+        self.assertTrue('%s BETWEEN %%s and %%s' % DAY in where)
+        self.assertFalse(' >= ' in where)
+        self.assertEqual(sorted(p for p in params if isinstance(p, int)), [2, 30])
+
+    def test_without_year(self):
+        where, params = self.where(Entry.objects.filter(day__month=3))
+        self.assertEqual(where, 'EXTRACT(MONTH FROM %s) = %%s' % DAY)
+        self.assertEqual(params, [3])
+        where, params = self.where(Entry.objects.filter(day__month=3, day__day=1))
+        self.assertEqual(where.count('EXTRACT('), 2)
+
+    def test_exclude(self):
+        self.assertEqual(self.where(Entry.objects.exclude(day__year=2011, day__month=3)), (
+            'NOT (%s >= %%s AND %s < %%s )' % (DAY, DAY), ['2011-03-01', '2011-04-01']))
+
+    def test_or(self):
+        queryset = Entry.objects.filter(Q(day__year=2011) | Q(day__year=2013, day__month=1))
+        self.assertEqual(self.where(queryset), (
+            '((%s >= %%s AND %s < %%s ) OR (%s >= %%s AND %s < %%s ))' % ((DAY,) * 4),
+            ['2011-01-01', '2012-01-01', '2013-01-01', '2013-02-01']))
+        # Parts of a date on either side of an OR are not one date.
+        where, params = self.where(Entry.objects.filter(Q(day__year=2011) | Q(day__month=1)))
+        self.assertEqual(where.count('EXTRACT('), 1)
+        self.assertEqual(params, ['2011-01-01', '2012-01-01', 1])
+
+class DatesTests(BackendTestCase):
+    def test_datetimes(self):
+        db = self.database()
+        for value in (datetime.datetime(2011, 3, 1), '2011-03-01 00:00:00'):
+            CUBRIDdb.respond(lambda sql, params: [(value,)])
+            self.assertEqual(list(Item.objects.using(db.alias).dates('created', 'month')),
+                             [datetime.datetime(2011, 3, 1)])
@@ -0,0 +1,69 @@
+import CUBRIDdb
+from django.core.management.color import no_style
+
+from support import BackendTestCase
+from testapp.models import Item
+
+TABLES = ['testapp_item', 'testapp_tag']
+SEQUENCES = [{'table': 'testapp_item', 'column': 'id'}, {'table': 'testapp_tag', 'column': 'id'}]
+
+class FlushDirtyOnlyTests(BackendTestCase):
+    def setUp(self):
+        super(FlushDirtyOnlyTests, self).setUp()
+        self.db = self.database(FLUSH_DIRTY_ONLY=True)
+        self.batches = []
+        batches = self.batches
+        self.patch(CUBRIDdb.Connection, 'batch_execute',
+                   lambda connection, statements: batches.append(statements))
+
+    def sql_flush(self):
+        return self.db.ops.sql_flush(no_style(), TABLES, SEQUENCES)
+
+    def flush(self):
+        cursor = self.db.cursor()
+        for sql in self.sql_flush():
+            cursor.execute(sql)
+
+    def test_first_flush_resets_everything(self):
+        self.assertEqual(self.sql_flush(), [
+            'TRUNCATE `testapp_item`; TRUNCATE `testapp_tag`; '
+            'ALTER TABLE `testapp_item` AUTO_INCREMENT = 1; ALTER TABLE `testapp_tag` AUTO_INCREMENT = 1;'])
+        self.flush()
+        self.assertEqual(len(self.batches), 1)
+        self.assertEqual(len(self.batches[0]), 4)
+        self.assertEqual(self.db.dirty_tables, set())
+
+    def test_only_dirty_tables(self):
+        self.flush()
+        self.assertEqual(self.sql_flush(), [])
+        Item.objects.using(self.db.alias).create(name='a')
+        self.assertEqual(self.sql_flush(), [
+            'TRUNCATE `testapp_item`; ALTER TABLE `testapp_item` AUTO_INCREMENT = 1;'])
+        self.flush()
+        self.assertEqual(self.sql_flush(), [])
+
+    def test_printing_keeps_tables_dirty(self):
+        # manage.py sqlflush only prints the SQL.
+        self.assertEqual(len(self.sql_flush()), 1)
+        self.assertEqual(self.db.dirty_tables, None)
+        self.flush()
+        Item.objects.using(self.db.alias).create(name='a')
+        self.sql_flush()
+        self.assertEqual(self.db.dirty_tables, set(['testapp_item']))
+        self.assertEqual(len(self.sql_flush()), 1)
+
+class FlushTests(BackendTestCase):
+    def test_statement_per_table(self):
+        db = self.database()
+        self.assertEqual(len(db.ops.sql_flush(no_style(), TABLES, SEQUENCES)), 4)
+        self.assertEqual(db.ops.sql_flush(no_style(), [], []), [])
+        self.assertEqual(db.dirty_tables, None)
+
+    def test_without_batch_execute(self):
+        db = self.database(FLUSH_DIRTY_ONLY=True)
+        cursor = db.cursor()
+        for sql in db.ops.sql_flush(no_style(), TABLES, SEQUENCES):
+            cursor.execute(sql)
+        self.assertEqual(len(self.executed('TRUNCATE')), 2)
+        self.assertEqual(len(self.executed('ALTER TABLE')), 2)
+        self.assertEqual(db.dirty_tables, set())
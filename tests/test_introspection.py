@@ -0,0 +1,75 @@
+import CUBRIDdb
+
+from support import BackendTestCase
+
+COLUMNS = [
+    ('testapp_item', 'id', 'INTEGER', 10, 0, 'NO'),
+    ('testapp_item', 'name', 'VARCHAR', 50, 0, 'NO'),
+    ('testapp_tag', 'id', 'INTEGER', 10, 0, 'NO'),
+    ('testapp_tag', 'item_id', 'INTEGER', 10, 0, 'NO'),
+    ('testapp_tag', 'label', 'STRING', 1073741823, 0, 'YES'),
+]
+
+INDEXES = [
+    ('testapp_item', 'pk_testapp_item_id', 'YES', 'YES', 'NO', 'id'),
+    ('testapp_tag', 'fk_testapp_tag_item_id', 'NO', 'NO', 'YES', 'item_id'),
+    ('testapp_tag', 'pk_testapp_tag_id', 'YES', 'YES', 'NO', 'id'),
+]
+
+CREATE_TAG = ('CREATE TABLE [testapp_tag] ([id] INTEGER AUTO_INCREMENT, [item_id] INTEGER NOT NULL, '
+              '[label] STRING, CONSTRAINT [pk_testapp_tag_id] PRIMARY KEY ([id]), '
+              'FOREIGN KEY ([item_id]) REFERENCES [testapp_item] ON DELETE RESTRICT)')
+
+def catalog(sql, params):
+    if 'FROM db_attribute' in sql:
+        return COLUMNS
+    if 'FROM db_index' in sql:
+        return INDEXES
+    if 'FROM db_class' in sql:
+        return [('testapp_item',), ('testapp_tag',)]
+    if sql.startswith('SHOW CREATE TABLE'):
+        return [('testapp_tag', CREATE_TAG)]
+    return []
+
+class IntrospectionTests(BackendTestCase):
+    def setUp(self):
+        super(IntrospectionTests, self).setUp()
+        CUBRIDdb.respond(catalog)
+        self.db = self.database()
+        self.cursor = self.db.cursor()
+        self.introspection = self.db.introspection
+
+    def test_tables_and_columns(self):
+        self.assertEqual(self.introspection.get_table_list(self.cursor), ['testapp_item', 'testapp_tag'])
+        description = self.introspection.get_table_description(self.cursor, 'testapp_tag')
+        self.assertEqual([d[0] for d in description], ['id', 'item_id', 'label'])
+        self.assertEqual(self.introspection.get_field_type(description[2][1], description[2]), 'TextField')
+
+    def test_indexes(self):
+        self.assertEqual(self.introspection.get_indexes(self.cursor, 'testapp_tag'), {
+            'id': {'primary_key': True, 'unique': True},
+            'item_id': {'primary_key': False, 'unique': False},
+        })
+
+    def test_relations(self):
+        self.assertEqual(self.introspection.get_relations(self.cursor, 'testapp_tag'), {1: (0, 'testapp_item')})
+        self.assertEqual(self.introspection.get_key_columns(self.cursor, 'testapp_tag'),
+                         [('item_id', 'testapp_item', 'id')])
+
+    def test_catalog_read_once(self):
+        for table in self.introspection.get_table_list(self.cursor):
+            self.introspection.get_table_description(self.cursor, table)
+            self.introspection.get_indexes(self.cursor, table)
+            self.introspection.get_relations(self.cursor, table)
+            self.introspection.get_relations(self.cursor, table)
+        self.assertEqual(len(self.statements), 4)
+        # Only the table the catalog lists foreign keys for.
+        self.assertEqual(self.executed('SHOW CREATE TABLE'), ['SHOW CREATE TABLE `testapp_tag`'])
+
+    def test_schema_changes_clear_cache(self):
+        self.introspection.get_table_list(self.cursor)
+        self.cursor.execute('ALTER TABLE `testapp_item` ADD COLUMN x INTEGER')
+        self.introspection.get_table_list(self.cursor)
+        self.cursor.execute('ALTER TABLE `testapp_item` AUTO_INCREMENT = 1')
+        self.introspection.get_table_list(self.cursor)
+        self.assertEqual(len([sql for sql in self.statements if 'FROM db_class' in sql]), 2)
@@ -0,0 +1,67 @@
+import CUBRIDdb
+
+from support import BackendTestCase
+from testapp.models import Item
+
+class KeysetTests(BackendTestCase):
+    def setUp(self):
+        super(KeysetTests, self).setUp()
+        self.db = self.database()
+        self.items = Item.objects.using(self.db.alias)
+
+    def where(self, queryset):
+        sql, params = queryset.query.get_compiler(self.db.alias).as_sql()
+        where = sql[sql.index(' WHERE ') + 7:]
+        return where[:where.index(' ORDER BY ')], params
+
+    def test_ascending(self):
+        self.assertEqual(self.where(self.items.order_by('value', 'id').after(10, 3)), (
+            '(`testapp_item`.`value` >= %s  AND (`testapp_item`.`value` > %s  OR '
+            '(`testapp_item`.`value` = %s  AND `testapp_item`.`id` > %s )))',
+            (10, 10, 10, 3)))
+
+    def test_single_field(self):
+        self.assertEqual(self.where(self.items.order_by('id').after(3)),
+                         ('`testapp_item`.`id` > %s ', (3,)))
+
+    def test_descending(self):
+        self.assertEqual(self.where(self.items.order_by('-value', '-id').after(10, 3)), (
+            '(`testapp_item`.`value` <= %s  AND (`testapp_item`.`value` < %s  OR '
+            '(`testapp_item`.`value` = %s  AND `testapp_item`.`id` < %s )))',
+            (10, 10, 10, 3)))
+
+    def test_mixed(self):
+        self.assertEqual(self.where(self.items.order_by('value', '-id').after(10, 3)), (
+            '(`testapp_item`.`value` >= %s  AND (`testapp_item`.`value` > %s  OR '
+            '(`testapp_item`.`value` = %s  AND `testapp_item`.`id` < %s )))',
+            (10, 10, 10, 3)))
+
+    def test_reverse(self):
+        self.assertEqual(self.where(self.items.order_by('-id').reverse().after(3)),
+                         ('`testapp_item`.`id` > %s ', (3,)))
+        self.assertEqual(self.where(self.items.order_by('id').reverse().after(3)),
+                         ('`testapp_item`.`id` < %s ', (3,)))
+
+    def test_ordering_changed(self):
+        page = self.items.order_by('value', 'id').after(10, 3)
+        self.assertRaises(ValueError, list, page.order_by('name'))
+        self.assertRaises(ValueError, list, page.reverse())
+        # Ordering again the same way is harmless.
+        list(page.order_by('value', 'id'))
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, self.items.after, 1)
+        self.assertRaises(ValueError, self.items.order_by('id').after, 1, 2)
+        self.assertRaises(ValueError, self.items.order_by('?').after, 1)
+        self.assertRaises(ValueError, self.items.order_by('id').after)
+
+    def test_count_and_exists(self):
+        CUBRIDdb.respond(lambda sql, params: [(1,)])
+        page = self.items.order_by('id').after(3)
+        page.count()
+        page.exists()
+        self.assertEqual(len([sql for sql in self.statements if '`testapp_item`.`id` > ?' in sql]), 2)
+
+    def test_delete(self):
+        self.items.order_by('id').after(3).delete()
+        self.assertTrue([sql for sql in self.statements if '`testapp_item`.`id` > ?' in sql])
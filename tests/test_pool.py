@@ -0,0 +1,108 @@
+import threading
+import time
+import unittest
+
+import CUBRIDdb
+from django.db.backends.cubrid.pool import ConnectionPool, PoolTimeout
+
+from support import BackendTestCase
+
+class FakeConnection(object):
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+class ConnectionPoolTests(unittest.TestCase):
+    def pool(self, **options):
+        self.opened = []
+        def connect():
+            connection = FakeConnection()
+            self.opened.append(connection)
+            return connection
+        return ConnectionPool(connect, **options)
+
+    def test_reuses_connections(self):
+        pool = self.pool()
+        connection = pool.get()
+        pool.put(connection)
+        self.assertTrue(pool.get() is connection)
+        self.assertEqual(len(self.opened), 1)
+
+    def test_min_size(self):
+        pool = self.pool(min_size=2)
+        pool.get()
+        self.assertEqual(len(self.opened), 2)
+        self.assertEqual(pool.stats()['idle'], 1)
+
+    def test_wait_timeout(self):
+        pool = self.pool(max_size=1, wait_timeout=0.02)
+        pool.get()
+        self.assertRaises(PoolTimeout, pool.get)
+        self.assertEqual(pool.stats()['timeouts'], 1)
+
+    def test_waits_for_a_connection(self):
+        pool = self.pool(max_size=1, wait_timeout=5)
+        connection = pool.get()
+        timer = threading.Timer(0.02, pool.put, (connection,))
+        timer.start()
+        self.assertTrue(pool.get() is connection)
+        timer.join()
+        self.assertEqual(pool.stats()['waits'], 1)
+
+    def test_discard(self):
+        pool = self.pool()
+        connection = pool.get()
+        pool.put(connection, discard=True)
+        self.assertTrue(connection.closed)
+        stats = pool.stats()
+        self.assertEqual((stats['size'], stats['closed']), (0, 1))
+
+    def test_max_lifetime(self):
+        pool = self.pool(max_lifetime=0.01)
+        connection = pool.get()
+        time.sleep(0.02)
+        pool.put(connection)
+        self.assertTrue(connection.closed)
+
+    def test_idle_timeout(self):
+        pool = self.pool(idle_timeout=0.01)
+        connection = pool.get()
+        pool.put(connection)
+        time.sleep(0.02)
+        self.assertFalse(pool.get() is connection)
+        self.assertTrue(connection.closed)
+
+    def test_close_retires_checked_out_connections(self):
+        pool = self.pool()
+        idle, checked_out = pool.get(), pool.get()
+        pool.put(idle)
+        pool.close()
+        self.assertTrue(idle.closed)
+        pool.put(checked_out)
+        self.assertTrue(checked_out.closed)
+        stats = pool.stats()
+        self.assertEqual((stats['size'], stats['idle'], stats['created'], stats['closed']), (0, 0, 2, 2))
+
+class PooledDatabaseTests(BackendTestCase):
+    def test_close_returns_connection(self):
+        db = self.database(POOL={'MAX_SIZE': 1})
+        db.cursor()
+        connection = db.connection
+        db.close()
+        self.assertEqual(db.pool.stats()['idle'], 1)
+        # Rolled back on the way, so the next user starts afresh.
+        self.assertEqual(CUBRIDdb.CALLS['rollback'], 1)
+        db.cursor()
+        self.assertTrue(db.connection is connection)
+
+    def test_shared_by_connections_to_same_database(self):
+        db = self.database(POOL=True)
+        db.cursor()
+        connection = db.connection
+        db.close()
+        other = db.__class__(db.settings_dict, db.alias)
+        other.cursor()
+        self.assertTrue(other.connection is connection)
+        other.close()
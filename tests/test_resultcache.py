@@ -0,0 +1,46 @@
+import CUBRIDdb
+
+from support import BackendTestCase, item_rows
+from testapp.models import Item
+
+class ResultCacheTests(BackendTestCase):
+    def setUp(self):
+        super(ResultCacheTests, self).setUp()
+        CUBRIDdb.respond(item_rows)
+        self.db = self.database(RESULT_CACHE={'TTL': 60})
+        self.items = Item.objects.using(self.db.alias)
+
+    def test_opt_in(self):
+        list(self.items.all())
+        list(self.items.all())
+        self.assertEqual(len(self.executed('SELECT')), 2)
+
+    def test_hit(self):
+        first = [(item.pk, item.name) for item in self.items.cache()]
+        second = [(item.pk, item.name) for item in self.items.cache()]
+        self.assertEqual(first, [(1, u'first'), (2, u'second')])
+        # Decoding does not change the cached rows.
+        self.assertEqual(second, first)
+        self.assertEqual(len(self.executed('SELECT')), 1)
+        self.assertEqual(self.db.result_cache.stats()['hits'], 1)
+
+    def test_invalidated_by_writes(self):
+        list(self.items.cache())
+        self.items.create(name='third')
+        list(self.items.cache())
+        self.assertEqual(len(self.executed('SELECT')), 2)
+
+    def test_count_and_exists(self):
+        self.assertEqual(self.items.cache().count(), 2)
+        self.assertEqual(self.items.cache().count(), 2)
+        self.assertTrue(self.items.cache().exists())
+        self.assertTrue(self.items.cache().exists())
+        self.assertEqual(len(self.executed('SELECT')), 2)
+
+    def test_max_entries_zero(self):
+        db = self.database(RESULT_CACHE={'MAX_ENTRIES': 0})
+        list(Item.objects.using(db.alias).cache())
+        list(Item.objects.using(db.alias).cache())
+        self.assertEqual(len(self.executed('SELECT')), 2)
+        stats = db.result_cache.stats()
+        self.assertEqual((stats['entries'], stats['bytes'], stats['sets']), (0, 0, 0))
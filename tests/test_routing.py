@@ -0,0 +1,149 @@
+import time
+import unittest
+
+import CUBRIDdb
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.backends.cubrid.routing import EndpointSet
+
+from support import BackendTestCase
+
+class EndpointSetTests(unittest.TestCase):
+    def test_endpoints(self):
+        endpoints = EndpointSet(['db1:33000', ('db2', 33001), {'HOST': 'db3', 'PORT': '33002'}])
+        self.assertEqual([(e.host, e.port) for e in endpoints.endpoints],
+                         [('db1', '33000'), ('db2', '33001'), ('db3', '33002')])
+        self.assertRaises(ImproperlyConfigured, EndpointSet, ['db1'])
+        self.assertRaises(ImproperlyConfigured, EndpointSet, ['db1:1'], balancing='random')
+
+    def test_backoff(self):
+        endpoints = EndpointSet(['db1:1', 'db2:1'], backoff=1, max_backoff=3)
+        first = endpoints.endpoints[0]
+        for delay in (1, 2, 3, 3):
+            endpoints.failure(first)
+            self.assertAlmostEqual(first.ejected_until - time.time(), delay, 1)
+        self.assertEqual(endpoints.available(), endpoints.endpoints[1:])
+        self.assertEqual(endpoints.failover_order(), endpoints.endpoints[::-1])
+        endpoints.success(first)
+        self.assertEqual((first.failures, first.ejected_until), (0, 0))
+        self.assertEqual(endpoints.failover_order(), endpoints.endpoints)
+
+    def test_least_connections(self):
+        endpoints = EndpointSet(['ro1:1', 'ro2:1'])
+        first, second = endpoints.endpoints
+        endpoints.acquire(first)
+        self.assertTrue(endpoints.choose() is second)
+        endpoints.acquire(second)
+        endpoints.acquire(second)
+        self.assertTrue(endpoints.choose() is first)
+        endpoints.failure(first)
+        self.assertTrue(endpoints.choose() is second)
+        endpoints.failure(second)
+        self.assertTrue(endpoints.choose() is None)
+
+class RoutingTests(BackendTestCase):
+    def setUp(self):
+        super(RoutingTests, self).setUp()
+        self.dead = set()
+        connect = CUBRIDdb.connect
+        dead = self.dead
+        def flaky_connect(url, *args):
+            if url.split(':')[1] in dead:
+                raise CUBRIDdb.OperationalError(-1, 'Cannot connect to %s' % url)
+            return connect(url, *args)
+        self.patch(CUBRIDdb, 'connect', flaky_connect)
+
+    def host(self, cursor):
+        "Returns the host of the connection `cursor` last ran a statement on."
+        return cursor.cursor.connection.url.split(':')[1]
+
+    def test_reads_go_to_replicas(self):
+        db = self.database(REPLICAS=['ro1:33000'])
+        cursor = db.cursor()
+        cursor.execute('SELECT 1')
+        self.assertEqual(self.host(cursor), 'ro1')
+        cursor.execute('UPDATE t SET a = 1')
+        self.assertEqual(self.host(cursor), 'localhost')
+
+    def test_transactions_stay_on_primary(self):
+        db = self.database(REPLICAS=['ro1:33000'])
+        transaction.enter_transaction_management(using=db.alias)
+        transaction.managed(True, using=db.alias)
+        try:
+            cursor = db.cursor()
+            cursor.execute('SELECT 1')
+            self.assertEqual(self.host(cursor), 'localhost')
+            cursor.execute('UPDATE t SET a = 1')
+            cursor.execute('SELECT 1')
+            self.assertEqual(self.host(cursor), 'localhost')
+        finally:
+            transaction.rollback(using=db.alias)
+            transaction.leave_transaction_management(using=db.alias)
+        self.assertEqual(db.replicas.endpoints[0].connections, 0)
+
+    def test_dead_replica(self):
+        self.dead.add('ro1')
+        db = self.database(REPLICAS=['ro1:33000', 'ro2:33000'])
+        cursor = db.cursor()
+        cursor.execute('SELECT 1')
+        self.assertEqual(self.host(cursor), 'ro2')
+        self.dead.add('ro2')
+        db.close()
+        cursor = db.cursor()
+        cursor.execute('SELECT 1')
+        # Every replica is ejected: read from the primary.
+        self.assertEqual(self.host(cursor), 'localhost')
+        self.assertEqual([e.failures for e in db.replicas.endpoints], [1, 1])
+
+    def test_close_releases_replica(self):
+        db = self.database(REPLICAS=['ro1:33000'])
+        replica = db.replicas.endpoints[0]
+        db.cursor().execute('SELECT 1')
+        self.assertEqual(replica.connections, 1)
+        db.close()
+        self.assertEqual(replica.connections, 0)
+        self.assertTrue(db.replica_connection is None)
+        db.close()
+        self.assertEqual(replica.connections, 0)
+
+    def test_primary_failover(self):
+        self.dead.add('db1')
+        db = self.database(PRIMARIES=['db1:33000', 'db2:33000'], EJECT_BACKOFF=10)
+        first = db.primaries.endpoints[0]
+        cursor = db.cursor()
+        cursor.execute('UPDATE t SET a = 1')
+        self.assertEqual(self.host(cursor), 'db2')
+        self.assertEqual(first.failures, 1)
+        self.assertAlmostEqual(first.ejected_until - time.time(), 10, 0)
+
+        # While ejected, db1 is tried last, so not at all.
+        connects = CUBRIDdb.CALLS['connect']
+        db.close()
+        db.cursor()
+        self.assertEqual(db.endpoint.host, 'db2')
+        self.assertEqual(CUBRIDdb.CALLS['connect'], connects + 1)
+
+        # Once the ejection is over, db1 is tried again and ejected for longer.
+        first.ejected_until = 0
+        db.close()
+        db.cursor()
+        self.assertEqual(db.endpoint.host, 'db2')
+        self.assertEqual(first.failures, 2)
+        self.assertAlmostEqual(first.ejected_until - time.time(), 20, 0)
+
+        # Back up: its first success clears the record.
+        self.dead.clear()
+        first.ejected_until = 0
+        db.close()
+        db.cursor()
+        self.assertEqual(db.endpoint.host, 'db1')
+        self.assertEqual((first.failures, first.ejected_until), (0, 0))
+
+    def test_every_primary_dead(self):
+        self.dead.update(['db1', 'db2'])
+        db = self.database(PRIMARIES=['db1:33000', 'db2:33000'])
+        self.assertRaises(CUBRIDdb.OperationalError, db.cursor)
+        # Ejected primaries are still tried when there is nothing else.
+        self.dead.remove('db2')
+        db.cursor()
+        self.assertEqual(db.endpoint.host, 'db2')
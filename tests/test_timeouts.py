@@ -0,0 +1,106 @@
+import threading
+import time
+import unittest
+
+import CUBRIDdb
+from django.db.backends.cubrid.hints import query_hints
+from django.db.backends.cubrid.timeouts import QueryTimeout, Watchdog, cancel_statement
+
+from support import BackendTestCase
+
+class WatchdogTests(unittest.TestCase):
+    def test_fires_after_deadline(self):
+        fired = threading.Event()
+        watch = Watchdog().watch(0.01, fired.set)
+        fired.wait(1)
+        self.assertTrue(fired.isSet())
+        self.assertTrue(watch.finish())
+
+    def test_finished_watch_does_not_fire(self):
+        calls = []
+        watch = Watchdog().watch(0.02, lambda: calls.append(1))
+        self.assertFalse(watch.finish())
+        time.sleep(0.05)
+        self.assertEqual(calls, [])
+
+    def test_finished_watches_let_go(self):
+        watchdog = Watchdog()
+        watch = watchdog.watch(60, lambda: None)
+        watch.finish()
+        # The action holds the connection it would cancel.
+        self.assertTrue(watch.action is None)
+        for i in range(1000):
+            watchdog.watch(60, lambda: None).finish()
+        self.assertTrue(len(watchdog._heap) <= watchdog.compact_above + 1)
+
+class CancelStatementTests(unittest.TestCase):
+    def test_driver_cancel(self):
+        connection = CUBRIDdb.Connection('url')
+        calls = []
+        connection.cancel = lambda: calls.append('cancel')
+        self.assertFalse(cancel_statement(connection))
+        self.assertEqual(calls, ['cancel'])
+
+    def test_without_driver_cancel(self):
+        CUBRIDdb.CALLS.clear()
+        self.assertTrue(cancel_statement(CUBRIDdb.Connection('url')))
+        # The connection is still in use by another thread.
+        self.assertFalse('close' in CUBRIDdb.CALLS)
+
+class StatementTimeoutTests(BackendTestCase):
+    def setUp(self):
+        super(StatementTimeoutTests, self).setUp()
+        execute = CUBRIDdb.Cursor.execute
+        def slow_execute(cursor, sql, params=None):
+            if 'SLEEP' in sql:
+                deadline = time.time() + 0.3
+                while time.time() < deadline:
+                    if getattr(cursor.connection, 'cancelled', False):
+                        raise CUBRIDdb.DatabaseError(-1, 'Interrupted')
+                    time.sleep(0.005)
+            return execute(cursor, sql, params)
+        self.patch(CUBRIDdb.Cursor, 'execute', slow_execute)
+        self.db = self.database(STATEMENT_TIMEOUT=0.05, POOL={'MAX_SIZE': 2})
+
+    def test_driver_cancel(self):
+        self.patch(CUBRIDdb.Connection, 'cancel', lambda self: setattr(self, 'cancelled', True))
+        cursor = self.db.cursor()
+        first = self.db.connection
+        started = time.time()
+        self.assertRaises(QueryTimeout, cursor.execute, 'SELECT SLEEP')
+        self.assertTrue(time.time() - started < 0.25)
+        stats = self.db.pool.stats()
+        self.assertEqual((stats['idle'], stats['in_use'], stats['closed']), (1, 0, 0))
+        # The cursor goes on with the connection the pool hands out next.
+        first.cancelled = False
+        cursor.execute('SELECT 1')
+        self.assertTrue(self.db.connection is first)
+        self.assertTrue(cursor.cursor.connection is first)
+
+    def test_without_driver_cancel(self):
+        cursor = self.db.cursor()
+        first = self.db.connection
+        started = time.time()
+        self.assertRaises(QueryTimeout, cursor.execute, 'SELECT SLEEP')
+        # Left to complete, then discarded.
+        self.assertTrue(time.time() - started >= 0.25)
+        stats = self.db.pool.stats()
+        self.assertEqual((stats['idle'], stats['in_use'], stats['closed']), (0, 0, 1))
+        cursor.execute('SELECT 1')
+        self.assertFalse(self.db.connection is first)
+        self.assertTrue(cursor.cursor.connection is self.db.connection)
+
+    def test_hint_overrides_option(self):
+        cursor = self.db.cursor()
+        hints = query_hints(timeout=None)
+        hints.__enter__()
+        try:
+            cursor.execute('SELECT SLEEP')
+        finally:
+            hints.__exit__(None, None, None)
+        self.assertEqual(self.executed('SELECT SLEEP'), ['SELECT SLEEP'])
+
+    def test_fast_statement(self):
+        cursor = self.db.cursor()
+        cursor.execute('SELECT 1')
+        self.assertEqual(self.db.pool.stats()['in_use'], 1)
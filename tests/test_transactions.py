@@ -0,0 +1,144 @@
+import CUBRIDdb
+from django.db import transaction
+from django.db.backends.cubrid.transactions import atomic, batch
+
+from support import BackendTestCase
+from testapp.models import Item
+
+class TransactionTests(BackendTestCase):
+    def test_commit_per_save(self):
+        db = self.database()
+        Item.objects.using(db.alias).create(name='a')
+        self.assertEqual(CUBRIDdb.CALLS['commit'], 1)
+        self.assertTrue(db.features.uses_savepoints)
+
+    def test_atomic(self):
+        db = self.database()
+        with atomic(db.alias):
+            Item.objects.using(db.alias).create(name='a')
+            Item.objects.using(db.alias).create(name='b')
+        self.assertEqual(CUBRIDdb.CALLS['commit'], 1)
+
+    def test_atomic_rolls_back(self):
+        db = self.database()
+        try:
+            with atomic(db.alias):
+                Item.objects.using(db.alias).create(name='a')
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertEqual(CUBRIDdb.CALLS['rollback'], 1)
+        self.assertFalse('commit' in CUBRIDdb.CALLS)
+        self.assertFalse(transaction.is_managed(using=db.alias))
+
+    def test_nested_atomic_uses_savepoints(self):
+        db = self.database()
+        with atomic(db.alias):
+            Item.objects.using(db.alias).create(name='a')
+            try:
+                with atomic(db.alias):
+                    Item.objects.using(db.alias).create(name='b')
+                    raise ValueError
+            except ValueError:
+                pass
+        self.assertEqual(len(self.executed('SAVEPOINT')), 1)
+        self.assertEqual(len(self.executed('ROLLBACK TO SAVEPOINT')), 1)
+        self.assertEqual(CUBRIDdb.CALLS['commit'], 1)
+
+    def test_batch_commits_every_size_writes(self):
+        db = self.database()
+        with batch(3, using=db.alias):
+            for i in range(7):
+                Item.objects.using(db.alias).filter(pk=i).update(value=i)
+        # After the third and sixth writes, then at the end.
+        self.assertEqual(CUBRIDdb.CALLS['commit'], 3)
+        self.assertEqual(db.commit_every, None)
+
+    def test_batch_counts_statements(self):
+        db = self.database()
+        with batch(3, using=db.alias):
+            Item.objects.using(db.alias).all().update(value=1)
+            Item.objects.using(db.alias).all().update(value=2)
+            self.assertFalse('commit' in CUBRIDdb.CALLS)
+        self.assertEqual(CUBRIDdb.CALLS['commit'], 1)
+
+    def test_batch_keeps_savepoints(self):
+        db = self.database()
+        with batch(2, using=db.alias):
+            with atomic(db.alias):
+                for i in range(3):
+                    Item.objects.using(db.alias).filter(pk=i).update(value=i)
+                self.assertFalse('commit' in CUBRIDdb.CALLS)
+                try:
+                    with atomic(db.alias):
+                        Item.objects.using(db.alias).filter(pk=3).update(value=3)
+                        raise ValueError
+                except ValueError:
+                    pass
+                self.assertFalse('commit' in CUBRIDdb.CALLS)
+            self.assertEqual(db.open_savepoints, 0)
+            # Held back until the savepoints are gone.
+            Item.objects.using(db.alias).filter(pk=4).update(value=4)
+            self.assertEqual(CUBRIDdb.CALLS['commit'], 1)
+        self.assertEqual(len(self.executed('ROLLBACK TO SAVEPOINT')), 1)
+        self.assertEqual(CUBRIDdb.CALLS['commit'], 2)
+
+    def test_batch_does_not_nest(self):
+        db = self.database()
+        with batch(3, using=db.alias):
+            self.assertRaises(transaction.TransactionManagementError, batch(3, using=db.alias).__enter__)
+
+class AutocommitTests(BackendTestCase):
+    def setUp(self):
+        super(AutocommitTests, self).setUp()
+        self.db = self.database(AUTOCOMMIT=True)
+
+    def test_no_commit_per_save(self):
+        Item.objects.using(self.db.alias).create(name='a')
+        self.assertFalse('commit' in CUBRIDdb.CALLS)
+        self.assertTrue(self.db.connection.autocommit)
+
+    def test_no_savepoints_outside_transactions(self):
+        self.assertFalse(self.db.features.uses_savepoints)
+        Item.objects.using(self.db.alias).get_or_create(name='a')
+        self.assertEqual(self.executed('SAVEPOINT'), [])
+        self.assertEqual(self.executed('ROLLBACK TO SAVEPOINT'), [])
+
+    def test_off_inside_transactions(self):
+        with atomic(self.db.alias):
+            Item.objects.using(self.db.alias).create(name='a')
+            self.assertFalse(self.db.connection.autocommit)
+            self.assertTrue(self.db.features.uses_savepoints)
+            with atomic(self.db.alias):
+                Item.objects.using(self.db.alias).create(name='b')
+        self.assertEqual(len(self.executed('SAVEPOINT')), 1)
+        self.assertEqual(CUBRIDdb.CALLS['commit'], 1)
+        self.assertTrue(self.db.connection.autocommit)
+        self.assertFalse(self.db.features.uses_savepoints)
+
+    def test_decorators(self):
+        alias = self.db.alias
+        @transaction.commit_on_success(using=alias)
+        def save():
+            Item.objects.using(alias).create(name='a')
+            self.assertFalse(self.db.connection.autocommit)
+        save()
+        self.assertEqual(CUBRIDdb.CALLS['commit'], 1)
+        self.assertTrue(self.db.connection.autocommit)
+
+    def test_pending_changes_rolled_back_before_autocommit(self):
+        alias = self.db.alias
+        @transaction.commit_manually(using=alias)
+        def forget():
+            Item.objects.using(alias).create(name='a')
+        self.assertRaises(transaction.TransactionManagementError, forget)
+        self.assertEqual(CUBRIDdb.CALLS['rollback'], 1)
+        self.assertTrue(self.db.connection.autocommit)
+
+    def test_new_connections_get_the_mode(self):
+        self.db.cursor()
+        self.assertTrue(self.db.connection.autocommit)
+        with atomic(self.db.alias):
+            self.db.close()
+            self.db.cursor()
+            self.assertFalse(self.db.connection.autocommit)
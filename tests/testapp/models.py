@@ -0,0 +1,24 @@
+from django.db import models
+
+from django.db.backends.cubrid.query import CubridManager
+
+class Item(models.Model):
+    name = models.CharField(max_length=50)
+    value = models.IntegerField(default=0)
+    created = models.DateTimeField(auto_now_add=True)
+
+    objects = CubridManager()
+
+class Tag(models.Model):
+    item = models.ForeignKey(Item)
+    label = models.CharField(max_length=20, db_index=True)
+
+class Special(Item):
+    rank = models.IntegerField(default=0)
+
+class Entry(models.Model):
+    item = models.ForeignKey(Item)
+    day = models.DateField()
+    rank = models.IntegerField(default=0)
+
+    objects = CubridManager()
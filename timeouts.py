@@ -0,0 +1,167 @@
+"""
+Statement timeouts for the CUBRID backend.
+
+A default timeout, in seconds, is set for every statement run on a database
+with 'STATEMENT_TIMEOUT' in OPTIONS:
+
+    'OPTIONS': {
+        'STATEMENT_TIMEOUT': 30,
+    }
+
+It is overridden for the queries of one queryset with
+CubridQuerySet.timeout(), or for every query run in a block with
+query_hints(timeout=...), where None disables the timeout:
+
+    Report.objects.timeout(120).filter(...)
+
+    with query_hints(timeout=2):
+        ...
+
+A statement still running when its timeout expires is cancelled from a
+watchdog thread through the driver's cancel(). The cursor then raises
+QueryTimeout, after handing the connection back to its pool rolled back.
+Drivers without cancel() can't be interrupted safely from another thread,
+so the statement runs to completion there; the cursor raises QueryTimeout
+once it returns and discards the connection. Either way the transaction
+the statement ran in is lost, and the next statement run through the
+cursor gets a new connection.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+
+from django.db import utils
+
+class QueryTimeout(utils.DatabaseError):
+    "Raised when a statement is cancelled for running past its timeout."
+    pass
+
+RUNNING, DONE, FIRED = 0, 1, 2
+
+class Watch(object):
+    "A statement being watched, and what to do if it runs too long."
+    __slots__ = ('action', 'state', 'discard', 'watchdog', '_lock')
+
+    def __init__(self, action, watchdog):
+        self.action = action
+        self.state = RUNNING
+        # Set by the action: True if the connection must not be reused.
+        self.discard = False
+        self.watchdog = watchdog
+        self._lock = threading.Lock()
+
+    def fire(self):
+        self._lock.acquire()
+        try:
+            if self.state == RUNNING:
+                self.state = FIRED
+                self.discard = self.action()
+                self.action = None
+        finally:
+            self._lock.release()
+
+    def finish(self):
+        """
+        Stops watching the statement. Returns True if it timed out, once the
+        action taken has completed.
+        """
+        self._lock.acquire()
+        try:
+            finished = self.state == RUNNING
+            if finished:
+                self.state = DONE
+                # Whatever the action holds on to, e.g. the connection.
+                self.action = None
+            fired = self.state == FIRED
+        finally:
+            self._lock.release()
+        if finished:
+            self.watchdog.finished()
+        return fired
+
+class Watchdog(object):
+    """
+    A single thread firing the watches whose deadline passed, so that
+    timeouts cost a heap push per statement rather than a thread.
+    """
+    # Finished watches are dropped as they reach the top of the heap, and
+    # all at once when they make up more than half of it.
+    compact_above = 64
+
+    def __init__(self):
+        self._heap = []
+        # Finished watches still in the heap.
+        self._finished = 0
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def watch(self, seconds, action):
+        "Returns a Watch calling `action` unless finished within `seconds`."
+        watch = Watch(action, self)
+        self._condition.acquire()
+        try:
+            heapq.heappush(self._heap, (time.time() + seconds, self._sequence.next(), watch))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='cubrid-watchdog')
+                self._thread.daemon = True
+                self._thread.start()
+            elif self._heap[0][2] is watch:
+                # The new deadline is the earliest one.
+                self._condition.notify()
+        finally:
+            self._condition.release()
+        return watch
+
+    def finished(self):
+        "Called by Watch.finish() when a watch finished before its deadline."
+        self._condition.acquire()
+        try:
+            self._finished += 1
+            heap = self._heap
+            if self._finished > self.compact_above and self._finished * 2 > len(heap):
+                heap[:] = [entry for entry in heap if entry[2].state == RUNNING]
+                heapq.heapify(heap)
+                self._finished = 0
+        finally:
+            self._condition.release()
+
+    def _run(self):
+        heap = self._heap
+        while True:
+            self._condition.acquire()
+            try:
+                while True:
+                    while heap and heap[0][2].state == DONE:
+                        heapq.heappop(heap)
+                        self._finished -= 1
+                    now = time.time()
+                    if heap and heap[0][0] <= now:
+                        watch = heapq.heappop(heap)[2]
+                        break
+                    self._condition.wait(heap and heap[0][0] - now or None)
+            finally:
+                self._condition.release()
+            watch.fire()
+
+_watchdog = Watchdog()
+
+def watch(seconds, action):
+    return _watchdog.watch(seconds, action)
+
+def cancel_statement(connection):
+    """
+    Interrupts the statement running on the raw `connection` through the
+    driver's cancel(). Returns True if it could not, in which case the
+    connection must be discarded once the statement returns: closing it
+    here would pull it from under the thread still using it.
+    """
+    if hasattr(connection, 'cancel'):
+        try:
+            connection.cancel()
+            return False
+        except Exception:
+            pass
+    return True
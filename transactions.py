@@ -0,0 +1,120 @@
+"""
+Transaction blocks for the CUBRID backend.
+
+CUBRIDdb opens a transaction on the first statement and keeps it open until
+the connection commits. Django therefore commits after each save() outside
+of managed transactions, which costs a round trip per write. With
+'AUTOCOMMIT' in OPTIONS, the driver's autocommit mode takes over outside of
+managed transactions, and Django's commits there are skipped:
+
+    'OPTIONS': {
+        'AUTOCOMMIT': True,
+    }
+
+The driver's autocommit is switched off when transaction management is
+entered, by the decorators of django.db.transaction, by the blocks below or
+by QuerySet.update() and delete(), and back on when that block ends.
+Savepoints are only used while it is off. AUTOCOMMIT is ignored when
+settings.TRANSACTIONS_MANAGED is set.
+
+atomic() runs a block in a transaction, committed when the block completes
+and rolled back if it raises. Nested in another managed transaction, it
+runs in a savepoint instead, so that a failing inner block only undoes its
+own changes:
+
+    with atomic():
+        order.save()
+        try:
+            with atomic():
+                reserve(order)
+        except OutOfStock:
+            order.backorder()
+
+batch() runs a long job in a transaction committed every `size` write
+statements, so that it neither holds all its locks until the end nor commits
+each row. Statements are counted, not rows: an update() or delete() counts
+once however many rows it changes.
+
+    with batch(5000):
+        for line in feed:
+            Price.objects.filter(sku=line.sku).update(amount=line.amount)
+
+Writes already committed by batch() stay committed if the block raises;
+only those since the last intermediate commit are rolled back. No
+intermediate commit happens while a savepoint is open, e.g. within an
+atomic() block nested in batch(), since it would end the transaction holding
+the savepoint; the commit is made on the first write after it is released.
+"""
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+class atomic(object):
+    """
+    A transaction, or a savepoint within the current managed transaction,
+    committed or rolled back when the block ends.
+    """
+    def __init__(self, using=None):
+        self.using = using or DEFAULT_DB_ALIAS
+        self.sid = None
+        self.outermost = False
+
+    def __enter__(self):
+        using = self.using
+        if transaction.is_managed(using=using):
+            self.sid = transaction.savepoint(using=using)
+        else:
+            self.outermost = True
+            transaction.enter_transaction_management(using=using)
+            transaction.managed(True, using=using)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        using = self.using
+        if not self.outermost:
+            if exc_type is None:
+                transaction.savepoint_commit(self.sid, using=using)
+            else:
+                transaction.savepoint_rollback(self.sid, using=using)
+            return False
+        try:
+            if exc_type is None:
+                try:
+                    transaction.commit(using=using)
+                except:
+                    transaction.rollback(using=using)
+                    raise
+            else:
+                transaction.rollback(using=using)
+        finally:
+            transaction.leave_transaction_management(using=using)
+        return False
+
+class batch(object):
+    "A managed transaction committed after every `size` write statements."
+    def __init__(self, size=1000, using=None):
+        if size < 1:
+            raise ValueError("batch() needs a size of at least 1.")
+        self.size = size
+        self.using = using or DEFAULT_DB_ALIAS
+
+    def __enter__(self):
+        using = self.using
+        connection = connections[using]
+        if connection.commit_every is not None:
+            raise transaction.TransactionManagementError(
+                "batch() blocks can't be nested.")
+        transaction.enter_transaction_management(using=using)
+        transaction.managed(True, using=using)
+        connection.commit_every = connection.writes_until_commit = self.size
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        using = self.using
+        connection = connections[using]
+        try:
+            connection.commit_every = connection.writes_until_commit = None
+            if exc_type is None:
+                transaction.commit(using=using)
+            else:
+                transaction.rollback(using=using)
+        finally:
+            transaction.leave_transaction_management(using=using)
+        return False